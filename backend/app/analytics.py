@@ -0,0 +1,279 @@
+import os
+from collections import OrderedDict
+from datetime import datetime
+from threading import Lock
+import numpy as np
+from sqlalchemy.orm import Session
+from . import models, versions
+
+# Análises sobre o histórico inteiro do usuário (GET /analytics/*), em NumPy.
+#
+# As transações do usuário viram arrays colunares (um por campo) e todas as
+# contas são vetorizadas: agrupar é np.bincount sobre uma chave inteira,
+# janela móvel é diferença de somas acumuladas. Valores em centavos int64:
+# `amount` é Float no banco, e somar floats linha a linha acumula erro.
+#
+# Cache: os arrays ficam em memória por usuário, junto com a data_version em
+# que foram lidos (ver app/versions.py). Qualquer escrita sobe a versão, e a
+# próxima leitura recarrega. LRU com ANALYTICS_CACHE_SIZE usuários.
+
+ANALYTICS_CACHE_SIZE = int(os.getenv("ANALYTICS_CACHE_SIZE", "128"))
+
+Tx = models.Transaction
+
+NO_CATEGORY = -1
+EPOCH_ORDINAL = datetime(1970, 1, 1).toordinal()
+
+
+class Frame:
+    # Transações de um usuário em colunas, ordenadas por data
+    __slots__ = ("version", "dates", "months", "cents", "income", "category", "fixed")
+
+    def __init__(self, version, dates, cents, income, category, fixed):
+        self.version = version
+        self.dates = dates # datetime64[D]
+        self.months = dates.astype("datetime64[M]").astype(np.int32) # meses desde 1970-01
+        self.cents = cents # int64, sempre positivo
+        self.income = income # bool: receita (True) ou despesa
+        self.category = category # int32, NO_CATEGORY quando nulo
+        self.fixed = fixed # bool: is_fixed
+
+    @property
+    def signed(self):
+        # Receita soma, despesa subtrai
+        return np.where(self.income, self.cents, -self.cents)
+
+    @property
+    def nbytes(self) -> int:
+        return sum(getattr(self, name).nbytes for name in self.__slots__[1:])
+
+
+def load_frame(db: Session, owner_id: int, version: int) -> Frame:
+    rows = db.query(Tx.date, Tx.amount, Tx.type, Tx.category_id, Tx.is_fixed)\
+             .filter(Tx.owner_id == owner_id, Tx.date.isnot(None))\
+             .order_by(Tx.date)\
+             .all()
+    if not rows:
+        empty = np.empty(0, dtype="datetime64[D]")
+        return Frame(version, empty, np.empty(0, np.int64), np.empty(0, bool), np.empty(0, np.int32), np.empty(0, bool))
+
+    count = len(rows)
+    dates, amounts, types, categories, fixed = zip(*rows)
+    # Dias desde 1970-01-01 pelo ordinal: ignora o fuso (vale a data gravada,
+    # meio-dia local) e é bem mais rápido que converter objetos datetime
+    days = np.fromiter((d.toordinal() for d in dates), dtype=np.int64, count=count) - EPOCH_ORDINAL
+    amounts = np.fromiter((a or 0.0 for a in amounts), dtype=np.float64, count=count)
+    return Frame(
+        version,
+        days.astype("datetime64[D]"),
+        np.rint(np.abs(amounts) * 100).astype(np.int64),
+        np.fromiter((t == "income" for t in types), dtype=bool, count=count),
+        np.fromiter((NO_CATEGORY if c is None else c for c in categories), dtype=np.int32, count=count),
+        np.fromiter((bool(f) for f in fixed), dtype=bool, count=count),
+    )
+
+
+class FrameCache:
+    def __init__(self, maxsize: int):
+        self.maxsize = maxsize
+        self._frames = OrderedDict()
+        self._lock = Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, owner_id: int, version: int):
+        with self._lock:
+            frame = self._frames.get(owner_id)
+            if frame is not None and frame.version == version:
+                self._frames.move_to_end(owner_id)
+                self.hits += 1
+                return frame
+            self.misses += 1
+            return None
+
+    def put(self, owner_id: int, frame: Frame):
+        with self._lock:
+            self._frames[owner_id] = frame
+            self._frames.move_to_end(owner_id)
+            while len(self._frames) > self.maxsize:
+                self._frames.popitem(last=False)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "size": len(self._frames),
+                "bytes": sum(f.nbytes for f in self._frames.values()),
+            }
+
+
+frames = FrameCache(ANALYTICS_CACHE_SIZE)
+
+
+def frame_for(db: Session, owner_id: int) -> Frame:
+    version = versions.cached(owner_id)
+    if version is None:
+        version = versions.load(db, owner_id)
+    frame = frames.get(owner_id, version)
+    if frame is None:
+        frame = load_frame(db, owner_id, version)
+        frames.put(owner_id, frame)
+    return frame
+
+
+# --- HELPERS ---
+
+def month_index(year: int, month: int) -> int:
+    # Mesma contagem do datetime64[M]: meses desde 1970-01
+    return (year - 1970) * 12 + month - 1
+
+
+def month_label(index: int):
+    year, month = divmod(int(index), 12)
+    return year + 1970, month + 1
+
+
+def current_month() -> int:
+    today = datetime.now()
+    return month_index(today.year, today.month)
+
+
+def monthly(frame: Frame, first: int, count: int, mask=None):
+    # Soma em centavos por mês, para os meses [first, first + count): (receitas, despesas)
+    selected = (frame.months >= first) & (frame.months < first + count)
+    if mask is not None:
+        selected &= mask
+    offsets = frame.months[selected] - first
+    cents = frame.cents[selected]
+    income = frame.income[selected]
+    return (
+        np.bincount(offsets[income], weights=cents[income], minlength=count).astype(np.int64),
+        np.bincount(offsets[~income], weights=cents[~income], minlength=count).astype(np.int64),
+    )
+
+
+def rolling_mean(values, window: int):
+    # Média dos últimos `window` pontos; None até ter pontos suficientes
+    cumsum = np.concatenate(([0], np.cumsum(values, dtype=np.int64)))
+    means = (cumsum[window:] - cumsum[:-window]) / window
+    return [None] * (window - 1) + np.round(means / 100, 2).tolist()
+
+
+def money(cents) -> list:
+    return np.round(np.asarray(cents) / 100, 2).tolist()
+
+
+def category_names(db: Session, owner_id: int) -> dict:
+    return dict(db.query(models.Category.id, models.Category.name).filter(models.Category.owner_id == owner_id))
+
+
+# --- ANÁLISES ---
+
+def trends(db: Session, owner_id: int, years: int = 3, type: str = "expense"):
+    # Total por categoria por ano (anos completos + o atual) e variação ano a ano
+    frame = frame_for(db, owner_id)
+    last_year = month_label(current_month())[0]
+    first_year = last_year - years + 1
+
+    year_of = frame.months // 12 + 1970
+    selected = (year_of >= first_year) & (year_of <= last_year) & (frame.income == (type == "income"))
+
+    categories, codes = np.unique(frame.category[selected], return_inverse=True)
+    key = codes * years + (year_of[selected] - first_year)
+    totals = np.bincount(key, weights=frame.cents[selected], minlength=len(categories) * years)\
+               .astype(np.int64).reshape(len(categories), years)
+
+    # Variação sobre o ano anterior (None quando o anterior é zero)
+    previous = totals[:, :-1]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        change = np.where(previous > 0, (totals[:, 1:] - previous) / previous, np.nan)
+
+    names = category_names(db, owner_id)
+    order = np.argsort(-totals[:, -1], kind="stable")
+    return {
+        "type": type,
+        "years": list(range(first_year, last_year + 1)),
+        "categories": [
+            {
+                "category_id": None if categories[i] == NO_CATEGORY else int(categories[i]),
+                "name": names.get(int(categories[i])),
+                "totals": money(totals[i]),
+                "change": [None] + [None if np.isnan(c) else round(float(c), 4) for c in change[i]],
+            }
+            for i in order
+        ],
+    }
+
+
+def rolling(db: Session, owner_id: int, months: int = 24, window: int = 3, category_id: int = None):
+    # Série mensal (até o mês atual) com média móvel de `window` meses.
+    # Calcula window - 1 meses a mais antes do início para a média já começar cheia
+    frame = frame_for(db, owner_id)
+    last = current_month()
+    first = last - months + 1
+    mask = frame.category == category_id if category_id is not None else None
+    income, expense = monthly(frame, first - window + 1, months + window - 1, mask)
+    net = income - expense
+    skip = window - 1
+    return {
+        "window": window,
+        "months": [f"{y:04d}-{m:02d}" for y, m in map(month_label, range(first, last + 1))],
+        "income": money(income[skip:]),
+        "expense": money(expense[skip:]),
+        "net": money(net[skip:]),
+        "income_avg": rolling_mean(income, window)[skip:],
+        "expense_avg": rolling_mean(expense, window)[skip:],
+        "net_avg": rolling_mean(net, window)[skip:],
+    }
+
+
+def forecast(db: Session, owner_id: int, months: int = 6, history: int = 12):
+    # Projeção de caixa: fixas (is_fixed) do último mês que as tem + a média dos
+    # lançamentos variáveis nos últimos `history` meses completos.
+    # A faixa low/high é ± 1 desvio padrão do saldo variável mensal, acumulado
+    frame = frame_for(db, owner_id)
+    current = current_month()
+
+    fixed_months = frame.months[frame.fixed & (frame.months <= current)]
+    if len(fixed_months):
+        fixed_income, fixed_expense = monthly(frame, int(fixed_months.max()), 1, frame.fixed)
+        fixed_income, fixed_expense = int(fixed_income[0]), int(fixed_expense[0])
+    else:
+        fixed_income = fixed_expense = 0
+
+    variable_income, variable_expense = monthly(frame, current - history, history, ~frame.fixed)
+    variable_net = variable_income - variable_expense
+    spread = float(np.std(variable_net)) if history > 1 else 0.0
+
+    # Saldo de partida: tudo até o fim do mês atual
+    balance = int(frame.signed[frame.months <= current].sum())
+    income = fixed_income + float(variable_income.mean())
+    expense = fixed_expense + float(variable_expense.mean())
+    net = income - expense
+
+    steps = np.arange(1, months + 1)
+    balances = balance + net * steps
+    band = spread * np.sqrt(steps) # incerteza cresce com a raiz do horizonte
+
+    projection = []
+    for i, index in enumerate(range(current + 1, current + months + 1)):
+        year, month = month_label(index)
+        projection.append({
+            "year": year,
+            "month": month,
+            "income": round(income / 100, 2),
+            "expense": round(expense / 100, 2),
+            "net": round(net / 100, 2),
+            "balance": round(float(balances[i]) / 100, 2),
+            "low": round(float(balances[i] - band[i]) / 100, 2),
+            "high": round(float(balances[i] + band[i]) / 100, 2),
+        })
+    return {
+        "start_balance": round(balance / 100, 2),
+        "fixed_income": round(fixed_income / 100, 2),
+        "fixed_expense": round(fixed_expense / 100, 2),
+        "variable_income": round(float(variable_income.mean()) / 100, 2),
+        "variable_expense": round(float(variable_expense.mean()) / 100, 2),
+        "months": projection,
+    }
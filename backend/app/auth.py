@@ -1,7 +1,10 @@
+import os
+import time
+from collections import OrderedDict
 from datetime import datetime, timedelta
-from typing import Optional
+from threading import Lock
+from typing import NamedTuple, Optional
 from jose import JWTError, jwt
-from passlib.context import CryptContext
 from fastapi.security import OAuth2PasswordBearer # <--- Importante
 from sqlalchemy.orm import Session
 from . import models
@@ -11,17 +14,73 @@ SECRET_KEY = "sua_chave_secreta_super_segura_aqui"
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 30
 
-# Contexto de Criptografia (Hash de Senha)
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# Cache de principal (token -> usuário) para não ir ao banco a cada request
+PRINCIPAL_CACHE_SIZE = int(os.getenv("PRINCIPAL_CACHE_SIZE", "10000"))
+PRINCIPAL_CACHE_TTL = int(os.getenv("PRINCIPAL_CACHE_TTL", "300")) # segundos
 
 # Esquema de Autenticação (A peça que faltava!)
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
 
-def verify_password(plain_password, hashed_password):
-    return pwd_context.verify(plain_password, hashed_password)
+class Principal(NamedTuple):
+    # O que as rotas precisam saber do usuário logado
+    id: int
+    email: str
 
-def get_password_hash(password):
-    return pwd_context.hash(password)
+class PrincipalCache:
+    # LRU com TTL, chaveado pelo subject (email) do token.
+    # Cada entrada vive no máximo PRINCIPAL_CACHE_TTL e nunca além do exp do token.
+    # Limites: o cache é por processo e não há revogação. O claim "uid" é
+    # assinado, então vale até o token expirar (ACCESS_TOKEN_EXPIRE_MINUTES):
+    # um usuário alterado ou apagado direto no banco continua aceito até lá.
+    # A API não tem rota que altere ou apague usuários.
+    def __init__(self, maxsize: int, ttl: int):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = Lock()
+        self.hits = 0
+        self.misses = 0
+        self.db_lookups = 0
+
+    def get(self, subject: str):
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(subject)
+            if entry and entry[1] > now:
+                self._entries.move_to_end(subject)
+                self.hits += 1
+                return entry[0]
+            if entry:
+                del self._entries[subject]
+            self.misses += 1
+            return None
+
+    def put(self, subject: str, principal: Principal, expires_at: float):
+        with self._lock:
+            self._entries[subject] = (principal, min(expires_at, time.time() + self.ttl))
+            self._entries.move_to_end(subject)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def count_lookup(self):
+        with self._lock:
+            self.db_lookups += 1
+
+    def stats(self):
+        with self._lock:
+            return {
+                "size": len(self._entries),
+                "maxsize": self.maxsize,
+                "hits": self.hits,
+                "misses": self.misses,
+                "db_lookups": self.db_lookups,
+            }
+
+principal_cache = PrincipalCache(PRINCIPAL_CACHE_SIZE, PRINCIPAL_CACHE_TTL)
 
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     to_encode = data.copy()
@@ -29,26 +88,56 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
         expire = datetime.utcnow() + expires_delta
     else:
         expire = datetime.utcnow() + timedelta(minutes=15)
-    to_encode.update({"exp": expire})
+    to_encode.update({"exp": expire, "iat": datetime.utcnow()})
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
-def get_current_user(token: str, db: Session):
+def decode_token(token: str):
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        email: str = payload.get("sub")
-        if email is None:
-            return None
     except JWTError:
         return None
-    
+    if payload.get("sub") is None:
+        return None
+    return payload
+
+def cached_principal(payload: dict):
+    # Resolve sem banco: cache ou claim "uid". None = precisa consultar (lookup_principal)
+    email = payload["sub"]
+    principal = principal_cache.get(email)
+    if principal:
+        return principal
+
+    # Token novo já traz o id do usuário (claim "uid"): como é assinado, dispensa o banco.
+    # Só consultamos se o token for antigo (sem uid)
+    user_id = payload.get("uid")
+    if user_id is not None:
+        principal = Principal(id=user_id, email=email)
+        principal_cache.put(email, principal, payload.get("exp", time.time()))
+        return principal
+    return None
+
+def lookup_principal(db: Session, payload: dict):
+    email = payload["sub"]
+    principal_cache.count_lookup()
     user = db.query(models.User).filter(models.User.email == email).first()
-    return user
+    if not user:
+        return None
+    principal = Principal(id=user.id, email=user.email)
+    principal_cache.put(email, principal, payload.get("exp", time.time()))
+    return principal
 
-def authenticate_user(db: Session, email: str, password: str):
+def find_credentials(db: Session, email: str):
+    # (principal, hash) ou None. Encerra a transação: a conexão volta ao pool
+    # ANTES do bcrypt, senão uma rajada de logins segura todas as conexões
     user = db.query(models.User).filter(models.User.email == email).first()
     if not user:
-        return False
-    if not verify_password(password, user.hashed_password):
-        return False
-    return user
\ No newline at end of file
+        return None
+    credentials = Principal(id=user.id, email=user.email), user.hashed_password
+    db.rollback()
+    return credentials
+
+def update_password_hash(db: Session, user_id: int, new_hash: str):
+    db.query(models.User).filter(models.User.id == user_id)\
+      .update({models.User.hashed_password: new_hash}, synchronize_session=False)
+    db.commit()
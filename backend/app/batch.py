@@ -0,0 +1,271 @@
+import os
+from datetime import datetime, timezone
+from sqlalchemy import Integer, cast, extract, func
+from sqlalchemy.orm import Session
+from . import models, schemas, filters, recurrence, search, summary, sync, versions
+from .strings import normalize
+
+# Edição em lote (POST /transactions/batch): criar, editar e apagar várias
+# transações numa requisição só, numa transação só. Tudo ou nada: se um item
+# falha, nada é gravado e a resposta diz qual item falhou e por quê.
+#
+# Editar e apagar é set-based: um UPDATE/DELETE por operação, pelo id ou por
+# filtro (ex: "tudo da categoria X vai para Y"). O rollup mensal e o
+# autocomplete são acertados com GROUP BY sobre as linhas afetadas, e os deltas
+# do lote inteiro são aplicados uma vez no fim, com poucos comandos
+# (summary.apply_many / search.remember_counts).
+# Uma versão só (bump) para o lote: as linhas tocadas recebem esse change_seq
+# e as exclusões viram tombstones com ele (ver app/sync.py).
+
+BATCH_MAX_ITEMS = int(os.getenv("BATCH_MAX_ITEMS", "5000")) # operações + ids nos filtros
+
+Tx = models.Transaction
+
+YEAR = cast(extract("year", Tx.date), Integer)
+MONTH = cast(extract("month", Tx.date), Integer)
+
+REQUIRED = ("description", "amount", "type", "category_id")
+
+
+class BatchError(ValueError):
+    # Lote recusado (nada gravado). results: um resultado por item
+    def __init__(self, message, results=()):
+        super().__init__(message)
+        self.results = list(results)
+
+
+class ItemError(ValueError):
+    pass
+
+
+class Ledger:
+    # Deltas do rollup e do autocomplete acumulados durante o lote
+    def __init__(self, owner_id: int):
+        self.owner_id = owner_id
+        self.totals = {} # (ano, mês, categoria, tipo) -> [total, count]
+        self.uses = {} # (descrição normalizada, categoria) -> [descrição, count, último uso]
+
+    def add(self, year, month, category_id, type, total, count):
+        if year is None:
+            return
+        entry = self.totals.setdefault((year, month, category_id, type), [0.0, 0])
+        entry[0] += total or 0
+        entry[1] += count
+
+    def use(self, description, category_id, count, used_at=None):
+        entry = self.uses.setdefault((normalize(description), category_id), [description, 0, None])
+        entry[1] += count
+        if count > 0 and used_at is not None and (entry[2] is None or used_at > entry[2]):
+            entry[0], entry[2] = description, used_at
+
+    def apply(self, db: Session):
+        summary.apply_many(db, self.owner_id, self.totals)
+        search.remember_counts(db, self.owner_id, self.uses)
+
+
+# --- OPERAÇÕES SET-BASED (também usadas pelo delete_category) ---
+
+def update_where(db: Session, ledger: Ledger, criteria, values: dict, version: int) -> int:
+    # values: só as colunas que mudam. O grupo antigo sai do rollup e o novo entra,
+    # calculado a partir do mesmo GROUP BY (sem ler as linhas)
+    db.flush()
+    groups = db.query(YEAR, MONTH, Tx.category_id, Tx.type, func.sum(Tx.amount), func.count(Tx.id))\
+               .filter(*criteria)\
+               .group_by(YEAR, MONTH, Tx.category_id, Tx.type)
+    date = values.get("date")
+    for year, month, category_id, type, total, count in groups:
+        ledger.add(year, month, category_id, type, -(total or 0), -count)
+        ledger.add(
+            date.year if date else year,
+            date.month if date else month,
+            values.get("category_id", category_id),
+            values.get("type", type),
+            values["amount"] * count if "amount" in values else total,
+            count,
+        )
+
+    if "description" in values or "category_id" in values:
+        uses = db.query(Tx.description, Tx.category_id, func.count(Tx.id), func.max(Tx.date))\
+                 .filter(*criteria)\
+                 .group_by(Tx.description, Tx.category_id)
+        for description, category_id, count, used_at in uses:
+            ledger.use(description, category_id, -count)
+            ledger.use(values.get("description", description), values.get("category_id", category_id),
+                       count, date or used_at)
+
+    # Ocorrências de regras recorrentes (poucas) seguem a edição, como no PUT
+    recurring = [tx_id for (tx_id,) in db.query(Tx.id).filter(*criteria, Tx.rule_id.isnot(None))]
+
+    count = db.query(Tx).filter(*criteria)\
+              .update({**values, "change_seq": version}, synchronize_session=False)
+
+    if recurring:
+        recurrence.follow_edit_many(db, recurring)
+    return count
+
+
+def delete_where(db: Session, ledger: Ledger, criteria, version: int) -> int:
+    db.flush()
+    groups = db.query(YEAR, MONTH, Tx.category_id, Tx.type, func.sum(Tx.amount), func.count(Tx.id))\
+               .filter(*criteria)\
+               .group_by(YEAR, MONTH, Tx.category_id, Tx.type)
+    for year, month, category_id, type, total, count in groups:
+        ledger.add(year, month, category_id, type, -(total or 0), -count)
+
+    uses = db.query(Tx.description, Tx.category_id, func.count(Tx.id))\
+             .filter(*criteria)\
+             .group_by(Tx.description, Tx.category_id)
+    for description, category_id, count in uses:
+        ledger.use(description, category_id, -count)
+
+    latest = db.query(Tx.rule_id, func.max(Tx.period))\
+               .filter(*criteria, Tx.rule_id.isnot(None))\
+               .group_by(Tx.rule_id)\
+               .all()
+
+    sync.tombstone_where(db, criteria, version)
+    count = db.query(Tx).filter(*criteria).delete(synchronize_session=False)
+    recurrence.follow_delete_many(db, latest)
+    return count
+
+
+# --- LOTE ---
+
+def where_criteria(owner_id: int, where: schemas.BatchFilter):
+    criteria = [Tx.owner_id == owner_id]
+    if where.ids is not None:
+        criteria.append(Tx.id.in_(where.ids))
+    if where.category_id is not None:
+        criteria.append(Tx.category_id == where.category_id)
+    if where.type is not None:
+        criteria.append(Tx.type == where.type)
+
+    if where.month is not None and where.year is None:
+        raise ItemError("Informe o ano junto com o mês")
+    try:
+        period = filters.period_range(where.year, where.month)
+    except ValueError:
+        raise ItemError("Mês inválido")
+    if period:
+        start, end = period
+        criteria += [Tx.date >= start, Tx.date < end]
+
+    # Filtro vazio apagaria/editaria o histórico inteiro: exige pelo menos um critério
+    if len(criteria) == 1:
+        raise ItemError("Filtro vazio (informe ids, category_id, type ou ano)")
+    return criteria
+
+
+def target(owner_id: int, op: schemas.BatchOperation):
+    if (op.id is None) == (op.where is None):
+        raise ItemError("Informe id ou where")
+    if op.id is not None:
+        return [Tx.owner_id == owner_id, Tx.id == op.id]
+    return where_criteria(owner_id, op.where)
+
+
+def apply_batch(db: Session, owner_id: int, operations):
+    size = len(operations) + sum(len(op.where.ids or []) for op in operations if op.where)
+    if not operations:
+        raise BatchError("Nenhuma operação informada")
+    if size > BATCH_MAX_ITEMS:
+        raise BatchError(f"Lote grande demais (máximo {BATCH_MAX_ITEMS} operações + ids)")
+
+    # Categorias citadas nos dados: uma query só para validar o dono
+    wanted = {op.data.category_id for op in operations if op.data and op.data.category_id is not None}
+    owned = {
+        category_id for (category_id,) in db.query(models.Category.id).filter(
+            models.Category.owner_id == owner_id,
+            models.Category.id.in_(wanted),
+        )
+    } if wanted else set()
+
+    version = versions.bump(db, owner_id)
+    ledger = Ledger(owner_id)
+    results = []
+    created = [] # (resultado, transação): o id só existe depois do flush
+    deletes = [] # (resultado, id): exclusões por id seguidas viram um DELETE só
+    totals = {"create": 0, "update": 0, "delete": 0}
+
+    def flush_deletes():
+        if not deletes:
+            return
+        found = {
+            tx_id for (tx_id,) in db.query(Tx.id).filter(
+                Tx.owner_id == owner_id,
+                Tx.id.in_({tx_id for _, tx_id in deletes}),
+            )
+        }
+        if found:
+            totals["delete"] += delete_where(db, ledger, [Tx.owner_id == owner_id, Tx.id.in_(found)], version)
+        for result, tx_id in deletes:
+            if tx_id in found:
+                found.discard(tx_id) # o mesmo id duas vezes: a segunda não acha mais
+                result["count"] = 1
+            else:
+                result.update(status="error", error="Transação não encontrada")
+        deletes.clear()
+
+    for index, op in enumerate(operations):
+        result = {"index": index, "op": op.op, "status": "ok", "count": 0}
+        results.append(result)
+        if op.op == "delete" and op.id is not None and op.where is None:
+            deletes.append((result, op.id))
+            continue
+        flush_deletes()
+
+        try:
+            values = op.data.dict(exclude_none=True) if op.data else {}
+            if "category_id" in values and values["category_id"] not in owned:
+                raise ItemError("Categoria não encontrada")
+
+            if op.op == "create":
+                missing = [field for field in REQUIRED if field not in values]
+                if missing:
+                    raise ItemError("Campos obrigatórios: " + ", ".join(missing))
+                values.setdefault("date", datetime.now(timezone.utc))
+                tx = Tx(**values, owner_id=owner_id, change_seq=version)
+                db.add(tx)
+                ledger.add(tx.date.year, tx.date.month, tx.category_id, tx.type, tx.amount, 1)
+                ledger.use(tx.description, tx.category_id, 1, tx.date)
+                created.append((result, tx))
+                result["count"] = 1
+
+            elif op.op == "update":
+                if not values:
+                    raise ItemError("Nada para alterar")
+                result["count"] = update_where(db, ledger, target(owner_id, op), values, version)
+
+            elif op.op == "delete":
+                result["count"] = delete_where(db, ledger, target(owner_id, op), version)
+
+            else:
+                raise ItemError("Operação inválida (use create, update ou delete)")
+
+            if op.id is not None and not result["count"]:
+                raise ItemError("Transação não encontrada")
+            totals[op.op] += result["count"]
+        except ItemError as exc:
+            result.update(status="error", count=0, error=str(exc))
+    flush_deletes()
+
+    failed = [r for r in results if r["status"] == "error"]
+    if failed:
+        db.rollback()
+        for result in results:
+            if result["status"] == "ok":
+                result.update(status="skipped", count=0)
+        raise BatchError(f"{len(failed)} operação(ões) com erro; nada foi gravado", results)
+
+    db.flush()
+    for result, tx in created:
+        result["id"] = tx.id
+    ledger.apply(db)
+    db.commit()
+    return {
+        "version": version,
+        "created": totals["create"],
+        "updated": totals["update"],
+        "deleted": totals["delete"],
+        "results": results,
+    }
@@ -0,0 +1,316 @@
+from fastapi import HTTPException
+from sqlalchemy import exists
+from sqlalchemy.orm import Session, joinedload, selectinload
+from . import models, schemas, summary, filters, recurrence, search, sync, versions, serializers, batch
+
+# Lógica de banco das rotas. Tudo aqui é SÍNCRONO e recebe uma Session:
+# as rotas chamam via database.run(), que executa no threadpool (DB_MODE=sync)
+# ou dentro da AsyncSession com run_sync() (DB_MODE=async).
+# Regra importante: devolver tudo já carregado (sem lazy load depois daqui).
+
+# --- USUÁRIOS ---
+
+def get_user_by_email(db: Session, email: str):
+    return db.query(models.User).filter(models.User.email == email).first()
+
+def create_user(db: Session, email: str, hashed_password: str):
+    new_user = models.User(email=email, hashed_password=hashed_password)
+    db.add(new_user)
+    db.commit()
+    db.refresh(new_user)
+    return new_user
+
+# --- TRANSAÇÕES ---
+
+def load_transaction(db: Session, transaction_id: int):
+    # Uma query só (JOIN) em vez de refresh() + lazy load da categoria
+    return db.query(models.Transaction)\
+             .options(joinedload(models.Transaction.category))\
+             .filter(models.Transaction.id == transaction_id)\
+             .one()
+
+def clone_fixed_transactions(db: Session, owner_id: int, target_year: int, target_month: int):
+    # As fixas do mês anterior viram regras de recorrência e o mês alvo é gerado
+    # num INSERT ... SELECT só (ver app/recurrence.py). Rodar de novo não duplica
+    count = recurrence.roll_month(db, target_year, target_month, owner_ids=[owner_id])
+    db.commit()
+
+    if not count:
+        return {"message": "Nenhuma despesa fixa encontrada no mês anterior."}
+    return {"message": f"{count} transações clonadas!"}
+
+def check_category(db: Session, owner_id: int, category_id: int):
+    # category_id é FK global: sem isso, dá para lançar na categoria de outro
+    # usuário (e depois ele não consegue apagá-la)
+    if category_id is None:
+        return
+    owned = db.query(exists().where(
+        models.Category.id == category_id,
+        models.Category.owner_id == owner_id
+    )).scalar()
+    if not owned:
+        raise HTTPException(status_code=404, detail="Categoria não encontrada")
+
+def create_transaction(db: Session, owner_id: int, transaction: schemas.TransactionCreate):
+    check_category(db, owner_id, transaction.category_id)
+    # change_seq = versão nova dos dados (sync incremental, ver app/sync.py)
+    db_transaction = models.Transaction(**transaction.dict(), owner_id=owner_id, change_seq=versions.bump(db, owner_id))
+    db.add(db_transaction)
+    db.flush()
+    db.refresh(db_transaction) # Garante a data preenchida pelo banco
+    summary.apply_transaction(db, db_transaction)
+    search.remember_transaction(db, db_transaction)
+    db.commit()
+    return load_transaction(db, db_transaction.id)
+
+def transaction_filters(owner_id: int, month: int = None, year: int = None, cursor: str = None):
+    # Filtros comuns das listagens (entidades, tuplas e streaming)
+    criteria = [models.Transaction.owner_id == owner_id]
+
+    # Filtro por período com limites [início, fim) -> usa ix_transactions_owner_date_id
+    if month is not None and year is None:
+        raise HTTPException(status_code=400, detail="Informe o ano junto com o mês")
+    try:
+        period = filters.period_range(year, month)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Mês inválido")
+    if period:
+        start, end = period
+        criteria += [models.Transaction.date >= start, models.Transaction.date < end]
+
+    # Paginação keyset: com cursor o custo por página é constante (sem OFFSET)
+    if cursor:
+        try:
+            criteria.append(filters.after_cursor(cursor))
+        except (ValueError, TypeError):
+            raise HTTPException(status_code=400, detail="Cursor inválido")
+    return criteria
+
+NEWEST_FIRST = (models.Transaction.date.desc(), models.Transaction.id.desc())
+
+def _page(query, skip: int, limit: int, cursor: str = None):
+    # Buscamos 1 a mais só para saber se existe próxima página
+    query = query.order_by(*NEWEST_FIRST)
+    if not cursor:
+        query = query.offset(skip)
+    rows = query.limit(limit + 1).all()
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = filters.encode_cursor(rows[-1])
+    return rows, next_cursor
+
+def list_transactions(db: Session, owner_id: int, skip: int = 0, limit: int = 1000,
+                      month: int = None, year: int = None, cursor: str = None, compact: bool = False):
+    # Retorna (resultado, próximo cursor ou None)
+    query = db.query(models.Transaction)\
+              .filter(*transaction_filters(owner_id, month, year, cursor))
+
+    # Categorias: sem N+1. No modo normal o selectinload busca todas numa query só;
+    # no compacto elas vão numa tabela à parte, uma vez cada
+    if not compact:
+        query = query.options(selectinload(models.Transaction.category))
+
+    transactions, next_cursor = _page(query, skip, limit, cursor)
+
+    if compact:
+        category_ids = {t.category_id for t in transactions if t.category_id is not None}
+        categories = db.query(models.Category).filter(models.Category.id.in_(category_ids)).all() if category_ids else []
+        return {"categories": categories, "transactions": transactions}, next_cursor
+    return transactions, next_cursor
+
+def list_transaction_rows(db: Session, owner_id: int, skip: int = 0, limit: int = 1000,
+                          month: int = None, year: int = None, cursor: str = None, compact: bool = False):
+    # Igual a list_transactions, mas em tuplas de colunas (ver app/serializers.py).
+    # Retorna (json em bytes, próximo cursor ou None)
+    criteria = transaction_filters(owner_id, month, year, cursor)
+
+    if compact:
+        rows, next_cursor = _page(db.query(*serializers.TX_COLUMNS).filter(*criteria), skip, limit, cursor)
+        category_ids = {r.category_id for r in rows if r.category_id is not None}
+        categories = db.query(*serializers.CATEGORY_COLUMNS)\
+                       .filter(models.Category.id.in_(category_ids)).all() if category_ids else []
+        return serializers.compact_json(categories, rows), next_cursor
+
+    # Categoria no mesmo SELECT (LEFT JOIN), sem segunda query
+    query = db.query(*serializers.TX_COLUMNS, *serializers.CATEGORY_LABELED)\
+              .outerjoin(models.Category, models.Category.id == models.Transaction.category_id)\
+              .filter(*criteria)
+    rows, next_cursor = _page(query, skip, limit, cursor)
+    return serializers.transactions_json(rows), next_cursor
+
+def stream_transaction_rows(db: Session, owner_id: int, skip: int = 0, limit: int = 1000,
+                            month: int = None, year: int = None, cursor: str = None):
+    # Para streaming: o X-Next-Cursor vai no cabeçalho, antes do corpo. A borda
+    # da página sai de uma query só no índice (date, id); as linhas vêm depois,
+    # aos poucos (yield_per), terminando exatamente nessa borda.
+    # Retorna (iterador de tuplas, próximo cursor ou None)
+    criteria = transaction_filters(owner_id, month, year, cursor)
+    offset = 0 if cursor else skip
+
+    edge = db.query(models.Transaction.date, models.Transaction.id)\
+             .filter(*criteria)\
+             .order_by(*NEWEST_FIRST)\
+             .offset(offset + limit - 1)\
+             .limit(2)\
+             .all()
+
+    query = db.query(*serializers.TX_COLUMNS).filter(*criteria).order_by(*NEWEST_FIRST)
+    next_cursor = None
+    if len(edge) == 2:
+        next_cursor = filters.encode_cursor(edge[0])
+        query = query.filter(~filters.after_cursor(next_cursor)).offset(offset)
+    else:
+        query = query.offset(offset).limit(limit)
+    return query.yield_per(serializers.STREAM_CHUNK), next_cursor
+
+def update_transaction(db: Session, owner_id: int, transaction_id: int, transaction: schemas.TransactionCreate):
+    db_transaction = db.query(models.Transaction).filter(
+        models.Transaction.id == transaction_id,
+        models.Transaction.owner_id == owner_id
+    ).first()
+
+    if not db_transaction:
+        raise HTTPException(status_code=404, detail="Transação não encontrada")
+    check_category(db, owner_id, transaction.category_id)
+
+    # Bump antes de tudo: a linha do usuário travada serializa as escritas no
+    # rollup/autocomplete (mesma ordem de locks do create, do lote e da importação)
+    version = versions.bump(db, owner_id)
+    summary.apply_transaction(db, db_transaction, -1)
+    search.remember_transaction(db, db_transaction, -1)
+
+    # 👇 A MÁGICA É AQUI: O "if value is not None"
+    # Isso impede que o sistema apague a data original se o frontend mandar vazio
+    for key, value in transaction.dict().items():
+        if value is not None:
+            setattr(db_transaction, key, value)
+
+    recurrence.follow_edit(db, db_transaction)
+    summary.apply_transaction(db, db_transaction)
+    search.remember_transaction(db, db_transaction)
+    db_transaction.change_seq = version
+    db.commit()
+    return load_transaction(db, db_transaction.id)
+
+def delete_transaction(db: Session, owner_id: int, transaction_id: int):
+    db_transaction = db.query(models.Transaction).filter(
+        models.Transaction.id == transaction_id,
+        models.Transaction.owner_id == owner_id
+    ).first()
+
+    if not db_transaction:
+        raise HTTPException(status_code=404, detail="Transação não encontrada")
+
+    version = versions.bump(db, owner_id) # antes do rollup, como no update
+    summary.apply_transaction(db, db_transaction, -1)
+    search.remember_transaction(db, db_transaction, -1)
+    recurrence.follow_delete(db, db_transaction)
+    db.delete(db_transaction)
+    sync.tombstone(db, owner_id, sync.TRANSACTION, [transaction_id], version)
+    db.commit()
+    return {"detail": "Transação deletada"}
+
+# --- CATEGORIAS ---
+
+def list_categories(db: Session, owner_id: int):
+    return db.query(models.Category).filter(models.Category.owner_id == owner_id).all()
+
+def create_category(db: Session, owner_id: int, category: schemas.CategoryCreate):
+    exists = db.query(models.Category).filter(
+        models.Category.name == category.name,
+        models.Category.owner_id == owner_id
+    ).first()
+
+    if exists:
+        raise HTTPException(status_code=400, detail="Categoria já existe")
+
+    new_category = models.Category(
+        name=category.name,
+        icon=category.icon,
+        color=category.color,
+        owner_id=owner_id,
+        change_seq=versions.bump(db, owner_id)
+    )
+    db.add(new_category)
+    db.commit()
+    db.refresh(new_category)
+    return new_category
+
+def delete_category(db: Session, owner_id: int, category_id: int, reassign_to: int = None):
+    db_cat = db.query(models.Category).filter(
+        models.Category.id == category_id,
+        models.Category.owner_id == owner_id
+    ).first()
+
+    if not db_cat:
+        raise HTTPException(status_code=404, detail="Categoria não encontrada")
+
+    # Referências de OUTROS usuários (dados antigos, de antes da checagem no
+    # create/update): não são nossas para mover, e o DELETE violaria a FK
+    foreign = db.query(exists().where(
+        models.Transaction.category_id == category_id,
+        models.Transaction.owner_id != owner_id
+    )).scalar() or db.query(exists().where(
+        models.RecurringRule.category_id == category_id,
+        models.RecurringRule.owner_id != owner_id
+    )).scalar()
+    if foreign:
+        raise HTTPException(status_code=400, detail="Não é possível apagar categoria em uso por outra conta.")
+
+    in_category = (models.Transaction.owner_id == owner_id, models.Transaction.category_id == category_id)
+    reassigned = 0
+    if reassign_to is None:
+        # EXISTS: não carrega as transações só para saber se há alguma.
+        # Regras recorrentes também apontam para a categoria (FK): sem isso o DELETE estoura
+        if db.query(exists().where(*in_category)).scalar():
+            raise HTTPException(status_code=400, detail="Não é possível apagar categoria com transações (use reassign_to para movê-las).")
+        if db.query(exists().where(
+            models.RecurringRule.owner_id == owner_id,
+            models.RecurringRule.category_id == category_id
+        )).scalar():
+            raise HTTPException(status_code=400, detail="Não é possível apagar categoria usada por regras recorrentes (use reassign_to para movê-las).")
+        version = versions.bump(db, owner_id)
+    else:
+        target = db.query(models.Category.id).filter(
+            models.Category.id == reassign_to,
+            models.Category.owner_id == owner_id
+        ).first()
+        if not target or reassign_to == category_id:
+            raise HTTPException(status_code=400, detail="Categoria de destino não encontrada")
+
+        # Move tudo num UPDATE só, acertando rollup, autocomplete e sync (ver app/batch.py).
+        # Regras recorrentes também, inclusive as já encerradas
+        version = versions.bump(db, owner_id)
+        db.query(models.RecurringRule).filter(
+            models.RecurringRule.owner_id == owner_id,
+            models.RecurringRule.category_id == category_id
+        ).update({models.RecurringRule.category_id: reassign_to}, synchronize_session=False)
+        ledger = batch.Ledger(owner_id)
+        reassigned = batch.update_where(db, ledger, in_category, {"category_id": reassign_to}, version)
+        ledger.apply(db)
+
+    # DELETE direto: db.delete() carregaria db_cat.transactions para anular a FK
+    db.query(models.Category).filter(models.Category.id == category_id).delete(synchronize_session=False)
+    sync.tombstone(db, owner_id, sync.CATEGORY, [category_id], version)
+    db.commit()
+    return {"detail": "Categoria deletada", "reassigned": reassigned}
+
+def update_category(db: Session, owner_id: int, category_id: int, category: schemas.CategoryCreate):
+    db_cat = db.query(models.Category).filter(
+        models.Category.id == category_id,
+        models.Category.owner_id == owner_id
+    ).first()
+
+    if not db_cat:
+        raise HTTPException(status_code=404, detail="Categoria não encontrada")
+
+    db_cat.name = category.name
+    db_cat.icon = category.icon
+    db_cat.color = category.color
+    db_cat.change_seq = versions.bump(db, owner_id)
+
+    db.commit()
+    db.refresh(db_cat)
+    return db_cat
@@ -1,6 +1,10 @@
 import os
-from sqlalchemy import create_engine
+import time
+from sqlalchemy import create_engine, event, inspect, text
+from sqlalchemy.schema import CreateColumn
 from sqlalchemy.orm import sessionmaker, declarative_base
+from starlette.concurrency import run_in_threadpool
+from . import metrics, strings
 
 # 1. Tenta pegar a URL do Render. Se não achar, usa SQLite local.
 SQLALCHEMY_DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./financeiro.db")
@@ -10,11 +14,23 @@ SQLALCHEMY_DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./financeiro.db")
 if SQLALCHEMY_DATABASE_URL.startswith("postgres://"):
     SQLALCHEMY_DATABASE_URL = SQLALCHEMY_DATABASE_URL.replace("postgres://", "postgresql://", 1)
 
+# Modo das rotas: "sync" (SessionLocal no threadpool) ou "async" (asyncpg / aiosqlite)
+DB_MODE = os.getenv("DB_MODE", "sync")
+
+# Pool explícito (antes usávamos os defaults do SQLAlchemy)
+POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+POOL_TIMEOUT = int(os.getenv("DB_POOL_TIMEOUT", "30")) # segundos esperando uma conexão livre
+
+pool_options = dict(pool_size=POOL_SIZE, max_overflow=MAX_OVERFLOW, pool_timeout=POOL_TIMEOUT)
+
 # 3. Cria o Engine (Com configurações diferentes para Nuvem vs Local)
+# O engine síncrono existe sempre: startup, comandos de CLI e workers usam ele
 if "sqlite" in SQLALCHEMY_DATABASE_URL:
     # Configuração simples para rodar no seu PC
     engine = create_engine(
-        SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False}
+        SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False},
+        poolclass=metrics.TimedQueuePool, **pool_options
     )
     print("🔋 Rodando Local (SQLite)")
 else:
@@ -22,10 +38,158 @@ else:
     engine = create_engine(
         SQLALCHEMY_DATABASE_URL,
         pool_pre_ping=True,  # Testa conexão antes de usar (Ótimo!)
-        pool_recycle=300     # Recicla conexões a cada 5 min (Ótimo para Neon)
+        pool_recycle=300,    # Recicla conexões a cada 5 min (Ótimo para Neon)
+        poolclass=metrics.TimedQueuePool,
+        **pool_options
     )
     print("☁️ Rodando na Nuvem (PostgreSQL)")
 
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
-Base = declarative_base()
\ No newline at end of file
+Base = declarative_base()
+
+
+def async_url(url: str) -> str:
+    # Mesmo banco, driver assíncrono
+    if url.startswith("sqlite"):
+        return url.replace("sqlite://", "sqlite+aiosqlite://", 1)
+    url = url.replace("postgresql://", "postgresql+asyncpg://", 1)
+    # O asyncpg não entende sslmode (vem na URL do Neon)
+    return url.replace("sslmode=", "ssl=")
+
+
+async_engine = None
+AsyncSessionLocal = None
+
+if DB_MODE == "async":
+    from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+    if "sqlite" in SQLALCHEMY_DATABASE_URL:
+        async_engine = create_async_engine(
+            async_url(SQLALCHEMY_DATABASE_URL), poolclass=metrics.TimedAsyncQueuePool, **pool_options
+        )
+    else:
+        async_engine = create_async_engine(
+            async_url(SQLALCHEMY_DATABASE_URL),
+            pool_pre_ping=True,
+            pool_recycle=300,
+            poolclass=metrics.TimedAsyncQueuePool,
+            **pool_options
+        )
+    AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False)
+    print("⚡ Rotas em modo async")
+
+
+# Instrumentação: conta e cronometra cada statement (ver app/metrics.py).
+# No engine async os eventos ficam no sync_engine que ele embrulha
+def instrument(sync_engine):
+    @event.listens_for(sync_engine, "before_cursor_execute")
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+    @event.listens_for(sync_engine, "after_cursor_execute")
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        metrics.record_query(statement, time.perf_counter() - conn.info["query_start"].pop())
+
+    @event.listens_for(sync_engine, "handle_error")
+    def handle_error(context):
+        # Statement que falhou não passa pelo after_cursor_execute
+        if context.connection is not None and context.connection.info.get("query_start"):
+            context.connection.info["query_start"].pop()
+
+
+instrument(engine)
+if async_engine is not None:
+    instrument(async_engine.sync_engine)
+
+
+# SQLite: normalize_text() em SQL é a mesma normalização do Python (sem acento,
+# minúsculas) — usada pelos triggers e pela busca (ver app/search.py)
+def sqlite_functions(sync_engine):
+    @event.listens_for(sync_engine, "connect")
+    def connect(dbapi_connection, connection_record):
+        dbapi_connection.create_function("normalize_text", 1, strings.normalize, deterministic=True)
+
+
+if engine.dialect.name == "sqlite":
+    sqlite_functions(engine)
+    if async_engine is not None:
+        sqlite_functions(async_engine.sync_engine)
+
+
+async def get_session():
+    # Dependência do FastAPI: Session (sync) ou AsyncSession (async), conforme DB_MODE
+    if AsyncSessionLocal is not None:
+        async with AsyncSessionLocal() as db:
+            yield db
+    else:
+        db = SessionLocal()
+        try:
+            yield db
+        finally:
+            await run_in_threadpool(db.close)
+
+
+async def run_blocking(fn, *args, **kwargs):
+    # Trabalho pesado (importação, jobs): sessão síncrona própria no threadpool,
+    # para não segurar o event loop nem no modo async
+    def job():
+        db = SessionLocal()
+        try:
+            return fn(db, *args, **kwargs)
+        finally:
+            db.close()
+    return await run_in_threadpool(job)
+
+
+async def open_stream(fn, *args, **kwargs):
+    # Respostas em streaming: fn(db, ...) devolve (linhas, extra) e a sessão fica
+    # aberta enquanto o corpo é enviado — fecha quando o gerador termina.
+    # Atenção: um cliente lento segura uma conexão do pool até o fim
+    db = SessionLocal()
+    try:
+        rows, extra = await run_in_threadpool(fn, db, *args, **kwargs)
+    except BaseException:
+        await run_in_threadpool(db.close)
+        raise
+
+    def stream():
+        try:
+            yield from rows
+        finally:
+            db.close()
+    return stream(), extra
+
+
+async def run(db, fn, *args, **kwargs):
+    # Executa fn(session, *args) — toda a lógica de banco é escrita uma vez só, síncrona.
+    # async: run_sync() roda a função no greenlet da AsyncSession (sem thread)
+    # sync: roda no threadpool, como as rotas `def` faziam antes
+    if AsyncSessionLocal is not None:
+        return await db.run_sync(fn, *args, **kwargs)
+    return await run_in_threadpool(fn, db, *args, **kwargs)
+
+
+# 4. Evolução de schema sem migrations
+# O create_all() só cria tabelas novas. Para bancos que já existem (ex: Neon),
+# adicionamos as colunas e índices que faltam. Colunas novas precisam ser
+# nullable ou ter server_default.
+def upgrade_schema(metadata):
+    inspector = inspect(engine)
+    with engine.begin() as conn:
+        for table in metadata.sorted_tables:
+            if not inspector.has_table(table.name):
+                continue
+
+            columns = {c["name"] for c in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name not in columns:
+                    ddl = CreateColumn(column).compile(dialect=engine.dialect)
+                    conn.execute(text(f"ALTER TABLE {table.name} ADD COLUMN {ddl}"))
+                    print(f"🛠️ Coluna criada: {table.name}.{column.name}")
+
+            indexes = {i["name"] for i in inspector.get_indexes(table.name)}
+            for index in table.indexes:
+                if index.name not in indexes:
+                    index.create(conn)
+                    print(f"🛠️ Índice criado: {index.name}")
@@ -0,0 +1,47 @@
+import base64
+import json
+from datetime import datetime
+from typing import Optional
+from sqlalchemy import and_, or_
+from . import models
+
+# Helpers de listagem: intervalos de data e cursor da paginação keyset
+
+
+def month_range(year: int, month: int):
+    # Intervalo semiaberto [início, fim) — usa o índice, ao contrário de extract()
+    start = datetime(year, month, 1)
+    if month == 12:
+        end = datetime(year + 1, 1, 1)
+    else:
+        end = datetime(year, month + 1, 1)
+    return start, end
+
+
+def period_range(year: Optional[int], month: Optional[int]):
+    if year is None:
+        return None
+    if month is None:
+        return datetime(year, 1, 1), datetime(year + 1, 1, 1)
+    return month_range(year, month)
+
+
+def encode_cursor(tx) -> str:
+    raw = json.dumps([tx.date.isoformat(), tx.id])
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str):
+    # Levanta ValueError se o cursor não for nosso
+    padded = cursor + "=" * (-len(cursor) % 4)
+    date, tx_id = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    return datetime.fromisoformat(date), int(tx_id)
+
+
+def after_cursor(cursor: str):
+    # Próxima página para ORDER BY date DESC, id DESC
+    date, tx_id = decode_cursor(cursor)
+    return or_(
+        models.Transaction.date < date,
+        and_(models.Transaction.date == date, models.Transaction.id < tx_id),
+    )
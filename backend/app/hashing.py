@@ -0,0 +1,124 @@
+import asyncio
+import multiprocessing
+import os
+from concurrent.futures import Future, ProcessPoolExecutor, TimeoutError
+from threading import BoundedSemaphore, Lock
+from passlib.context import CryptContext
+from starlette.concurrency import run_in_threadpool
+
+# Bcrypt fora dos workers da API.
+# O hash roda num pool de PROCESSOS (não segura o GIL) com tamanho limitado.
+# Se a fila lotar, falhamos rápido (HashingBusy -> 503) em vez de travar as
+# leituras baratas atrás de uma rajada de logins.
+
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
+HASH_POOL_WORKERS = int(os.getenv("HASH_POOL_WORKERS", str(min(4, os.cpu_count() or 1))))
+HASH_QUEUE_SIZE = int(os.getenv("HASH_QUEUE_SIZE", "8")) # pedidos esperando além dos workers
+HASH_TIMEOUT = float(os.getenv("HASH_TIMEOUT", "10")) # segundos
+
+# min = max = default: qualquer hash com outro custo "precisa de update" e é refeito no login
+pwd_context = CryptContext(
+    schemes=["bcrypt"],
+    deprecated="auto",
+    bcrypt__default_rounds=BCRYPT_ROUNDS,
+    bcrypt__min_rounds=BCRYPT_ROUNDS,
+    bcrypt__max_rounds=BCRYPT_ROUNDS,
+)
+
+
+class HashingBusy(Exception):
+    pass
+
+
+# Funções executadas dentro dos processos do pool (precisam ser top-level)
+def _hash(password):
+    return pwd_context.hash(password)
+
+def _verify_and_update(password, hashed_password):
+    # Retorna (ok, novo_hash ou None) — novo hash se o custo configurado mudou
+    return pwd_context.verify_and_update(password, hashed_password)
+
+
+_executor = None
+_executor_lock = Lock()
+_slots = BoundedSemaphore(max(1, HASH_POOL_WORKERS) + HASH_QUEUE_SIZE)
+
+
+def _get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            # spawn: não herdamos threads/conexões do processo da API
+            _executor = ProcessPoolExecutor(
+                max_workers=HASH_POOL_WORKERS,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+        return _executor
+
+
+def submit(fn, *args) -> Future:
+    # Controle de admissão: sem vaga, falha na hora
+    if not _slots.acquire(blocking=False):
+        raise HashingBusy()
+
+    if HASH_POOL_WORKERS <= 0:
+        # Modo sem pool (dev/testes): roda inline, na thread de quem chamou
+        future = Future()
+        try:
+            future.set_result(fn(*args))
+        except Exception as exc:
+            future.set_exception(exc)
+        finally:
+            _slots.release()
+        return future
+
+    try:
+        future = _get_executor().submit(fn, *args)
+    except Exception:
+        _slots.release()
+        raise
+    future.add_done_callback(lambda _: _slots.release())
+    return future
+
+
+def run(fn, *args):
+    try:
+        return submit(fn, *args).result(timeout=HASH_TIMEOUT)
+    except TimeoutError:
+        raise HashingBusy()
+
+
+async def run_async(fn, *args):
+    # Versão para rotas async: espera o pool sem ocupar thread nenhuma
+    if HASH_POOL_WORKERS <= 0:
+        # Sem pool, o bcrypt inline travaria o event loop (e todos os requests):
+        # vai para o threadpool do Starlette, como nas rotas `def` de antes
+        return await run_in_threadpool(run, fn, *args)
+    try:
+        return await asyncio.wait_for(asyncio.wrap_future(submit(fn, *args)), HASH_TIMEOUT)
+    except asyncio.TimeoutError:
+        raise HashingBusy()
+
+
+def hash_password(password: str) -> str:
+    return run(_hash, password)
+
+
+def verify_and_update(password: str, hashed_password: str):
+    return run(_verify_and_update, password, hashed_password)
+
+
+async def hash_password_async(password: str) -> str:
+    return await run_async(_hash, password)
+
+
+async def verify_and_update_async(password: str, hashed_password: str):
+    return await run_async(_verify_and_update, password, hashed_password)
+
+
+def shutdown():
+    global _executor
+    with _executor_lock:
+        if _executor is not None:
+            _executor.shutdown(wait=False, cancel_futures=True)
+            _executor = None
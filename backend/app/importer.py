@@ -0,0 +1,316 @@
+import codecs
+import csv
+import hashlib
+import html
+import io
+import re
+from datetime import datetime
+from sqlalchemy import insert
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+from . import models, search, summary, versions
+from .strings import normalize
+
+# Importação de extrato bancário (CSV / OFX).
+# - Parse em streaming: lemos o arquivo aos pedaços, nunca ele inteiro
+# - Inserts em lotes (executemany) numa transação só; autocomplete acertado por lote
+# - Cada linha ganha uma import_key (hash da chave natural data/valor/tipo/descrição
+#   + nº da ocorrência no arquivo); com o índice único
+#   (owner_id, import_key), importar o mesmo extrato de novo não duplica nada
+
+BATCH_SIZE = 1000
+MAX_ERRORS = 50 # quantos erros detalhados devolvemos na resposta
+
+CSV_COLUMNS = {
+    "date": {"date", "data", "dt"},
+    "description": {"description", "descricao", "historico", "memo", "lancamento"},
+    "amount": {"amount", "valor", "value"},
+    "type": {"type", "tipo"},
+    "category": {"category", "categoria"},
+}
+
+
+class StatementError(ValueError):
+    pass
+
+
+def parse_amount(raw: str, decimal: str = None) -> float:
+    # decimal: "," (1.234,56) ou "." (1,234.56). Sem ele, o separador que vem
+    # por último é o decimal; um separador só, seguido de 3 dígitos ("1,234",
+    # "1.234"), é ambíguo e vira erro da linha em vez de um valor errado
+    raw = raw.strip().replace("R$", "").replace(" ", "").replace("\xa0", "")
+    if decimal is None:
+        last = max(raw.rfind(","), raw.rfind("."))
+        if last == -1:
+            decimal = "."
+        elif "," in raw and "." in raw:
+            decimal = raw[last]
+        elif raw.count(raw[last]) > 1:
+            decimal = "," if raw[last] == "." else "." # repetido: é o de milhar
+        elif len(raw) - last - 1 == 3:
+            raise ValueError(f"valor ambíguo: {raw!r} (informe decimal)")
+        else:
+            decimal = raw[last]
+    thousands = "." if decimal == "," else ","
+
+    integer, _, fraction = raw.partition(decimal)
+    if decimal in fraction or thousands in fraction:
+        raise ValueError(f"valor inválido: {raw!r}")
+    if thousands in integer:
+        groups = integer.lstrip("+-").split(thousands)
+        if not 1 <= len(groups[0]) <= 3 or any(len(g) != 3 for g in groups[1:]):
+            raise ValueError(f"valor inválido: {raw!r}")
+        integer = integer.replace(thousands, "")
+    return float(f"{integer}.{fraction}" if fraction else integer)
+
+
+def parse_date(raw: str) -> datetime:
+    raw = raw.strip()
+    for fmt in ("%Y-%m-%d", "%d/%m/%Y", "%d/%m/%y", "%Y-%m-%dT%H:%M:%S", "%Y%m%d"):
+        try:
+            date = datetime.strptime(raw[:19] if "T" in raw else raw[:10], fmt)
+            break
+        except ValueError:
+            continue
+    else:
+        raise ValueError(f"data inválida: {raw!r}")
+    # Meio-dia, mesmo truque do clone: o fuso não joga pro dia anterior
+    return date.replace(hour=12, minute=0, second=0)
+
+
+def make_row(date: str, description: str, amount: str, type: str = None, category: str = None, decimal: str = None):
+    value = parse_amount(amount, decimal)
+    if type:
+        type = normalize(type)
+        type = {"receita": "income", "entrada": "income", "credito": "income",
+                "despesa": "expense", "saida": "expense", "debito": "expense"}.get(type, type)
+    else:
+        type = "income" if value > 0 else "expense"
+    if type not in ("income", "expense"):
+        raise ValueError(f"tipo inválido: {type!r}")
+    description = " ".join((description or "").split())
+    if not description:
+        raise ValueError("descrição vazia")
+    return {
+        "date": parse_date(date),
+        "description": description,
+        "amount": round(abs(value), 2),
+        "type": type,
+        "category": category,
+    }
+
+
+# --- PARSERS (geradores de (linha, dict) ou (linha, erro)) ---
+
+def parse_csv(binary, decimal: str = None):
+    text = io.TextIOWrapper(binary, encoding="utf-8-sig", errors="replace", newline="")
+    first = text.readline()
+    dialect = ";" if first.count(";") > first.count(",") else ","
+    header = next(csv.reader([first], delimiter=dialect))
+
+    columns = {}
+    for index, name in enumerate(header):
+        for field, aliases in CSV_COLUMNS.items():
+            if normalize(name) in aliases:
+                columns[field] = index
+    missing = {"date", "description", "amount"} - columns.keys()
+    if missing:
+        raise StatementError(f"CSV sem as colunas: {', '.join(sorted(missing))}")
+
+    def get(values, field):
+        index = columns.get(field)
+        return values[index] if index is not None and index < len(values) else None
+
+    try:
+        for line, values in enumerate(csv.reader(text, delimiter=dialect), start=2):
+            if not any(values):
+                continue
+            try:
+                yield line, make_row(
+                    get(values, "date"), get(values, "description"), get(values, "amount"),
+                    get(values, "type"), get(values, "category"), decimal,
+                )
+            except (ValueError, TypeError, AttributeError) as exc:
+                yield line, exc
+    finally:
+        text.detach() # quem fecha o arquivo é o UploadFile
+
+
+OFX_TAG = re.compile(r"<(/?)([A-Za-z0-9.]+)>([^<]*)")
+
+
+def ofx_tokens(binary, chunk_size=64 * 1024):
+    # OFX é SGML (tags sem fechamento) ou XML; um tokenizador por tags dá conta dos dois
+    head = binary.read(chunk_size)
+    encoding = "utf-8" if b"UTF-8" in head[:512].upper() else "cp1252"
+    decoder = codecs.getincrementaldecoder(encoding)(errors="replace")
+    buffer = decoder.decode(head)
+
+    while True:
+        chunk = binary.read(chunk_size)
+        if chunk:
+            buffer += decoder.decode(chunk)
+            # Só processa até o último "<": o resto pode ser uma tag cortada no meio
+            cut = max(buffer.rfind("<"), 0)
+            ready, buffer = buffer[:cut], buffer[cut:]
+        else:
+            ready, buffer = buffer + decoder.decode(b"", final=True), ""
+
+        for closing, tag, value in OFX_TAG.findall(ready):
+            yield bool(closing), tag.upper(), html.unescape(value.strip()) # P&atilde;o -> Pão
+        if not chunk:
+            return
+
+
+def parse_ofx(binary, decimal: str = None):
+    current = None
+    count = 0
+    for closing, tag, value in ofx_tokens(binary):
+        if tag == "STMTTRN":
+            if not closing:
+                current = {}
+            elif current is not None:
+                count += 1
+                try:
+                    yield count, make_row(
+                        current.get("DTPOSTED", "")[:8], # 20240105120000[-3:BRT]
+                        current.get("MEMO") or current.get("NAME"),
+                        current.get("TRNAMT", ""),
+                        decimal=decimal,
+                    )
+                except (ValueError, TypeError) as exc:
+                    yield count, exc
+                current = None
+        elif current is not None and not closing:
+            current[tag] = value
+
+
+def natural_key(row) -> str:
+    return "|".join([
+        row["date"].date().isoformat(),
+        str(int(round(row["amount"] * 100))),
+        row["type"],
+        normalize(row["description"]),
+    ])
+
+
+def import_key(natural: str, occurrence: int) -> str:
+    # occurrence: dois cafés iguais no mesmo dia são lançamentos diferentes,
+    # mas o 2º café do arquivo sempre gera a mesma chave ao reimportar
+    return hashlib.sha1(f"{natural}#{occurrence}".encode()).hexdigest()
+
+
+# --- IMPORTAÇÃO ---
+
+def insert_new(db: Session, rows) -> set:
+    # INSERT ... ON CONFLICT DO NOTHING RETURNING import_key (executemany).
+    # Duas importações simultâneas do mesmo arquivo não estouram o índice único
+    # (owner_id, import_key): a segunda recebe de volta só o que inseriu de fato
+    dialect = db.get_bind().dialect.name
+    if dialect not in ("postgresql", "sqlite"):
+        db.execute(insert(models.Transaction), rows)
+        return {r["import_key"] for r in rows}
+    upsert = postgresql.insert if dialect == "postgresql" else sqlite.insert
+    stmt = upsert(models.Transaction)\
+        .on_conflict_do_nothing(index_elements=["owner_id", "import_key"])\
+        .returning(models.Transaction.import_key)
+    return set(db.execute(stmt, rows).scalars())
+
+
+def import_statement(db: Session, owner_id: int, binary, format: str, default_category_id: int = None,
+                     decimal: str = None):
+    categories = {
+        normalize(c.name): c.id
+        for c in db.query(models.Category).filter(models.Category.owner_id == owner_id)
+    }
+    if default_category_id is not None and default_category_id not in categories.values():
+        raise StatementError("Categoria padrão não encontrada")
+
+    if decimal not in (None, ",", "."):
+        raise StatementError("Separador decimal inválido (use , ou .)")
+    rows = parse_ofx(binary, decimal) if format == "ofx" else parse_csv(binary, decimal)
+
+    result = {"inserted": 0, "skipped": 0, "failed": 0, "errors": []}
+    seen = {} # digest da chave natural -> ocorrências (tamanho fixo por lançamento)
+    deltas = {}
+    batch = [] # (linha, dict)
+    version = None # data_version nova, criada no primeiro lote com linhas novas
+
+    def fail(line, error):
+        result["failed"] += 1
+        if len(result["errors"]) < MAX_ERRORS:
+            result["errors"].append({"line": line, "error": str(error)})
+
+    def flush():
+        nonlocal version
+        if not batch:
+            return
+        keys = [r["import_key"] for _, r in batch]
+        existing = {
+            key for (key,) in db.query(models.Transaction.import_key).filter(
+                models.Transaction.owner_id == owner_id,
+                models.Transaction.import_key.in_(keys),
+            )
+        }
+        fresh = []
+        for line, r in batch:
+            if r["import_key"] in existing:
+                result["skipped"] += 1
+            elif r["category_id"] is None:
+                # Só linha nova precisa de categoria: reimportar sem default_category_id
+                # continua dando "skipped" para o que já entrou
+                fail(line, "categoria não encontrada (informe default_category_id)")
+            else:
+                fresh.append(r)
+        batch.clear()
+        if not fresh:
+            return
+
+        # Versão nova só se algo entrar de fato; vai em change_seq (sync incremental)
+        if version is None:
+            version = versions.bump(db, owner_id)
+        for r in fresh:
+            r["change_seq"] = version
+        inserted = insert_new(db, fresh)
+        result["inserted"] += len(inserted)
+        result["skipped"] += len(fresh) - len(inserted) # entraram por outra importação simultânea
+
+        # Autocomplete: agrupado por lote e aplicado junto, sem guardar o arquivo todo
+        uses = {}
+        for r in fresh:
+            if r["import_key"] not in inserted:
+                continue
+            key = (r["date"].year, r["date"].month, r["category_id"], r["type"])
+            total, count = deltas.get(key, (0.0, 0))
+            deltas[key] = (total + r["amount"], count + 1)
+            entry = uses.setdefault((normalize(r["description"]), r["category_id"]), [r["description"], 0, None])
+            entry[1] += 1
+            if entry[2] is None or r["date"] > entry[2]:
+                entry[0], entry[2] = r["description"], r["date"]
+        search.remember_counts(db, owner_id, uses)
+
+    for line, row in rows:
+        if isinstance(row, Exception):
+            fail(line, row)
+            continue
+
+        natural = natural_key(row)
+        digest = hashlib.blake2b(natural.encode(), digest_size=16).digest()
+        occurrence = seen.get(digest, 0)
+        seen[digest] = occurrence + 1
+        row["import_key"] = import_key(natural, occurrence)
+
+        # Categoria é conferida no flush(), depois de saber se a linha já foi importada
+        category_id = categories.get(normalize(row.pop("category") or ""), default_category_id)
+        row.update(owner_id=owner_id, category_id=category_id, is_fixed=False)
+        batch.append((line, row))
+        if len(batch) >= BATCH_SIZE:
+            flush()
+    flush()
+
+    # Rollup mensal: um delta por mês/categoria/tipo, não por linha
+    for (year, month, category_id, type), (total, count) in deltas.items():
+        summary.apply(db, owner_id, datetime(year, month, 1), category_id, type, total, count)
+
+    db.commit()
+    return result
@@ -1,15 +1,24 @@
-from fastapi import FastAPI, Depends, HTTPException, status
-from sqlalchemy.orm import Session
-from sqlalchemy import extract # 👈 Importante para filtrar por mês
+import os
+from fastapi import FastAPI, Depends, File, HTTPException, Query, Request, Response, UploadFile, status
 from fastapi.security import OAuth2PasswordRequestForm
-from datetime import timedelta
-from typing import List
-from . import models, schemas, database, auth
+from datetime import date, timedelta
+from typing import List, Optional, Union
+from fastapi.responses import FileResponse, JSONResponse, StreamingResponse
+from . import models, schemas, database, auth, summary, analytics, batch, crud, hashing, importer, recurrence, reports, search, sync, versions, serializers, metrics
 
 # Cria as tabelas se não existirem
 models.Base.metadata.create_all(bind=database.engine)
+recurrence.unlink_duplicate_sources(database.engine) # antes do índice único das regras
+database.upgrade_schema(models.Base.metadata)
+search.install(database.engine)
+with database.SessionLocal() as db:
+    summary.backfill(db) # rollup vazio num banco que já tem transações
+    sync.purge(db) # tombstones fora da janela de retenção
+    db.commit()
 
 app = FastAPI()
+# Rotas cronometradas: separa o tempo de serialização do tempo do endpoint
+app.router.route_class = metrics.TimedRoute
 
 # Configuração de CORS
 from fastapi.middleware.cors import CORSMiddleware
@@ -19,244 +28,407 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "ETag"],
 )
 
-def get_db():
-    db = database.SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
+# Respostas grandes (listagem, /sync) vão comprimidas para quem aceita gzip
+from fastapi.middleware.gzip import GZipMiddleware
+app.add_middleware(GZipMiddleware, minimum_size=1000, compresslevel=6)
+
+# Por último = mais externo: mede o request inteiro e adiciona o Server-Timing
+app.add_middleware(metrics.RequestMetricsMiddleware)
+
+# Pool de bcrypt lotado: responde 503 na hora em vez de segurar o worker
+@app.exception_handler(hashing.HashingBusy)
+def hashing_busy_handler(request: Request, exc: hashing.HashingBusy):
+    return JSONResponse(
+        status_code=503,
+        content={"detail": "Muitas tentativas de login no momento, tente novamente"},
+        headers={"Retry-After": "1"},
+    )
 
-def get_current_user(token: str = Depends(auth.oauth2_scheme), db: Session = Depends(get_db)):
-    user = auth.get_current_user(token, db)
+# Fila de relatórios lotada: mesmo tratamento
+@app.exception_handler(reports.ReportsBusy)
+def reports_busy_handler(request: Request, exc: reports.ReportsBusy):
+    return JSONResponse(
+        status_code=503,
+        content={"detail": "Muitos relatórios na fila, tente novamente em instantes"},
+        headers={"Retry-After": "5"},
+    )
+
+@app.on_event("shutdown")
+async def shutdown_pools():
+    hashing.shutdown()
+    reports.shutdown()
+    if database.async_engine is not None:
+        await database.async_engine.dispose()
+
+# Sessão do banco: Session (DB_MODE=sync) ou AsyncSession (DB_MODE=async).
+# As rotas são async e chamam a lógica do crud.py via database.run()
+get_db = database.get_session
+
+async def get_current_user(token: str = Depends(auth.oauth2_scheme), db = Depends(get_db)):
+    payload = auth.decode_token(token)
+    user = None
+    if payload:
+        # Cache / claim uid primeiro; só vai ao banco quando precisa
+        user = auth.cached_principal(payload) or await database.run(db, auth.lookup_principal, payload)
     if not user:
         raise HTTPException(status_code=401, detail="Token inválido")
     return user
 
+async def not_modified(
+    request: Request,
+    response: Response,
+    db = Depends(get_db),
+    current_user: auth.Principal = Depends(get_current_user)
+):
+    # GET condicional: ETag fraco a partir da versão dos dados do usuário.
+    # Se o cliente já tem essa versão, 304 sem consultar as tabelas nem serializar
+    version = versions.cached(current_user.id)
+    if version is None:
+        version = await database.run(db, versions.load, current_user.id)
+
+    variant = f"{request.url.path}?{request.url.query}"
+    if request.url.path.startswith("/analytics/"):
+        # As janelas das análises terminam no mês atual: virou o mês, muda a
+        # resposta mesmo sem escrita nova
+        variant += f"#{analytics.current_month()}"
+    tag = versions.etag(current_user.id, version, variant)
+    if versions.matches(request.headers.get("if-none-match"), tag):
+        raise HTTPException(status_code=304, headers={"ETag": tag})
+    response.headers["ETag"] = tag
+
 # --- ROTAS DE AUTENTICAÇÃO ---
 
 @app.post("/token", response_model=schemas.Token)
-def login_for_access_token(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db)):
-    user = auth.authenticate_user(db, form_data.username, form_data.password)
-    if not user:
+async def login_for_access_token(form_data: OAuth2PasswordRequestForm = Depends(), db = Depends(get_db)):
+    credentials = await database.run(db, auth.find_credentials, form_data.username)
+    if not credentials:
+        raise HTTPException(status_code=401, detail="Email ou senha incorretos")
+
+    user, hashed_password = credentials
+    ok, new_hash = await hashing.verify_and_update_async(form_data.password, hashed_password)
+    if not ok:
         raise HTTPException(status_code=401, detail="Email ou senha incorretos")
+    if new_hash:
+        # BCRYPT_ROUNDS mudou: refaz o hash de forma transparente no login
+        await database.run(db, auth.update_password_hash, user.id, new_hash)
     
     access_token_expires = timedelta(minutes=auth.ACCESS_TOKEN_EXPIRE_MINUTES)
     access_token = auth.create_access_token(
-        data={"sub": user.email}, expires_delta=access_token_expires
+        data={"sub": user.email, "uid": user.id}, expires_delta=access_token_expires
     )
     return {"access_token": access_token, "token_type": "bearer"}
 
 @app.post("/users/", response_model=schemas.UserResponse)
-def create_user(user: schemas.UserCreate, db: Session = Depends(get_db)):
-    db_user = db.query(models.User).filter(models.User.email == user.email).first()
+async def create_user(user: schemas.UserCreate, db = Depends(get_db)):
+    db_user = await database.run(db, crud.get_user_by_email, user.email)
     if db_user:
         raise HTTPException(status_code=400, detail="Email já cadastrado")
     
-    hashed_password = auth.get_password_hash(user.password)
-    new_user = models.User(email=user.email, hashed_password=hashed_password)
-    db.add(new_user)
-    db.commit()
-    db.refresh(new_user)
-    return new_user
+    hashed_password = await hashing.hash_password_async(user.password)
+    return await database.run(db, crud.create_user, user.email, hashed_password)
+
+@app.get("/metrics", include_in_schema=False)
+def get_metrics():
+    # Formato texto do Prometheus: histogramas por rota + cache de auth + pool
+    cache = auth.principal_cache.stats()
+    frames = analytics.frames.stats()
+    pool = (database.async_engine.sync_engine if database.async_engine is not None else database.engine).pool
+    body = metrics.render([
+        metrics.gauge("auth_principal_cache_hits_total", "Hits do cache de principal", cache["hits"], "counter"),
+        metrics.gauge("auth_principal_cache_misses_total", "Misses do cache de principal", cache["misses"], "counter"),
+        metrics.gauge("auth_principal_cache_db_lookups_total", "Principais buscados no banco", cache["db_lookups"], "counter"),
+        metrics.gauge("auth_principal_cache_size", "Entradas no cache de principal", cache["size"]),
+        metrics.gauge("analytics_cache_hits_total", "Hits do cache de arrays de análise", frames["hits"], "counter"),
+        metrics.gauge("analytics_cache_misses_total", "Misses do cache de arrays de análise", frames["misses"], "counter"),
+        metrics.gauge("analytics_cache_bytes", "Memória dos arrays de análise em cache", frames["bytes"]),
+        metrics.gauge("db_pool_checked_out", "Conexões em uso", pool.checkedout()),
+        metrics.gauge("db_pool_size", "Conexões fixas do pool", pool.size()),
+    ])
+    return Response(body, media_type="text/plain; version=0.0.4")
 
 # --- ROTAS DE TRANSAÇÕES ---
 
 # 👇 ROTA NOVA: CLONAR MÊS ANTERIOR
 @app.post("/transactions/clone")
-def clone_fixed_transactions(
+async def clone_fixed_transactions(
     target_year: int,
     target_month: int,
-    db: Session = Depends(get_db),
-    current_user: models.User = Depends(get_current_user)
+    db = Depends(get_db),
+    current_user: auth.Principal = Depends(get_current_user)
 ):
-    # 1. Calcular qual é o mês anterior
-    if target_month == 1:
-        prev_month = 12
-        prev_year = target_year - 1
-    else:
-        prev_month = target_month - 1
-        prev_year = target_year
-
-    # 2. Buscar transações FIXAS do mês anterior
-    old_txs = db.query(models.Transaction).filter(
-        models.Transaction.owner_id == current_user.id,
-        models.Transaction.is_fixed == True,
-        extract('month', models.Transaction.date) == prev_month,
-        extract('year', models.Transaction.date) == prev_year
-    ).all()
-
-    if not old_txs:
-        return {"message": "Nenhuma despesa fixa encontrada no mês anterior."}
-
-    count = 0
-    for tx in old_txs:
-        # 3. Criar a nova data
-        # TRUQUE: Forçamos hour=12 (meio-dia) para evitar que o fuso horário jogue pro dia anterior
-        try:
-            new_date = tx.date.replace(year=target_year, month=target_month, hour=12, minute=0, second=0)
-        except ValueError:
-            # Se cair num dia inválido (ex: 30 de fev), joga pro dia 1º ao meio-dia
-            new_date = tx.date.replace(year=target_year, month=target_month, day=2, hour=12, minute=0, second=0)
-
-            print(f"--- CLONANDO: {tx.description} | PARA A DATA: {new_date} ---")
-
-        new_tx = models.Transaction(
-            description=tx.description,
-            amount=tx.amount,
-            type=tx.type,
-            date=new_date,
-            is_fixed=True, 
-            category_id=tx.category_id,
-            owner_id=current_user.id
+    return await database.run(db, crud.clone_fixed_transactions, current_user.id, target_year, target_month)
+
+# Importação de extrato (CSV/OFX) em lote, idempotente
+@app.post("/transactions/import", response_model=schemas.ImportResult)
+async def import_transactions(
+    file: UploadFile = File(...),
+    format: Optional[str] = None,
+    default_category_id: Optional[int] = None,
+    decimal: Optional[str] = None, # "," ou "."; sem ele, detecta por linha
+    current_user: auth.Principal = Depends(get_current_user)
+):
+    format = (format or file.filename.rsplit(".", 1)[-1]).lower()
+    if format not in ("csv", "ofx"):
+        raise HTTPException(status_code=400, detail="Formato não suportado (use csv ou ofx)")
+
+    try:
+        # Sessão síncrona própria no threadpool: o parse é pesado
+        return await database.run_blocking(
+            importer.import_statement, current_user.id, file.file, format, default_category_id, decimal
         )
-        db.add(new_tx)
-        count += 1
+    except importer.StatementError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
 
-    db.commit()
-    return {"message": f"{count} transações clonadas!"}
+# Edição em lote (seleção múltipla): tudo ou nada, numa transação só
+@app.post("/transactions/batch", response_model=schemas.BatchResult)
+async def batch_transactions(
+    body: schemas.BatchRequest,
+    db = Depends(get_db),
+    current_user: auth.Principal = Depends(get_current_user)
+):
+    try:
+        return await database.run(db, batch.apply_batch, current_user.id, body.operations)
+    except batch.BatchError as exc:
+        return JSONResponse(status_code=400, content={"detail": str(exc), "results": exc.results})
 
 @app.post("/transactions/", response_model=schemas.TransactionResponse)
-def create_transaction(
+async def create_transaction(
     transaction: schemas.TransactionCreate, 
-    db: Session = Depends(get_db),
-    current_user: models.User = Depends(get_current_user)
+    db = Depends(get_db),
+    current_user: auth.Principal = Depends(get_current_user)
 ):
-    category = db.query(models.Category).filter(models.Category.id == transaction.category_id).first()
-    db_transaction = models.Transaction(**transaction.dict(), owner_id=current_user.id)
-    db.add(db_transaction)
-    db.commit()
-    db.refresh(db_transaction)
-    return db_transaction
+    return await database.run(db, crud.create_transaction, current_user.id, transaction)
 
-@app.get("/transactions/", response_model=List[schemas.TransactionResponse])
-def read_transactions(
+@app.get("/transactions/", response_model=Union[List[schemas.TransactionResponse], schemas.TransactionListCompact], dependencies=[Depends(not_modified)])
+async def read_transactions(
+    response: Response,
     skip: int = 0, 
-    limit: int = 1000, 
-    db: Session = Depends(get_db),
-    current_user: models.User = Depends(get_current_user)
+    limit: int = Query(1000, ge=1), 
+    month: Optional[int] = None,
+    year: Optional[int] = None,
+    cursor: Optional[str] = None,
+    compact: bool = False,
+    format: str = Query("json", pattern="^(json|ndjson|columns)$"),
+    db = Depends(get_db),
+    current_user: auth.Principal = Depends(get_current_user)
 ):
-    transactions = db.query(models.Transaction)\
-                     .filter(models.Transaction.owner_id == current_user.id)\
-                     .order_by(models.Transaction.date.desc())\
-                     .offset(skip).limit(limit).all()
-    return transactions
+    # json: caminho rápido (tuplas + orjson), mesmo formato de antes.
+    # ndjson / columns: streaming, linhas no formato compacto (ver app/serializers.py)
+    if format == "json":
+        body, next_cursor = await database.run(
+            db, crud.list_transaction_rows, current_user.id,
+            skip=skip, limit=limit, month=month, year=year, cursor=cursor, compact=compact,
+        )
+        result = Response(body, media_type="application/json")
+    else:
+        rows, next_cursor = await database.open_stream(
+            crud.stream_transaction_rows, current_user.id,
+            skip=skip, limit=limit, month=month, year=year, cursor=cursor,
+        )
+        if format == "ndjson":
+            result = StreamingResponse(serializers.ndjson(rows), media_type="application/x-ndjson")
+        else:
+            result = StreamingResponse(serializers.columns(rows), media_type="application/json")
+
+    # Devolvendo a Response pronta, os cabeçalhos das dependências (ETag) vão à mão
+    result.headers.update(response.headers)
+    if next_cursor:
+        result.headers["X-Next-Cursor"] = next_cursor
+    return result
+
+@app.get("/transactions/search", response_model=List[schemas.TransactionResponse], dependencies=[Depends(not_modified)])
+async def search_transactions(
+    response: Response,
+    q: str = Query(..., min_length=1),
+    category_id: Optional[int] = None,
+    min_amount: Optional[float] = None,
+    max_amount: Optional[float] = None,
+    start_date: Optional[date] = None,
+    end_date: Optional[date] = None,
+    skip: int = 0,
+    limit: int = Query(50, ge=1, le=200),
+    db = Depends(get_db),
+    current_user: auth.Principal = Depends(get_current_user)
+):
+    # Sem acento e sem caixa, mais relevantes primeiro (ver app/search.py)
+    body = await database.run(
+        db, search.search_transactions, current_user.id, q,
+        category_id=category_id, min_amount=min_amount, max_amount=max_amount,
+        start_date=start_date, end_date=end_date, skip=skip, limit=limit,
+    )
+    result = Response(body, media_type="application/json")
+    result.headers.update(response.headers)
+    return result
+
+@app.get("/transactions/autocomplete", response_model=List[schemas.DescriptionSuggestion], dependencies=[Depends(not_modified)])
+async def autocomplete_description(
+    q: str = Query(..., min_length=1),
+    limit: int = Query(10, ge=1, le=50),
+    db = Depends(get_db),
+    current_user: auth.Principal = Depends(get_current_user)
+):
+    return await database.run(db, search.suggest, current_user.id, q, limit)
 
 @app.put("/transactions/{transaction_id}", response_model=schemas.TransactionResponse)
-def update_transaction(
+async def update_transaction(
     transaction_id: int, 
     transaction: schemas.TransactionCreate, 
-    db: Session = Depends(get_db),
-    current_user: models.User = Depends(get_current_user)
+    db = Depends(get_db),
+    current_user: auth.Principal = Depends(get_current_user)
 ):
-    db_transaction = db.query(models.Transaction).filter(
-        models.Transaction.id == transaction_id,
-        models.Transaction.owner_id == current_user.id
-    ).first()
-    
-    if not db_transaction:
-        raise HTTPException(status_code=404, detail="Transação não encontrada")
-    
-    # 👇 A MÁGICA É AQUI: O "if value is not None"
-    # Isso impede que o sistema apague a data original se o frontend mandar vazio
-    for key, value in transaction.dict().items():
-        if value is not None: 
-            setattr(db_transaction, key, value)
-    
-    db.commit()
-    db.refresh(db_transaction)
-    return db_transaction
+    return await database.run(db, crud.update_transaction, current_user.id, transaction_id, transaction)
 
 @app.delete("/transactions/{transaction_id}")
-def delete_transaction(
+async def delete_transaction(
     transaction_id: int, 
-    db: Session = Depends(get_db),
-    current_user: models.User = Depends(get_current_user)
+    db = Depends(get_db),
+    current_user: auth.Principal = Depends(get_current_user)
 ):
-    db_transaction = db.query(models.Transaction).filter(
-        models.Transaction.id == transaction_id,
-        models.Transaction.owner_id == current_user.id
-    ).first()
-    
-    if not db_transaction:
-        raise HTTPException(status_code=404, detail="Transação não encontrada")
-        
-    db.delete(db_transaction)
-    db.commit()
-    return {"detail": "Transação deletada"}
+    return await database.run(db, crud.delete_transaction, current_user.id, transaction_id)
+
+# --- SYNC (APP MOBILE) ---
+
+@app.get("/sync", response_model=schemas.SyncResponse, dependencies=[Depends(not_modified)])
+async def sync_changes(
+    response: Response,
+    since: Optional[int] = Query(None, ge=0),
+    db = Depends(get_db),
+    current_user: auth.Principal = Depends(get_current_user)
+):
+    # O que mudou desde o cursor (ver app/sync.py). Sem cursor, ou com um cursor
+    # velho demais, vem tudo com "full": true
+    body = await database.run(db, sync.changes, current_user.id, since)
+    result = Response(body, media_type="application/json")
+    result.headers.update(response.headers)
+    return result
+
+# --- ROTAS DE RESUMO ---
+
+@app.get("/summary", response_model=schemas.MonthSummary, dependencies=[Depends(not_modified)])
+async def get_month_summary(
+    year: int,
+    month: int,
+    db = Depends(get_db),
+    current_user: auth.Principal = Depends(get_current_user)
+):
+    return await database.run(db, summary.month_summary, current_user.id, year, month)
+
+@app.get("/summary/range", response_model=List[schemas.MonthTotals], dependencies=[Depends(not_modified)])
+async def get_range_summary(
+    start_year: int,
+    end_year: int,
+    db = Depends(get_db),
+    current_user: auth.Principal = Depends(get_current_user)
+):
+    return await database.run(db, summary.range_summary, current_user.id, start_year, end_year)
+
+# --- ANÁLISES (NumPy, ver app/analytics.py) ---
+
+@app.get("/analytics/trends", response_model=schemas.Trends, dependencies=[Depends(not_modified)])
+async def get_trends(
+    years: int = Query(3, ge=1, le=20),
+    type: str = Query("expense", pattern="^(income|expense)$"),
+    db = Depends(get_db),
+    current_user: auth.Principal = Depends(get_current_user)
+):
+    return await database.run(db, analytics.trends, current_user.id, years, type)
+
+@app.get("/analytics/rolling", response_model=schemas.RollingSeries, dependencies=[Depends(not_modified)])
+async def get_rolling(
+    months: int = Query(24, ge=1, le=240),
+    window: int = Query(3, ge=1, le=24),
+    category_id: Optional[int] = None,
+    db = Depends(get_db),
+    current_user: auth.Principal = Depends(get_current_user)
+):
+    return await database.run(db, analytics.rolling, current_user.id, months, window, category_id)
+
+@app.get("/analytics/forecast", response_model=schemas.Forecast, dependencies=[Depends(not_modified)])
+async def get_forecast(
+    months: int = Query(6, ge=1, le=36),
+    history: int = Query(12, ge=1, le=120),
+    db = Depends(get_db),
+    current_user: auth.Principal = Depends(get_current_user)
+):
+    return await database.run(db, analytics.forecast, current_user.id, months, history)
+
+# --- RELATÓRIOS (PDF) ---
+
+@app.post("/reports", response_model=schemas.ReportResponse, status_code=202)
+async def create_report(
+    body: schemas.ReportRequest,
+    response: Response,
+    db = Depends(get_db),
+    current_user: auth.Principal = Depends(get_current_user)
+):
+    # Gera em background (ver app/reports.py); acompanhar em GET /reports/{id}
+    report, enqueue = await database.run(db, reports.request_report, current_user.id, body.year, body.month)
+    if enqueue:
+        try:
+            reports.enqueue(report["id"])
+        except reports.ReportsBusy:
+            await database.run(db, reports.mark_failed, report["id"], "Fila de relatórios cheia")
+            raise
+    if report["status"] == "ready":
+        response.status_code = 200 # mesmo período, mesma versão: já está pronto
+    response.headers["Location"] = f"/reports/{report['id']}"
+    return report
+
+@app.get("/reports/{report_id}", response_model=schemas.ReportResponse)
+async def get_report(
+    report_id: int,
+    db = Depends(get_db),
+    current_user: auth.Principal = Depends(get_current_user)
+):
+    report = await database.run(db, reports.get_report, current_user.id, report_id)
+    path = report.pop("path")
+    if report["status"] == "pending":
+        return JSONResponse(report, status_code=202, headers={"Retry-After": "1"})
+    if report["status"] == "failed":
+        # O pedido em si deu certo: 200 com o estado (e o erro) do job, para não
+        # confundir com um 500 do servidor. Um novo POST gera de novo
+        return report
+
+    path = reports.file_path(path)
+    if not os.path.exists(path):
+        # Arquivo sumiu (outro servidor, disco limpo): o próximo POST gera de novo
+        await database.run(db, reports.mark_failed, report_id, "Arquivo não encontrado")
+        raise HTTPException(status_code=404, detail="Arquivo do relatório não encontrado, peça de novo")
+    name = f"extrato-{report['year']}" + (f"-{report['month']:02d}" if report["month"] else "") + ".pdf"
+    return FileResponse(path, media_type="application/pdf", filename=name)
 
 # --- ROTAS DE CATEGORIAS ---
 
-@app.get("/categories", response_model=List[schemas.CategoryResponse])
-def get_categories(db: Session = Depends(get_db), current_user: models.User = Depends(get_current_user)):
-    return db.query(models.Category).filter(models.Category.owner_id == current_user.id).all()
+@app.get("/categories", response_model=List[schemas.CategoryResponse], dependencies=[Depends(not_modified)])
+async def get_categories(db = Depends(get_db), current_user: auth.Principal = Depends(get_current_user)):
+    return await database.run(db, crud.list_categories, current_user.id)
 
 @app.post("/categories/", response_model=schemas.CategoryResponse)
-def create_category(
+async def create_category(
     category: schemas.CategoryCreate, 
-    db: Session = Depends(get_db),
-    current_user: models.User = Depends(get_current_user)
+    db = Depends(get_db),
+    current_user: auth.Principal = Depends(get_current_user)
 ):
-    exists = db.query(models.Category).filter(
-        models.Category.name == category.name,
-        models.Category.owner_id == current_user.id
-    ).first()
-    
-    if exists:
-        raise HTTPException(status_code=400, detail="Categoria já existe")
-        
-    new_category = models.Category(
-        name=category.name,
-        icon=category.icon,
-        color=category.color,
-        owner_id=current_user.id
-    )
-    db.add(new_category)
-    db.commit()
-    db.refresh(new_category)
-    return new_category
+    return await database.run(db, crud.create_category, current_user.id, category)
 
 @app.delete("/categories/{category_id}")
-def delete_category(
+async def delete_category(
     category_id: int, 
-    db: Session = Depends(get_db),
-    current_user: models.User = Depends(get_current_user)
+    reassign_to: Optional[int] = None,
+    db = Depends(get_db),
+    current_user: auth.Principal = Depends(get_current_user)
 ):
-    db_cat = db.query(models.Category).filter(
-        models.Category.id == category_id,
-        models.Category.owner_id == current_user.id
-    ).first()
-    
-    if not db_cat:
-        raise HTTPException(status_code=404, detail="Categoria não encontrada")
-    
-    if db_cat.transactions:
-        raise HTTPException(status_code=400, detail="Não é possível apagar categoria com transações.")
-
-    db.delete(db_cat)
-    db.commit()
-    return {"detail": "Categoria deletada"}
+    # Com reassign_to, as transações vão para essa categoria antes de apagar
+    return await database.run(db, crud.delete_category, current_user.id, category_id, reassign_to)
 
 @app.put("/categories/{category_id}", response_model=schemas.CategoryResponse)
-def update_category(
+async def update_category(
     category_id: int, 
     category: schemas.CategoryCreate, 
-    db: Session = Depends(get_db),
-    current_user: models.User = Depends(get_current_user)
+    db = Depends(get_db),
+    current_user: auth.Principal = Depends(get_current_user)
 ):
-    db_cat = db.query(models.Category).filter(
-        models.Category.id == category_id,
-        models.Category.owner_id == current_user.id
-    ).first()
-    
-    if not db_cat:
-        raise HTTPException(status_code=404, detail="Categoria não encontrada")
-    
-    db_cat.name = category.name
-    db_cat.icon = category.icon
-    db_cat.color = category.color
-    
-    db.commit()
-    db.refresh(db_cat)
-    return db_cat
\ No newline at end of file
+    return await database.run(db, crud.update_category, current_user.id, category_id, category)
@@ -0,0 +1,258 @@
+import functools
+import inspect
+import logging
+import os
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar
+from threading import Lock
+from fastapi.routing import APIRoute
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+
+# Instrumentação por request: quantas queries, tempo no banco, espera por
+# conexão do pool e tempo de serialização. Vai para o cabeçalho Server-Timing
+# e para histogramas no formato do Prometheus (GET /metrics).
+#
+# Como funciona: o RequestMetricsMiddleware abre um RequestStats num ContextVar;
+# os eventos do engine (database.py), o pool cronometrado e a TimedRoute somam
+# nele. O threadpool e o run_sync() herdam o contexto, então tudo cai no
+# request certo sem passar nada por parâmetro.
+
+SLOW_QUERY_MS = float(os.getenv("SLOW_QUERY_MS", "200"))
+QUERY_COUNT_WARN = int(os.getenv("QUERY_COUNT_WARN", "20")) # N+1 costuma aparecer aqui
+
+logger = logging.getLogger("app.metrics")
+
+
+class RequestStats:
+    __slots__ = ("queries", "sql_time", "pool_wait", "serialize_time", "endpoint_done")
+
+    def __init__(self):
+        self.queries = 0
+        self.sql_time = 0.0
+        self.pool_wait = 0.0
+        self.serialize_time = 0.0
+        self.endpoint_done = None
+
+
+current: ContextVar = ContextVar("request_stats", default=None)
+
+
+# --- HISTOGRAMAS ---
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+
+class Histogram:
+    def __init__(self, name: str, help: str, buckets, labels=()):
+        self.name = name
+        self.help = help
+        self.buckets = tuple(buckets)
+        self.labels = tuple(labels)
+        self._series = {} # valores dos labels -> ([contagem por bucket], soma, total)
+        self._lock = Lock()
+
+    def observe(self, value: float, *label_values):
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(label_values)
+            if series is None:
+                series = self._series[label_values] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            series = [(k, list(v[0]), v[1], v[2]) for k, v in self._series.items()]
+        for label_values, counts, total, count in sorted(series):
+            labels = ",".join(f'{n}="{_escape(v)}"' for n, v in zip(self.labels, label_values))
+            prefix = labels + "," if labels else ""
+            cumulative = 0
+            for bound, n in zip(self.buckets, counts):
+                cumulative += n
+                lines.append(f'{self.name}_bucket{{{prefix}le="{bound}"}} {cumulative}')
+            lines.append(f'{self.name}_bucket{{{prefix}le="+Inf"}} {count}')
+            lines.append(f"{self.name}_sum{{{labels}}} {total}")
+            lines.append(f"{self.name}_count{{{labels}}} {count}")
+        return lines
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def gauge(name: str, help: str, value, type: str = "gauge"):
+    return [f"# HELP {name} {help}", f"# TYPE {name} {type}", f"{name} {value}"]
+
+
+request_duration = Histogram(
+    "http_request_duration_seconds", "Latência total do request",
+    LATENCY_BUCKETS, ("method", "route", "status"),
+)
+request_queries = Histogram(
+    "http_request_sql_queries", "Queries SQL por request", COUNT_BUCKETS, ("method", "route"),
+)
+request_sql_time = Histogram(
+    "http_request_sql_seconds", "Tempo em SQL por request", LATENCY_BUCKETS, ("method", "route"),
+)
+request_pool_wait = Histogram(
+    "http_request_pool_wait_seconds", "Espera por conexão do pool por request", LATENCY_BUCKETS, ("method", "route"),
+)
+request_serialize_time = Histogram(
+    "http_request_serialize_seconds", "Tempo de serialização da resposta", LATENCY_BUCKETS, ("method", "route"),
+)
+
+HISTOGRAMS = (request_duration, request_queries, request_sql_time, request_pool_wait, request_serialize_time)
+
+
+# --- COLETA ---
+
+def record_query(statement: str, elapsed: float):
+    # Chamado pelo after_cursor_execute dos engines (database.py)
+    stats = current.get()
+    if stats is not None:
+        stats.queries += 1
+        stats.sql_time += elapsed
+    if elapsed * 1000 >= SLOW_QUERY_MS:
+        logger.warning("query lenta (%.1fms): %s", elapsed * 1000, " ".join(statement.split())[:500])
+
+
+def record_pool_wait(elapsed: float):
+    stats = current.get()
+    if stats is not None:
+        stats.pool_wait += elapsed
+
+
+def record_serialize(elapsed: float):
+    stats = current.get()
+    if stats is not None:
+        stats.serialize_time += elapsed
+
+
+@contextmanager
+def serializing():
+    # Serialização feita DENTRO do endpoint (caminho rápido: orjson e Response
+    # pronta). A TimedRoute só enxerga o que acontece depois do endpoint, então
+    # sem isso esse tempo some do "ser" e aparece como tempo do handler
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_serialize(time.perf_counter() - start)
+
+
+class TimedQueuePool(QueuePool):
+    # QueuePool que mede quanto cada checkout esperou por uma conexão livre
+    # (inclui abrir conexão nova quando o pool ainda está crescendo)
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            record_pool_wait(time.perf_counter() - start)
+
+
+class TimedAsyncQueuePool(AsyncAdaptedQueuePool):
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            record_pool_wait(time.perf_counter() - start)
+
+
+class TimedRoute(APIRoute):
+    # Marca quando o endpoint terminou; o que sobra até a Response ficar pronta
+    # é validação do response_model + JSON (= serialização). A serialização
+    # feita dentro do endpoint soma à parte, com serializing()
+    def get_route_handler(self):
+        endpoint = self.dependant.call
+
+        @functools.wraps(endpoint)
+        async def timed_endpoint(*args, **kwargs):
+            try:
+                return await endpoint(*args, **kwargs)
+            finally:
+                stats = current.get()
+                if stats is not None:
+                    stats.endpoint_done = time.perf_counter()
+
+        if inspect.iscoroutinefunction(endpoint):
+            self.dependant.call = timed_endpoint
+        handler = super().get_route_handler()
+
+        async def timed_handler(request):
+            response = await handler(request)
+            stats = current.get()
+            if stats is not None and stats.endpoint_done is not None:
+                stats.serialize_time += time.perf_counter() - stats.endpoint_done
+            return response
+        return timed_handler
+
+
+class RequestMetricsMiddleware:
+    # Middleware ASGI puro (sem BaseHTTPMiddleware): não bufferiza o corpo,
+    # então o streaming continua funcionando
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        stats = RequestStats()
+        token = current.set(stats)
+        start = time.perf_counter()
+        status = 500
+
+        async def send_with_timing(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                message.setdefault("headers", [])
+                message["headers"] = list(message["headers"]) + [
+                    (b"server-timing", server_timing(stats, time.perf_counter() - start).encode())
+                ]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            current.reset(token)
+            elapsed = time.perf_counter() - start
+            route = scope.get("route")
+            path = route.path if route is not None else "unmatched"
+            observe(scope["method"], path, status, elapsed, stats)
+
+
+def server_timing(stats: RequestStats, elapsed: float) -> str:
+    return (
+        f'app;dur={elapsed * 1000:.1f}, '
+        f'db;dur={stats.sql_time * 1000:.1f};desc="{stats.queries} queries", '
+        f'pool;dur={stats.pool_wait * 1000:.1f}, '
+        f'ser;dur={stats.serialize_time * 1000:.1f}'
+    )
+
+
+def observe(method: str, route: str, status: int, elapsed: float, stats: RequestStats):
+    request_duration.observe(elapsed, method, route, status)
+    request_queries.observe(stats.queries, method, route)
+    request_sql_time.observe(stats.sql_time, method, route)
+    request_pool_wait.observe(stats.pool_wait, method, route)
+    request_serialize_time.observe(stats.serialize_time, method, route)
+    if stats.queries >= QUERY_COUNT_WARN:
+        logger.warning("%s %s fez %d queries (%.1fms em SQL) — N+1?",
+                       method, route, stats.queries, stats.sql_time * 1000)
+
+
+def render(extra=()) -> str:
+    lines = []
+    for histogram in HISTOGRAMS:
+        lines += histogram.render()
+    for item in extra:
+        lines += item
+    return "\n".join(lines) + "\n"
@@ -1,4 +1,4 @@
-from sqlalchemy import Boolean, Column, Integer, String, Float, DateTime, ForeignKey, func
+from sqlalchemy import Boolean, Column, Integer, String, Float, DateTime, ForeignKey, Index, UniqueConstraint, func
 from sqlalchemy.orm import relationship
 from .database import Base
 
@@ -8,6 +8,8 @@ class User(Base):
     id = Column(Integer, primary_key=True, index=True)
     email = Column(String, unique=True, index=True)
     hashed_password = Column(String)
+    data_version = Column(Integer, nullable=False, default=0, server_default="0") # sobe a cada escrita (ETag)
+    sync_floor = Column(Integer, nullable=False, default=0, server_default="0") # cursor mínimo do /sync (ver app/sync.py)
 
     # Relacionamentos
     transactions = relationship("Transaction", back_populates="owner")
@@ -15,11 +17,15 @@ class User(Base):
 
 class Category(Base):
     __tablename__ = "categories"
+    __table_args__ = (
+        Index("ix_categories_owner_change_seq", "owner_id", "change_seq"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     name = Column(String, index=True)
     icon = Column(String)
     color = Column(String)
+    change_seq = Column(Integer, nullable=False, default=0, server_default="0") # data_version da última escrita
     
     owner_id = Column(Integer, ForeignKey("users.id"))
     
@@ -29,6 +35,16 @@ class Category(Base):
 
 class Transaction(Base):
     __tablename__ = "transactions"
+    __table_args__ = (
+        # Filtro por período + paginação keyset (ORDER BY date DESC, id DESC)
+        Index("ix_transactions_owner_date_id", "owner_id", "date", "id"),
+        # Chave natural dos lançamentos importados (ver app/importer.py): reimportar é idempotente
+        Index("ix_transactions_owner_import_key", "owner_id", "import_key", unique=True),
+        # Uma ocorrência por regra por mês: materializar de novo não duplica
+        Index("ix_transactions_rule_period", "rule_id", "period", unique=True),
+        # Sync incremental: o que mudou depois do cursor (ver app/sync.py)
+        Index("ix_transactions_owner_change_seq", "owner_id", "change_seq"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     description = Column(String, index=True)
@@ -36,10 +52,106 @@ class Transaction(Base):
     type = Column(String) # 'income' ou 'expense'
     date = Column(DateTime(timezone=True), server_default=func.now())
     is_fixed = Column(Boolean, default=False) # Nossa coluna nova aqui!
+    import_key = Column(String) # hash de (data, valor, tipo, descrição); só nas importadas
+    rule_id = Column(Integer, ForeignKey("recurring_rules.id")) # só nas recorrentes
+    period = Column(Integer) # ano * 12 + (mês - 1) da ocorrência; só nas recorrentes
+    change_seq = Column(Integer, nullable=False, default=0, server_default="0") # data_version da última escrita
 
     category_id = Column(Integer, ForeignKey("categories.id"))
     owner_id = Column(Integer, ForeignKey("users.id"))
     
     # Relacionamentos
     category = relationship("Category", back_populates="transactions")
-    owner = relationship("User", back_populates="transactions")
\ No newline at end of file
+    owner = relationship("User", back_populates="transactions")
+
+class MonthlySummary(Base):
+    # Tabela de rollup: um registro por usuário/mês/categoria/tipo.
+    # Mantida incrementalmente pelas rotas de escrita (ver app/summary.py)
+    __tablename__ = "monthly_summaries"
+    __table_args__ = (
+        UniqueConstraint("owner_id", "year", "month", "category_id", "type", name="uq_monthly_summary_key"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    owner_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    year = Column(Integer, nullable=False)
+    month = Column(Integer, nullable=False)
+    category_id = Column(Integer, ForeignKey("categories.id"))
+    type = Column(String, nullable=False)
+    total = Column(Float, nullable=False, default=0)
+    count = Column(Integer, nullable=False, default=0)
+
+class RecurringRule(Base):
+    # Despesa/receita fixa como regra de recorrência (ver app/recurrence.py).
+    # As transações de cada mês são geradas a partir daqui, em lote
+    __tablename__ = "recurring_rules"
+    __table_args__ = (
+        # Uma regra por transação de origem: dois clones simultâneos não duplicam
+        Index("uq_recurring_rules_source_transaction", "source_transaction_id", unique=True),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    owner_id = Column(Integer, ForeignKey("users.id"), nullable=False, index=True)
+    description = Column(String)
+    amount = Column(Float)
+    type = Column(String)
+    category_id = Column(Integer, ForeignKey("categories.id"))
+    day_of_month = Column(Integer, nullable=False)
+    start_period = Column(Integer, nullable=False) # primeiro mês (ano * 12 + mês - 1)
+    end_period = Column(Integer) # último mês; NULL = sem fim
+    active = Column(Boolean, nullable=False, default=True)
+    source_transaction_id = Column(Integer) # transação fixa que originou a regra (único)
+
+class DescriptionStat(Base):
+    # Índice de frequência das descrições por usuário, para o autocomplete
+    # (ver app/search.py). key = descrição normalizada (minúsculas, sem acento);
+    # uma linha por (usuário, key, categoria) com quantas vezes foi usada
+    __tablename__ = "description_stats"
+    __table_args__ = (
+        # Também atende a busca por prefixo: owner_id = ? AND key >= ? AND key < ?
+        UniqueConstraint("owner_id", "key", "category_id", name="uq_description_stats_key"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    owner_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    # Collation "C" no PostgreSQL: ordem byte a byte, o intervalo de prefixo fica exato
+    key = Column(String().with_variant(String(collation="C"), "postgresql"), nullable=False)
+    description = Column(String, nullable=False) # como foi digitada da última vez
+    category_id = Column(Integer, ForeignKey("categories.id"))
+    count = Column(Integer, nullable=False, default=0)
+    last_used = Column(DateTime(timezone=True))
+
+class Tombstone(Base):
+    # Registro de exclusão para o sync incremental (ver app/sync.py).
+    # Guardado por SYNC_RETENTION_DAYS; depois disso o cliente faz sync completo
+    __tablename__ = "tombstones"
+    __table_args__ = (
+        Index("ix_tombstones_owner_change_seq", "owner_id", "change_seq"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    owner_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    kind = Column(String, nullable=False) # 'transaction' ou 'category'
+    entity_id = Column(Integer, nullable=False)
+    change_seq = Column(Integer, nullable=False)
+    deleted_at = Column(DateTime(timezone=True), nullable=False, server_default=func.now(), index=True)
+
+class Report(Base):
+    # Relatório em PDF gerado fora do request (ver app/reports.py).
+    # Uma linha por (usuário, período, versão dos dados): pedir de novo o mesmo
+    # período sem nada ter mudado devolve o arquivo que já existe
+    __tablename__ = "reports"
+    __table_args__ = (
+        UniqueConstraint("owner_id", "period", "data_version", name="uq_reports_key"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    owner_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    period = Column(String, nullable=False) # "2026-05" (mensal) ou "2026" (anual)
+    data_version = Column(Integer, nullable=False)
+    status = Column(String, nullable=False, default="pending") # 'pending', 'ready' ou 'failed'
+    path = Column(String) # relativo a REPORT_DIR
+    size = Column(Integer)
+    error = Column(String)
+    requested_at = Column(DateTime(timezone=True))
+    finished_at = Column(DateTime(timezone=True))
@@ -0,0 +1,266 @@
+import argparse
+import calendar
+from datetime import datetime
+from sqlalchemy import Integer, and_, case, cast, exists, extract, func, insert, inspect, literal, or_, select, true, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+from . import models, search, summary, filters, versions
+
+# Motor de recorrência: despesas/receitas fixas viram regras (RecurringRule)
+# e cada mês é materializado com UM INSERT ... SELECT, sem trazer nada pro Python.
+# É idempotente: o índice único (rule_id, period) + NOT EXISTS garantem
+# uma ocorrência por regra por mês, não importa quantas vezes rode.
+
+Rule = models.RecurringRule
+Tx = models.Transaction
+
+CHUNK_SIZE = 500 # usuários por lote no job de virada de mês
+
+
+def period_of(year: int, month: int) -> int:
+    return year * 12 + (month - 1)
+
+
+def previous_month(year: int, month: int):
+    return (year - 1, 12) if month == 1 else (year, month - 1)
+
+
+def adopt_fixed(db: Session, year: int, month: int, owner_ids=None) -> int:
+    # Transações marcadas is_fixed ainda sem regra (criadas pela API) viram regras.
+    # Set-based: INSERT ... SELECT das regras + UPDATE correlacionado ligando a transação
+    start, end = filters.month_range(year, month)
+    period = period_of(year, month)
+
+    orphan = and_(
+        Tx.is_fixed == True,
+        Tx.rule_id.is_(None),
+        Tx.date >= start,
+        Tx.date < end,
+    )
+    if owner_ids is not None:
+        orphan = and_(orphan, Tx.owner_id.in_(owner_ids))
+
+    owners = sorted(owner_id for (owner_id,) in db.execute(select(Tx.owner_id).where(orphan).distinct()))
+    if not owners:
+        return 0
+
+    # Versão nova ANTES de adotar: o UPDATE trava a linha dos usuários, então dois
+    # clones ao mesmo tempo (duplo clique, cron + clone) rodam um depois do outro
+    # e o segundo já não vê as fixas que o primeiro ligou
+    versions.bump_many(db, owners, affected=owners)
+
+    # Regra que ainda aponta para um id sem regra é sobra de uma transação apagada
+    # (o SQLite reaproveita ids): desliga antes, senão a transação nova herdaria a regra velha
+    orphan_ids = select(Tx.id).where(orphan)
+    db.execute(
+        update(Rule).where(Rule.source_transaction_id.in_(orphan_ids))
+        .values(source_transaction_id=None)
+        .execution_options(synchronize_session=False)
+    )
+
+    stmt = upsert(db, Rule).from_select(
+        ["owner_id", "description", "amount", "type", "category_id",
+         "day_of_month", "start_period", "active", "source_transaction_id"],
+        select(
+            Tx.owner_id, Tx.description, Tx.amount, Tx.type, Tx.category_id,
+            cast(extract("day", Tx.date), Integer), literal(period), true(), Tx.id,
+        ).where(orphan),
+    )
+    if hasattr(stmt, "on_conflict_do_nothing"):
+        # Índice único em source_transaction_id: uma regra por transação, mesmo com corrida
+        stmt = stmt.on_conflict_do_nothing(index_elements=["source_transaction_id"])
+    created = db.execute(stmt).rowcount
+
+    if created:
+        rule_id = select(Rule.id).where(Rule.source_transaction_id == Tx.id).scalar_subquery()
+        db.execute(update(Tx).where(orphan).values(rule_id=rule_id, period=period))
+    return created
+
+
+def upsert(db: Session, table):
+    # INSERT com ON CONFLICT quando o dialeto tem (PostgreSQL / SQLite)
+    dialect = db.get_bind().dialect.name
+    if dialect == "postgresql":
+        return postgresql.insert(table)
+    if dialect == "sqlite":
+        return sqlite.insert(table)
+    return insert(table)
+
+
+def unlink_duplicate_sources(engine):
+    # Antes do índice único em source_transaction_id (upgrade_schema): bancos
+    # antigos podem ter regras repetidas para a mesma transação (corrida no clone).
+    # As que sobram são cópias da mesma fixa: saem do ar (senão geram a despesa
+    # em dobro todo mês) e perdem o vínculo; as ocorrências já criadas ficam
+    if not inspect(engine).has_table(Rule.__tablename__):
+        return
+    if any(i["name"] == "uq_recurring_rules_source_transaction"
+           for i in inspect(engine).get_indexes(Rule.__tablename__)):
+        return
+    # Por transação de origem: a regra ligada a ela ou, sem nenhuma (transação apagada), a de menor id
+    keep = select(func.coalesce(func.max(Tx.rule_id), func.min(Rule.id)))\
+        .select_from(Rule)\
+        .outerjoin(Tx, and_(Tx.id == Rule.source_transaction_id, Tx.rule_id == Rule.id))\
+        .where(Rule.source_transaction_id.isnot(None))\
+        .group_by(Rule.source_transaction_id)
+    with engine.begin() as conn:
+        count = conn.execute(
+            update(Rule).where(Rule.source_transaction_id.isnot(None), Rule.id.not_in(keep))
+            .values(source_transaction_id=None, active=False)
+        ).rowcount
+    if count:
+        print(f"🛠️ Regras recorrentes repetidas desativadas: {count}")
+
+
+def materialize(db: Session, year: int, month: int, owner_ids=None) -> int:
+    # Gera as ocorrências do mês para todas as regras ativas (de alguns usuários ou de todos)
+    period = period_of(year, month)
+    last_day = calendar.monthrange(year, month)[1]
+
+    # Data da ocorrência: dia da regra, limitado ao último dia do mês (31 -> 28/fev).
+    # Meio-dia, mesmo truque de sempre contra o fuso. O CASE evita SQL de data por dialeto
+    date = case(
+        {day: datetime(year, month, min(day, last_day), 12) for day in range(1, 32)},
+        value=Rule.day_of_month,
+        else_=datetime(year, month, last_day, 12),
+    )
+
+    already = exists().where(Tx.rule_id == Rule.id, Tx.period == period)
+    rules = and_(
+        Rule.active == True,
+        Rule.start_period <= period,
+        or_(Rule.end_period.is_(None), Rule.end_period >= period),
+        ~already,
+    )
+    if owner_ids is not None:
+        rules = and_(rules, Rule.owner_id.in_(owner_ids))
+
+    # As regras pendentes, lidas antes do INSERT: donos (versão) e descrições (autocomplete)
+    pending = db.execute(select(Rule.owner_id, Rule.description, Rule.category_id, date).where(rules)).all()
+
+    if not pending:
+        return 0
+
+    # Versão nova ANTES do INSERT: cada ocorrência leva a data_version do dono
+    # em change_seq (sync incremental, ver app/sync.py)
+    owners = sorted({owner_id for owner_id, *_ in pending})
+    versions.bump_many(db, owners, affected=owners)
+    data_version = select(models.User.data_version).where(models.User.id == Rule.owner_id).scalar_subquery()
+
+    created = db.execute(insert(Tx).from_select(
+        ["description", "amount", "type", "date", "is_fixed", "category_id", "owner_id", "rule_id", "period", "change_seq"],
+        select(
+            Rule.description, Rule.amount, Rule.type, date, true(),
+            Rule.category_id, Rule.owner_id, Rule.id, literal(period), data_version,
+        ).where(rules),
+    )).rowcount
+    if created:
+        search.remember_many(db, pending)
+    return created
+
+
+def roll_month(db: Session, year: int, month: int, owner_ids=None) -> int:
+    # Fixas novas do mês anterior viram regras; depois gera o mês alvo e acerta o rollup
+    adopt_fixed(db, *previous_month(year, month), owner_ids=owner_ids)
+    created = materialize(db, year, month, owner_ids=owner_ids)
+    if created:
+        summary.rebuild_month(db, year, month, owner_ids=owner_ids) # a versão já subiu no materialize()
+    return created
+
+
+def follow_edit(db: Session, tx: models.Transaction):
+    # Edição de uma ocorrência vale para os próximos meses (ou encerra a regra)
+    if tx.rule_id is None:
+        return
+    rule = db.query(Rule).filter(Rule.id == tx.rule_id).first()
+    if rule is None:
+        return
+    if not tx.is_fixed:
+        rule.end_period = tx.period - 1
+        return
+    rule.description = tx.description
+    rule.amount = tx.amount
+    rule.type = tx.type
+    rule.category_id = tx.category_id
+
+
+def follow_edit_many(db: Session, tx_ids):
+    # Versão em lote do follow_edit, chamada DEPOIS do UPDATE: uma vez por regra.
+    # Ocorrência que deixou de ser fixa encerra a regra antes dela; senão a regra
+    # segue a ocorrência editada mais recente
+    latest, unfixed = {}, {}
+    for tx in db.query(Tx).filter(Tx.id.in_(tx_ids)).order_by(Tx.period).populate_existing():
+        latest[tx.rule_id] = tx
+        if not tx.is_fixed:
+            unfixed.setdefault(tx.rule_id, tx)
+    for rule in db.query(Rule).filter(Rule.id.in_(list(latest))).populate_existing():
+        if rule.id in unfixed:
+            rule.end_period = unfixed[rule.id].period - 1
+            continue
+        tx = latest[rule.id]
+        rule.description = tx.description
+        rule.amount = tx.amount
+        rule.type = tx.type
+        rule.category_id = tx.category_id
+
+
+def follow_delete(db: Session, tx: models.Transaction):
+    # Apagar a ocorrência mais recente encerra a regra — como antes, quando
+    # o clone só copiava o que existia no mês anterior
+    if tx.rule_id is None:
+        return
+    later = db.query(Tx.id).filter(Tx.rule_id == tx.rule_id, Tx.period > tx.period).first()
+    if later is None:
+        db.query(Rule).filter(Rule.id == tx.rule_id)\
+          .update({Rule.end_period: tx.period - 1}, synchronize_session=False)
+
+
+def follow_delete_many(db: Session, latest):
+    # Versão em lote do follow_delete, chamada DEPOIS do DELETE.
+    # latest: (rule_id, maior período apagado) por regra
+    for rule_id, period in latest:
+        later = db.query(Tx.id).filter(Tx.rule_id == rule_id, Tx.period > period).first()
+        if later is None:
+            db.query(Rule).filter(Rule.id == rule_id)\
+              .update({Rule.end_period: period - 1}, synchronize_session=False)
+
+
+def roll_forward(session_factory, year: int, month: int, chunk_size: int = CHUNK_SIZE) -> int:
+    # Job de virada de mês para TODOS os usuários, em lotes de chunk_size
+    # (uma transação por lote: lote que falha não desfaz os anteriores)
+    total = 0
+    last_id = 0
+    while True:
+        db = session_factory()
+        try:
+            owner_ids = [
+                user_id for (user_id,) in db.query(models.User.id)
+                .filter(models.User.id > last_id)
+                .order_by(models.User.id)
+                .limit(chunk_size)
+            ]
+            if not owner_ids:
+                return total
+            total += roll_month(db, year, month, owner_ids=owner_ids)
+            db.commit()
+            last_id = owner_ids[-1]
+        finally:
+            db.close()
+
+
+# Uso (cron no dia 1º): python -m app.recurrence roll [--year 2026 --month 3] [--chunk 500]
+if __name__ == "__main__":
+    from . import database
+
+    today = datetime.now()
+    parser = argparse.ArgumentParser(description="Materializa as transações recorrentes do mês")
+    parser.add_argument("command", choices=["roll"])
+    parser.add_argument("--year", type=int, default=today.year)
+    parser.add_argument("--month", type=int, default=today.month)
+    parser.add_argument("--chunk", type=int, default=CHUNK_SIZE)
+    args = parser.parse_args()
+
+    models.Base.metadata.create_all(bind=database.engine)
+    database.upgrade_schema(models.Base.metadata)
+    created = roll_forward(database.SessionLocal, args.year, args.month, args.chunk)
+    print(f"✅ {created} transações recorrentes geradas para {args.month:02d}/{args.year}")
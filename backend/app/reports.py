@@ -0,0 +1,383 @@
+import argparse
+import logging
+import multiprocessing
+import os
+import tempfile
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from datetime import datetime, timezone
+from threading import BoundedSemaphore, Lock
+from fastapi import HTTPException
+from fpdf import FPDF
+from sqlalchemy import func
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from . import models, summary, filters, versions
+
+# Relatórios em PDF (extrato mensal ou anual), gerados FORA do request.
+#
+# POST /reports cria (ou reaproveita) um registro em `reports` e manda o
+# trabalho para um pool de processos, como o bcrypt em app/hashing.py: o fpdf
+# é Python puro e seguraria o GIL do worker da API. GET /reports/{id} responde
+# 202 enquanto o arquivo não fica pronto e depois serve o PDF em streaming.
+#
+# Cache: a chave é (usuário, período, data_version). Sem escrita nova, pedir o
+# mesmo período devolve o arquivo que já existe; com escrita nova, a versão
+# muda e um PDF novo é gerado (o antigo é apagado quando o novo fica pronto).
+#
+# A listagem de transações é lida com yield_per: um ano inteiro não vai para
+# a memória de uma vez, só o documento que o fpdf monta.
+
+# Padrão: backend/reports (fora do git), não importa de onde o servidor rodar
+REPORT_DIR = os.getenv("REPORT_DIR", os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "reports"))
+REPORT_WORKERS = int(os.getenv("REPORT_WORKERS", str(min(2, os.cpu_count() or 1))))
+REPORT_QUEUE_SIZE = int(os.getenv("REPORT_QUEUE_SIZE", "16")) # pedidos esperando além dos workers
+REPORT_TIMEOUT = float(os.getenv("REPORT_TIMEOUT", "300")) # segundos até um 'pending' ser refeito
+ROW_CHUNK = 1000
+
+Report = models.Report
+Summary = models.MonthlySummary
+Tx = models.Transaction
+
+logger = logging.getLogger("app.reports")
+
+MONTHS = ["Janeiro", "Fevereiro", "Março", "Abril", "Maio", "Junho",
+          "Julho", "Agosto", "Setembro", "Outubro", "Novembro", "Dezembro"]
+
+
+class ReportsBusy(Exception):
+    pass
+
+
+def period_key(year: int, month: int = None) -> str:
+    return f"{year:04d}-{month:02d}" if month else f"{year:04d}"
+
+
+def parse_period(period: str):
+    year, _, month = period.partition("-")
+    return int(year), int(month) if month else None
+
+
+def describe(report: models.Report) -> dict:
+    year, month = parse_period(report.period)
+    return {
+        "id": report.id,
+        "year": year,
+        "month": month,
+        "status": report.status,
+        "data_version": report.data_version,
+        "size": report.size,
+        "error": report.error,
+    }
+
+
+def file_path(path: str) -> str:
+    return os.path.join(REPORT_DIR, path)
+
+
+def _now():
+    return datetime.now(timezone.utc)
+
+
+def _age(moment) -> float:
+    # SQLite devolve datetime sem fuso (gravado em UTC)
+    if moment is None:
+        return float("inf")
+    if moment.tzinfo is None:
+        moment = moment.replace(tzinfo=timezone.utc)
+    return (_now() - moment).total_seconds()
+
+
+# --- PEDIDOS (lado da API) ---
+
+def request_report(db: Session, owner_id: int, year: int, month: int = None):
+    # Retorna (descrição, precisa_enfileirar)
+    if month is not None and not 1 <= month <= 12:
+        raise HTTPException(status_code=400, detail="Mês inválido")
+
+    period = period_key(year, month)
+    version = versions.load(db, owner_id)
+    match = (Report.owner_id == owner_id, Report.period == period, Report.data_version == version)
+
+    report = db.query(Report).filter(*match).first()
+    if report is None:
+        report = Report(owner_id=owner_id, period=period, data_version=version,
+                        status="pending", requested_at=_now())
+        db.add(report)
+        try:
+            db.commit()
+            return describe(report), True
+        except IntegrityError:
+            # Outro request criou o mesmo relatório ao mesmo tempo: usa o dele
+            db.rollback()
+            report = db.query(Report).filter(*match).one()
+
+    # Falhou, ou ficou 'pending' demais (worker reiniciado no meio): tenta de novo
+    stuck = report.status == "pending" and _age(report.requested_at) > REPORT_TIMEOUT
+    if report.status == "failed" or stuck:
+        report.status = "pending"
+        report.error = None
+        report.requested_at = _now()
+        db.commit()
+        return describe(report), True
+    return describe(report), False
+
+
+def get_report(db: Session, owner_id: int, report_id: int) -> dict:
+    report = db.query(Report).filter(Report.id == report_id, Report.owner_id == owner_id).first()
+    if report is None:
+        raise HTTPException(status_code=404, detail="Relatório não encontrado")
+    if report.status == "pending" and _age(report.requested_at) > REPORT_TIMEOUT:
+        # Worker morreu no meio: para de mandar o cliente esperar
+        report.status, report.error = "failed", "Tempo esgotado"
+        db.commit()
+    info = describe(report)
+    info["path"] = report.path
+    return info
+
+
+def mark_failed(db: Session, report_id: int, error: str):
+    db.query(Report).filter(Report.id == report_id)\
+      .update({Report.status: "failed", Report.error: error[:500], Report.finished_at: _now()},
+              synchronize_session=False)
+    db.commit()
+
+
+# --- POOL DE WORKERS ---
+
+_executor = None
+_executor_lock = Lock()
+_slots = BoundedSemaphore(max(1, REPORT_WORKERS) + REPORT_QUEUE_SIZE)
+
+
+def _get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            if REPORT_WORKERS <= 0:
+                # Sem processos (dev/testes): uma thread, ainda fora do request
+                _executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="reports")
+            else:
+                # spawn: não herdamos threads/conexões do processo da API
+                _executor = ProcessPoolExecutor(
+                    max_workers=REPORT_WORKERS,
+                    mp_context=multiprocessing.get_context("spawn"),
+                )
+        return _executor
+
+
+def enqueue(report_id: int):
+    # Controle de admissão: fila cheia falha na hora (503), como no hashing
+    if not _slots.acquire(blocking=False):
+        raise ReportsBusy()
+    try:
+        future = _get_executor().submit(render_job, report_id)
+    except Exception:
+        _slots.release()
+        raise
+    future.add_done_callback(_finished)
+
+
+def _finished(future):
+    _slots.release()
+    if not future.cancelled() and future.exception() is not None:
+        logger.error("worker de relatórios falhou: %r", future.exception())
+
+
+def shutdown():
+    global _executor
+    with _executor_lock:
+        if _executor is not None:
+            _executor.shutdown(wait=False, cancel_futures=True)
+            _executor = None
+
+
+# --- GERAÇÃO (lado do worker) ---
+
+def render_job(report_id: int):
+    # Roda no processo do pool (precisa ser top-level): sessão síncrona própria
+    from . import database
+
+    db = database.SessionLocal()
+    try:
+        report = db.query(Report).filter(Report.id == report_id).first()
+        if report is None or report.status != "pending":
+            return
+        try:
+            path = render(db, report)
+        except Exception as exc:
+            logger.exception("falha ao gerar o relatório %s", report_id)
+            db.rollback()
+            mark_failed(db, report_id, str(exc) or type(exc).__name__)
+            return
+
+        report.status = "ready"
+        report.path = path
+        report.size = os.path.getsize(file_path(path))
+        report.finished_at = _now()
+
+        # Versões antigas do mesmo período não servem mais
+        older = db.query(Report).filter(
+            Report.owner_id == report.owner_id,
+            Report.period == report.period,
+            Report.data_version < report.data_version,
+        ).all()
+        for old in older:
+            db.delete(old)
+        db.commit()
+        for old in older:
+            if old.path and os.path.exists(file_path(old.path)):
+                os.remove(file_path(old.path))
+    finally:
+        db.close()
+
+
+def _text(value) -> str:
+    # As fontes padrão do PDF são latin-1: acentos passam, emoji vira "?"
+    return str(value if value is not None else "").encode("latin-1", "replace").decode("latin-1")
+
+
+def money(value: float) -> str:
+    # 1234.5 -> "R$ 1.234,50"
+    formatted = f"{abs(value):,.2f}".replace(",", "X").replace(".", ",").replace("X", ".")
+    return f"{'-' if value < 0 else ''}R$ {formatted}"
+
+
+class StatementPDF(FPDF):
+    def footer(self):
+        self.set_y(-12)
+        self.set_font("Helvetica", "", 8)
+        self.set_text_color(120)
+        self.cell(0, 5, _text(f"Página {self.page_no()}/{{nb}}"), 0, 0, "R")
+
+
+def category_totals(db: Session, owner_id: int, year: int, month: int = None):
+    # Do rollup mensal (app/summary.py): custo pelo número de categorias, não de transações
+    query = db.query(
+        Summary.type,
+        models.Category.name,
+        func.sum(Summary.total).label("total"),
+        func.sum(Summary.count).label("count"),
+    ).outerjoin(models.Category, models.Category.id == Summary.category_id)\
+     .filter(Summary.owner_id == owner_id, Summary.year == year)
+    if month is not None:
+        query = query.filter(Summary.month == month)
+    return query.group_by(Summary.type, Summary.category_id, models.Category.name)\
+                .order_by(Summary.type.desc(), func.sum(Summary.total).desc())\
+                .all()
+
+
+def render(db: Session, report: models.Report) -> str:
+    # Gera o PDF e devolve o caminho relativo a REPORT_DIR
+    year, month = parse_period(report.period)
+    owner_id = report.owner_id
+    email = db.query(models.User.email).filter(models.User.id == owner_id).scalar()
+
+    pdf = StatementPDF(format="A4")
+    pdf.alias_nb_pages()
+    pdf.set_auto_page_break(True, margin=15)
+    pdf.add_page()
+
+    title = f"Extrato de {MONTHS[month - 1]} de {year}" if month else f"Extrato anual de {year}"
+    pdf.set_font("Helvetica", "B", 16)
+    pdf.cell(0, 10, _text(title), 0, 1)
+    pdf.set_font("Helvetica", "", 9)
+    pdf.set_text_color(120)
+    pdf.cell(0, 5, _text(f"{email} - gerado em {datetime.now():%d/%m/%Y %H:%M}"), 0, 1)
+    pdf.set_text_color(0)
+    pdf.ln(4)
+
+    # Totais
+    categories = category_totals(db, owner_id, year, month)
+    income = round(sum(c.total for c in categories if c.type == "income"), 2)
+    expense = round(sum(c.total for c in categories if c.type == "expense"), 2)
+    pdf.set_font("Helvetica", "", 11)
+    for label, value in (("Receitas", income), ("Despesas", expense), ("Saldo", income - expense)):
+        pdf.cell(40, 7, _text(label), 0, 0)
+        pdf.cell(50, 7, _text(money(value)), 0, 1, "R")
+    pdf.ln(4)
+
+    def table_header(*columns):
+        pdf.set_font("Helvetica", "B", 9)
+        pdf.set_fill_color(235)
+        for label, width, align in columns:
+            pdf.cell(width, 6, _text(label), 0, 0, align, 1)
+        pdf.ln()
+        pdf.set_font("Helvetica", "", 9)
+
+    # Por categoria
+    pdf.set_font("Helvetica", "B", 12)
+    pdf.cell(0, 8, "Por categoria", 0, 1)
+    table_header(("Categoria", 80, "L"), ("Tipo", 30, "L"), ("Qtd", 20, "R"), ("Total", 50, "R"))
+    for c in categories:
+        pdf.cell(80, 6, _text(c.name or "Sem categoria"), 0, 0)
+        pdf.cell(30, 6, "Receita" if c.type == "income" else "Despesa", 0, 0)
+        pdf.cell(20, 6, str(c.count), 0, 0, "R")
+        pdf.cell(50, 6, _text(money(c.total)), 0, 1, "R")
+    pdf.ln(4)
+
+    # Anual: mês a mês
+    if month is None:
+        pdf.set_font("Helvetica", "B", 12)
+        pdf.cell(0, 8, _text("Mês a mês"), 0, 1)
+        table_header(("Mês", 45, "L"), ("Receitas", 45, "R"), ("Despesas", 45, "R"), ("Saldo", 45, "R"))
+        for m in summary.range_summary(db, owner_id, year, year):
+            pdf.cell(45, 6, _text(MONTHS[m["month"] - 1]), 0, 0)
+            pdf.cell(45, 6, _text(money(m["income"])), 0, 0, "R")
+            pdf.cell(45, 6, _text(money(m["expense"])), 0, 0, "R")
+            pdf.cell(45, 6, _text(money(m["balance"])), 0, 1, "R")
+        pdf.ln(4)
+
+    # Transações, em streaming do banco
+    start, end = filters.period_range(year, month)
+    rows = db.query(Tx.date, Tx.description, models.Category.name, Tx.type, Tx.amount)\
+             .outerjoin(models.Category, models.Category.id == Tx.category_id)\
+             .filter(Tx.owner_id == owner_id, Tx.date >= start, Tx.date < end)\
+             .order_by(Tx.date, Tx.id)\
+             .yield_per(ROW_CHUNK)
+
+    pdf.set_font("Helvetica", "B", 12)
+    pdf.cell(0, 8, _text("Transações"), 0, 1)
+    table_header(("Data", 22, "L"), ("Descrição", 88, "L"), ("Categoria", 40, "L"), ("Valor", 30, "R"))
+    for date, description, category, type, amount in rows:
+        pdf.cell(22, 5, f"{date:%d/%m/%Y}" if date else "", 0, 0)
+        pdf.cell(88, 5, _text((description or "")[:55]), 0, 0)
+        pdf.cell(40, 5, _text((category or "")[:24]), 0, 0)
+        pdf.cell(30, 5, _text(money(-amount if type == "expense" else amount)), 0, 1, "R")
+
+    # Escreve num temporário e renomeia: GET nunca vê um arquivo pela metade.
+    # Temporário único na mesma pasta: um pedido refeito (REPORT_TIMEOUT) enquanto
+    # o primeiro worker ainda escreve não mistura os dois arquivos
+    path = os.path.join(str(owner_id), f"{report.period}-v{report.data_version}.pdf")
+    target = file_path(path)
+    os.makedirs(os.path.dirname(target), exist_ok=True)
+    fd, temporary = tempfile.mkstemp(dir=os.path.dirname(target), suffix=".tmp")
+    os.close(fd)
+    try:
+        pdf.output(temporary, "F")
+        os.replace(temporary, target)
+    except BaseException:
+        os.remove(temporary)
+        raise
+    return path
+
+
+# Uso: python -m app.reports render --user 1 --year 2026 [--month 5]
+# Gera na hora, sem pool (para conferir o layout)
+if __name__ == "__main__":
+    from . import database
+
+    parser = argparse.ArgumentParser(description="Gera um extrato em PDF")
+    parser.add_argument("command", choices=["render"])
+    parser.add_argument("--user", type=int, required=True)
+    parser.add_argument("--year", type=int, required=True)
+    parser.add_argument("--month", type=int, default=None)
+    args = parser.parse_args()
+
+    models.Base.metadata.create_all(bind=database.engine)
+    db = database.SessionLocal()
+    try:
+        report = Report(owner_id=args.user, period=period_key(args.year, args.month),
+                        data_version=versions.load(db, args.user))
+        print(f"✅ {file_path(render(db, report))}")
+    finally:
+        db.close()
@@ -58,4 +58,161 @@ class TransactionResponse(TransactionBase):
     category: Optional[CategoryResponse] = None
 
     class Config:
-        orm_mode = True
\ No newline at end of file
+        orm_mode = True
+
+# Modo compacto: categorias vão uma vez só, e cada transação aponta pelo category_id
+class TransactionCompact(TransactionBase):
+    id: int
+    date: datetime
+    owner_id: int
+
+    class Config:
+        orm_mode = True
+
+class TransactionListCompact(BaseModel):
+    categories: List[CategoryResponse]
+    transactions: List[TransactionCompact]
+
+# Autocomplete: descrição + a categoria que o usuário costuma usar com ela
+class DescriptionSuggestion(BaseModel):
+    description: str
+    category_id: Optional[int] = None
+    category_name: Optional[str] = None
+    count: int
+
+# Sync incremental do app mobile (ver app/sync.py)
+class SyncDeleted(BaseModel):
+    categories: List[int] = []
+    transactions: List[int] = []
+
+class SyncResponse(BaseModel):
+    cursor: int # mandar de volta em ?since= no próximo sync
+    full: bool # true: substituir tudo o que o cliente tem
+    categories: List[CategoryResponse] = []
+    transactions: List[TransactionCompact] = []
+    deleted: SyncDeleted
+
+# --- RESUMOS ---
+class CategoryTotal(BaseModel):
+    category_id: Optional[int] = None
+    name: Optional[str] = None
+    color: Optional[str] = None
+    type: str
+    total: float
+    count: int
+
+class MonthTotals(BaseModel):
+    year: int
+    month: int
+    income: float
+    expense: float
+    balance: float
+
+class MonthSummary(MonthTotals):
+    categories: List[CategoryTotal] = []
+
+
+# --- RELATÓRIOS ---
+class ReportRequest(BaseModel):
+    year: int
+    month: Optional[int] = None # sem mês = extrato anual
+
+class ReportResponse(BaseModel):
+    id: int
+    year: int
+    month: Optional[int] = None
+    status: str # 'pending', 'ready' ou 'failed'
+    data_version: int
+    size: Optional[int] = None
+    error: Optional[str] = None
+
+
+# --- ANÁLISES ---
+class CategoryTrend(BaseModel):
+    category_id: Optional[int] = None
+    name: Optional[str] = None
+    totals: List[float] # um por ano, na ordem de `years`
+    change: List[Optional[float]] # variação sobre o ano anterior (0.1 = +10%)
+
+class Trends(BaseModel):
+    type: str
+    years: List[int]
+    categories: List[CategoryTrend] = []
+
+class RollingSeries(BaseModel):
+    window: int
+    months: List[str] # "2026-05"
+    income: List[float]
+    expense: List[float]
+    net: List[float]
+    income_avg: List[Optional[float]]
+    expense_avg: List[Optional[float]]
+    net_avg: List[Optional[float]]
+
+class ForecastMonth(MonthTotals):
+    net: float
+    balance: float
+    low: float
+    high: float
+
+class Forecast(BaseModel):
+    start_balance: float
+    fixed_income: float
+    fixed_expense: float
+    variable_income: float
+    variable_expense: float
+    months: List[ForecastMonth] = []
+
+
+# --- EDIÇÃO EM LOTE ---
+class TransactionPatch(BaseModel):
+    # Só os campos informados mudam (mesma regra do PUT: None = mantém)
+    description: Optional[str] = None
+    amount: Optional[float] = None
+    type: Optional[str] = None
+    category_id: Optional[int] = None
+    is_fixed: Optional[bool] = None
+    date: Optional[datetime] = None
+
+class BatchFilter(BaseModel):
+    # Critérios combinados com E; pelo menos um é obrigatório
+    ids: Optional[List[int]] = None
+    category_id: Optional[int] = None
+    type: Optional[str] = None
+    year: Optional[int] = None
+    month: Optional[int] = None
+
+class BatchOperation(BaseModel):
+    op: str # 'create', 'update' ou 'delete'
+    id: Optional[int] = None # uma transação...
+    where: Optional[BatchFilter] = None # ...ou todas que casarem com o filtro
+    data: Optional[TransactionPatch] = None # create (completo) e update
+
+class BatchRequest(BaseModel):
+    operations: List[BatchOperation]
+
+class BatchItemResult(BaseModel):
+    index: int
+    op: str
+    status: str # 'ok', 'error' ou 'skipped' (lote desfeito por erro em outro item)
+    count: int = 0 # transações afetadas
+    id: Optional[int] = None # id da transação criada
+    error: Optional[str] = None
+
+class BatchResult(BaseModel):
+    version: int
+    created: int
+    updated: int
+    deleted: int
+    results: List[BatchItemResult]
+
+# --- IMPORTAÇÃO ---
+class ImportRowError(BaseModel):
+    line: int
+    error: str
+
+class ImportResult(BaseModel):
+    inserted: int
+    skipped: int
+    failed: int
+    errors: List[ImportRowError] = []
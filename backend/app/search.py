@@ -0,0 +1,355 @@
+import argparse
+import re
+from datetime import date, timedelta
+from sqlalchemy import bindparam, column, func, insert, literal_column, or_, table, text, update
+from sqlalchemy.orm import Session
+from . import models, serializers
+from .strings import normalize
+
+# Busca de transações e autocomplete de descrições.
+#
+# Busca (sem acento, sem caixa, com ranking):
+#   PostgreSQL  pg_trgm + unaccent + btree_gin: índice GIN composto
+#               (owner_id, immutable_unaccent(lower(description))); ranking por
+#               word_similarity
+#   SQLite      FTS5 com tokenizer trigram (acha "mercado" em "Supermercado")
+#               sobre normalize_text(description), mantido por triggers;
+#               ranking por bm25. normalize_text() é registrada no database.py
+#
+# Nos dois o dono faz parte do índice: um termo comum ("mercado") não percorre
+# antes as transações de todos os usuários. No FTS5 o rowid é
+# owner_id * OWNER_SHIFT + id, e a busca fica no intervalo de rowids do dono
+#   senão       LIKE sem índice (extensão indisponível, SQLite sem FTS5)
+#
+# Autocomplete: tabela description_stats (frequência por usuário/descrição/
+# categoria), mantida pelas escritas como o rollup mensal. O prefixo vira um
+# intervalo [key, key_seguinte) no índice único (owner_id, key, category_id).
+
+Tx = models.Transaction
+Stat = models.DescriptionStat
+
+BACKEND = "like" # definido por install(): "trigram", "fts5" ou "like"
+BATCH_SIZE = 5000
+
+POSTGRES_SETUP = [
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+    "CREATE EXTENSION IF NOT EXISTS unaccent",
+    # unaccent() não é IMMUTABLE, então não entra em índice; o wrapper entra
+    "CREATE OR REPLACE FUNCTION immutable_unaccent(text) RETURNS text "
+    "LANGUAGE sql IMMUTABLE PARALLEL SAFE STRICT AS $$ SELECT public.unaccent('public.unaccent', $1) $$",
+    "CREATE EXTENSION IF NOT EXISTS btree_gin", # owner_id (inteiro) no mesmo GIN
+    "CREATE INDEX IF NOT EXISTS ix_transactions_owner_description_trgm "
+    "ON transactions USING gin (owner_id, immutable_unaccent(lower(description)) gin_trgm_ops)",
+    # Versão anterior, só da descrição (todos os usuários): substituída pela de cima
+    "DROP INDEX IF EXISTS ix_transactions_description_trgm",
+]
+
+OWNER_SHIFT = 1 << 32 # ids de transação cabem em 32 bits; o dono vai nos bits de cima
+
+SQLITE_SETUP = [
+    # contentless (content=''): guarda só o índice; o texto está em transactions.
+    # rowid = owner_id * OWNER_SHIFT + id (ver o cabeçalho)
+    "CREATE VIRTUAL TABLE transactions_fts USING fts5(description, content='', tokenize='trigram')",
+    "CREATE TRIGGER IF NOT EXISTS transactions_fts_insert AFTER INSERT ON transactions BEGIN "
+    f"INSERT INTO transactions_fts(rowid, description) VALUES (new.owner_id * {OWNER_SHIFT} + new.id, "
+    "normalize_text(new.description)); END",
+    "CREATE TRIGGER IF NOT EXISTS transactions_fts_delete AFTER DELETE ON transactions BEGIN "
+    "INSERT INTO transactions_fts(transactions_fts, rowid, description) "
+    f"VALUES ('delete', old.owner_id * {OWNER_SHIFT} + old.id, normalize_text(old.description)); END",
+    "CREATE TRIGGER IF NOT EXISTS transactions_fts_update AFTER UPDATE OF description ON transactions BEGIN "
+    "INSERT INTO transactions_fts(transactions_fts, rowid, description) "
+    f"VALUES ('delete', old.owner_id * {OWNER_SHIFT} + old.id, normalize_text(old.description)); "
+    f"INSERT INTO transactions_fts(rowid, description) VALUES (new.owner_id * {OWNER_SHIFT} + new.id, "
+    "normalize_text(new.description)); END",
+    # Indexa o que já existia antes da tabela FTS
+    "INSERT INTO transactions_fts(rowid, description) "
+    f"SELECT owner_id * {OWNER_SHIFT} + id, normalize_text(description) FROM transactions",
+]
+
+# Tabela FTS da versão anterior (rowid = id, sem o dono): refeita no startup
+SQLITE_TEARDOWN = [
+    "DROP TRIGGER IF EXISTS transactions_fts_insert",
+    "DROP TRIGGER IF EXISTS transactions_fts_delete",
+    "DROP TRIGGER IF EXISTS transactions_fts_update",
+    "DROP TABLE IF EXISTS transactions_fts",
+]
+
+
+def install(engine):
+    # Chamado no startup, depois do upgrade_schema(). Idempotente
+    global BACKEND
+    dialect = engine.dialect.name
+    try:
+        with engine.begin() as conn:
+            if dialect == "postgresql":
+                for ddl in POSTGRES_SETUP:
+                    conn.execute(text(ddl))
+                BACKEND = "trigram"
+            elif dialect == "sqlite":
+                trigger = conn.execute(text(
+                    "SELECT sql FROM sqlite_master WHERE type = 'trigger' AND name = 'transactions_fts_insert'"
+                )).scalar()
+                if trigger is None or "owner_id" not in trigger:
+                    for ddl in SQLITE_TEARDOWN + SQLITE_SETUP:
+                        conn.execute(text(ddl))
+                    print("🛠️ Índice de busca criado: transactions_fts")
+                BACKEND = "fts5"
+    except Exception as exc: # sem permissão para a extensão, SQLite sem FTS5...
+        BACKEND = "like"
+        print(f"⚠️ Busca sem índice (LIKE): {exc}")
+
+    # Primeiro startup com a tabela de autocomplete: preenche a partir do histórico
+    with Session(engine) as db:
+        if db.query(Stat.id).first() is None and db.query(Tx.id).first() is not None:
+            rebuild(db)
+            db.commit()
+            print("🛠️ Índice de autocomplete preenchido")
+
+
+# --- AUTOCOMPLETE ---
+
+def remember(db: Session, owner_id: int, description: str, category_id, count: int = 1, used_at=None):
+    # Soma (ou subtrai, com count negativo) usos de uma descrição — mesmo padrão do summary.apply()
+    key = normalize(description)
+    if not key:
+        return
+
+    match = (Stat.owner_id == owner_id, Stat.key == key, Stat.category_id == category_id)
+    values = {Stat.count: Stat.count + count}
+    if count > 0:
+        values[Stat.description] = " ".join(description.split())
+        if used_at is not None:
+            values[Stat.last_used] = used_at
+
+    updated = db.query(Stat).filter(*match).update(values, synchronize_session=False)
+    if not updated and count > 0:
+        db.add(Stat(
+            owner_id=owner_id,
+            key=key,
+            description=" ".join(description.split()),
+            category_id=category_id,
+            count=count,
+            last_used=used_at,
+        ))
+        db.flush()
+    elif count < 0:
+        db.query(Stat).filter(*match, Stat.count <= 0).delete(synchronize_session=False)
+
+
+def remember_transaction(db: Session, tx: models.Transaction, sign: int = 1):
+    remember(db, tx.owner_id, tx.description, tx.category_id, sign, tx.date)
+
+
+def remember_many(db: Session, items):
+    # items: (owner_id, descrição, category_id, data) — agrupa antes, um UPDATE por descrição
+    grouped = {}
+    for owner_id, description, category_id, used_at in items:
+        key = (owner_id, normalize(description), category_id)
+        entry = grouped.get(key)
+        if entry is None:
+            grouped[key] = [description, 1, used_at]
+            continue
+        entry[1] += 1
+        if used_at is not None and (entry[2] is None or used_at > entry[2]):
+            entry[0], entry[2] = description, used_at
+    for (owner_id, _, category_id), (description, count, used_at) in grouped.items():
+        remember(db, owner_id, description, category_id, count, used_at)
+
+
+def remember_counts(db: Session, owner_id: int, uses):
+    # Vários deltas de uma vez (edição em lote), no mesmo esquema do summary.apply_many():
+    # uses = {(chave normalizada, categoria): (descrição, count, último uso)}
+    uses = {key: value for key, value in uses.items() if key[0] and value[1]}
+    if not uses:
+        return
+
+    existing = {
+        (key, category_id): row_id
+        for row_id, key, category_id in db.query(Stat.id, Stat.key, Stat.category_id)
+        .filter(Stat.owner_id == owner_id, Stat.key.in_({key for key, _ in uses}))
+    }
+
+    used, forgotten, inserts = [], [], []
+    for (key, category_id), (description, count, used_at) in uses.items():
+        row_id = existing.get((key, category_id))
+        if row_id is not None and count > 0:
+            used.append({"row_id": row_id, "delta": count, "new_description": " ".join(description.split()),
+                         "used_at": used_at})
+        elif row_id is not None:
+            forgotten.append({"row_id": row_id, "delta": count})
+        elif count > 0:
+            inserts.append({"owner_id": owner_id, "key": key, "description": " ".join(description.split()),
+                            "category_id": category_id, "count": count, "last_used": used_at})
+
+    table = Stat.__table__
+    if used:
+        db.execute(
+            update(table)
+            .where(table.c.id == bindparam("row_id"))
+            .values(count=table.c.count + bindparam("delta"), description=bindparam("new_description"),
+                    last_used=func.coalesce(bindparam("used_at", type_=table.c.last_used.type), table.c.last_used)),
+            used,
+        )
+    if forgotten:
+        db.execute(
+            update(table).where(table.c.id == bindparam("row_id")).values(count=table.c.count + bindparam("delta")),
+            forgotten,
+        )
+        db.query(Stat).filter(Stat.owner_id == owner_id, Stat.count <= 0).delete(synchronize_session=False)
+    if inserts:
+        db.execute(insert(Stat), inserts)
+
+
+def rebuild(db: Session, owner_id: int = None):
+    # Recalcula description_stats a partir de `transactions` (backfill / reparo).
+    # O GROUP BY é no banco; em Python só a normalização (acentos), em streaming
+    source = db.query(
+        Tx.owner_id, Tx.description, Tx.category_id, func.count(Tx.id), func.max(Tx.date),
+    ).filter(Tx.description.isnot(None))
+    wipe = db.query(Stat)
+    if owner_id is not None:
+        source = source.filter(Tx.owner_id == owner_id)
+        wipe = wipe.filter(Stat.owner_id == owner_id)
+    source = source.group_by(Tx.owner_id, Tx.description, Tx.category_id)
+
+    stats = {}
+    for owner, description, category_id, count, last_used in source.yield_per(BATCH_SIZE):
+        key = normalize(description)
+        if not key:
+            continue
+        entry = stats.get((owner, key, category_id))
+        if entry is None:
+            stats[(owner, key, category_id)] = [description, count, last_used]
+            continue
+        entry[1] += count
+        if last_used is not None and (entry[2] is None or last_used > entry[2]):
+            entry[0], entry[2] = description, last_used
+
+    wipe.delete(synchronize_session=False)
+    rows = [
+        {"owner_id": owner, "key": key, "category_id": category_id,
+         "description": " ".join(description.split()), "count": count, "last_used": last_used}
+        for (owner, key, category_id), (description, count, last_used) in stats.items()
+    ]
+    for start in range(0, len(rows), BATCH_SIZE):
+        db.execute(insert(Stat), rows[start:start + BATCH_SIZE])
+
+
+def prefix_upper(key: str) -> str:
+    # Menor string maior que todas as que começam com key
+    return key[:-1] + chr(ord(key[-1]) + 1)
+
+
+def suggest(db: Session, owner_id: int, prefix: str, limit: int = 10):
+    key = normalize(prefix)
+    if not key:
+        return []
+    in_prefix = (Stat.owner_id == owner_id, Stat.key >= key, Stat.key < prefix_upper(key))
+
+    # 1) as descrições mais usadas com esse prefixo
+    top = db.query(Stat.key, func.sum(Stat.count).label("total"))\
+            .filter(*in_prefix)\
+            .group_by(Stat.key)\
+            .order_by(func.sum(Stat.count).desc(), Stat.key)\
+            .limit(limit)\
+            .all()
+    if not top:
+        return []
+
+    # 2) a categoria de costume de cada uma (a mais usada; empate: a mais recente)
+    rows = db.query(Stat.key, Stat.description, Stat.category_id, Stat.count, Stat.last_used, models.Category.name)\
+             .outerjoin(models.Category, models.Category.id == Stat.category_id)\
+             .filter(*in_prefix, Stat.key.in_([t.key for t in top]))\
+             .all()
+    best = {}
+    for row in rows:
+        current = best.get(row.key)
+        rank = (row.count, row.last_used is not None, row.last_used)
+        if current is None or rank > current[0]:
+            best[row.key] = (rank, row)
+
+    result = []
+    for t in top:
+        row = best[t.key][1]
+        result.append({
+            "description": row.description,
+            "category_id": row.category_id,
+            "category_name": row.name,
+            "count": t.total,
+        })
+    return result
+
+
+# --- BUSCA ---
+
+def fts_query(needle: str):
+    # Cada palavra vira uma frase entre aspas ("mercado" "livre"): nada da
+    # sintaxe do FTS5 chega do usuário. O trigram precisa de 3+ letras por palavra
+    words = [w for w in re.findall(r"\w+", needle) if len(w) >= 3]
+    return " ".join(f'"{w}"' for w in words) or None
+
+
+def search_transactions(db: Session, owner_id: int, q: str, category_id: int = None,
+                        min_amount: float = None, max_amount: float = None,
+                        start_date: date = None, end_date: date = None,
+                        skip: int = 0, limit: int = 50) -> bytes:
+    # Devolve o JSON pronto (mesmo formato do GET /transactions/, ver app/serializers.py)
+    query = db.query(*serializers.TX_COLUMNS, *serializers.CATEGORY_LABELED)\
+              .outerjoin(models.Category, models.Category.id == Tx.category_id)\
+              .filter(Tx.owner_id == owner_id)
+
+    if category_id is not None:
+        query = query.filter(Tx.category_id == category_id)
+    if min_amount is not None:
+        query = query.filter(Tx.amount >= min_amount)
+    if max_amount is not None:
+        query = query.filter(Tx.amount <= max_amount)
+    if start_date is not None:
+        query = query.filter(Tx.date >= start_date)
+    if end_date is not None:
+        query = query.filter(Tx.date < end_date + timedelta(days=1)) # end_date inclusivo
+
+    needle = normalize(q)
+    match = fts_query(needle) if BACKEND == "fts5" else None
+    if match is not None:
+        # Só o intervalo de rowids do dono; a transação vem pela chave primária
+        fts = table("transactions_fts", column("rowid"), column("rank"))
+        first = owner_id * OWNER_SHIFT
+        query = query.join(fts, Tx.id == fts.c.rowid - first)\
+                     .filter(literal_column("transactions_fts").op("MATCH")(match),
+                             fts.c.rowid >= first, fts.c.rowid < first + OWNER_SHIFT)\
+                     .order_by(fts.c.rank, Tx.date.desc())
+    elif BACKEND == "trigram":
+        # Substring exata OU parecida (erro de digitação); os dois usam o índice GIN
+        haystack = func.immutable_unaccent(func.lower(Tx.description))
+        query = query.filter(or_(haystack.contains(needle, autoescape=True), haystack.op("%>")(needle)))\
+                     .order_by(func.word_similarity(needle, haystack).desc(), Tx.date.desc())
+    elif BACKEND == "fts5":
+        # Busca curta demais para trigramas ("ub"): varre as transações do usuário
+        query = query.filter(func.normalize_text(Tx.description).contains(needle, autoescape=True))\
+                     .order_by(Tx.date.desc())
+    else:
+        query = query.filter(func.lower(Tx.description).contains(q.lower(), autoescape=True))\
+                     .order_by(Tx.date.desc())
+
+    rows = query.order_by(Tx.id.desc()).offset(skip).limit(limit).all()
+    return serializers.transactions_json(rows)
+
+
+# Uso: python -m app.search rebuild [--user ID]
+if __name__ == "__main__":
+    from . import database
+
+    parser = argparse.ArgumentParser(description="Manutenção do índice de autocomplete")
+    parser.add_argument("command", choices=["rebuild"])
+    parser.add_argument("--user", type=int, default=None, help="Reconstrói só este usuário")
+    args = parser.parse_args()
+
+    models.Base.metadata.create_all(bind=database.engine)
+    db = database.SessionLocal()
+    try:
+        rebuild(db, owner_id=args.user)
+        db.commit()
+        print("✅ Índice de autocomplete reconstruído")
+    finally:
+        db.close()
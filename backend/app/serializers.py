@@ -0,0 +1,117 @@
+import json
+import time
+from datetime import date, datetime, timedelta
+from . import metrics, models
+
+try:
+    import orjson
+except ImportError: # sem orjson, json da stdlib (mais lento, mesmo resultado)
+    orjson = None
+
+# Caminho rápido da listagem de transações.
+# Em vez de entidades do ORM + um model pydantic por linha, a query traz só as
+# colunas (tuplas) e o JSON é montado direto, sem validar linha a linha:
+# o dado vem do nosso banco, já no formato certo. O JSON é o mesmo do
+# TransactionResponse / TransactionListCompact.
+# O tempo gasto aqui entra no "ser" do Server-Timing (metrics.serializing);
+# no streaming, só o dumps de cada linha, sem a leitura do banco.
+
+Tx = models.Transaction
+Category = models.Category
+
+# Mesma ordem de campos dos schemas
+TX_FIELDS = ("description", "amount", "type", "category_id", "is_fixed", "id", "date", "owner_id")
+TX_COLUMNS = tuple(getattr(Tx, field) for field in TX_FIELDS)
+
+CATEGORY_FIELDS = ("name", "icon", "color", "id", "owner_id")
+CATEGORY_COLUMNS = tuple(getattr(Category, field) for field in CATEGORY_FIELDS)
+# Rótulos próprios para não colidir com Transaction.id/owner_id na mesma tupla
+CATEGORY_LABELED = tuple(c.label(f"category_{f}") for c, f in zip(CATEGORY_COLUMNS, CATEGORY_FIELDS))
+
+STREAM_CHUNK = 1000 # linhas por pedaço enviado no streaming
+
+
+# Datas em UTC saem com "Z", como o pydantic faz no response_model
+# ("2024-01-05T12:00:00Z", não "+00:00"); outros fusos e datas sem fuso, iguais
+def _default(value):
+    if isinstance(value, datetime) and value.utcoffset() == timedelta(0):
+        return value.replace(tzinfo=None).isoformat() + "Z"
+    if isinstance(value, date):
+        return value.isoformat()
+    raise TypeError(f"{type(value).__name__} não é serializável")
+
+
+def dumps(value) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(value, option=orjson.OPT_UTC_Z)
+    return json.dumps(value, default=_default, ensure_ascii=False, separators=(",", ":")).encode()
+
+
+def transaction_dict(row) -> dict:
+    return dict(zip(TX_FIELDS, row))
+
+
+def transaction_with_category(row) -> dict:
+    # row = TX_COLUMNS + CATEGORY_LABELED (categoria pode faltar: OUTER JOIN)
+    tx = dict(zip(TX_FIELDS, row))
+    category = row[len(TX_FIELDS):]
+    tx["category"] = dict(zip(CATEGORY_FIELDS, category)) if category[3] is not None else None
+    return tx
+
+
+def transactions_json(rows) -> bytes:
+    with metrics.serializing():
+        return dumps([transaction_with_category(r) for r in rows])
+
+
+def compact_json(categories, rows) -> bytes:
+    with metrics.serializing():
+        return dumps({
+            "categories": [dict(zip(CATEGORY_FIELDS, c)) for c in categories],
+            "transactions": [transaction_dict(r) for r in rows],
+        })
+
+
+# --- STREAMING ---
+# O primeiro pedaço sai antes da última linha ser lida do banco.
+# As linhas têm o formato compacto (category_id, sem a categoria aninhada).
+
+def ndjson(rows):
+    # Uma transação por linha
+    chunk = []
+    spent = 0.0
+    for row in rows:
+        start = time.perf_counter()
+        chunk.append(dumps(transaction_dict(row)))
+        spent += time.perf_counter() - start
+        if len(chunk) >= STREAM_CHUNK:
+            metrics.record_serialize(spent)
+            spent = 0.0
+            yield b"\n".join(chunk) + b"\n"
+            chunk = []
+    metrics.record_serialize(spent)
+    if chunk:
+        yield b"\n".join(chunk) + b"\n"
+
+
+def columns(rows):
+    # Colunar: nomes dos campos uma vez só, cada transação vira uma lista
+    # {"columns": [...], "rows": [[...], [...]]}
+    yield b'{"columns":' + dumps(TX_FIELDS) + b',"rows":['
+    first = True
+    chunk = []
+    spent = 0.0
+    for row in rows:
+        start = time.perf_counter()
+        chunk.append(dumps(tuple(row)))
+        spent += time.perf_counter() - start
+        if len(chunk) >= STREAM_CHUNK:
+            metrics.record_serialize(spent)
+            spent = 0.0
+            yield (b"" if first else b",") + b",".join(chunk)
+            first = False
+            chunk = []
+    metrics.record_serialize(spent)
+    if chunk:
+        yield (b"" if first else b",") + b",".join(chunk)
+    yield b"]}"
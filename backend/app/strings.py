@@ -0,0 +1,11 @@
+import unicodedata
+
+# Normalização de texto para comparar descrições (busca, autocomplete, importação).
+# Sem dependências do app: o database.py registra como função SQL no SQLite
+
+
+def normalize(text: str) -> str:
+    # minúsculas, sem acento e sem espaços repetidos
+    text = unicodedata.normalize("NFKD", text or "")
+    text = "".join(c for c in text if not unicodedata.combining(c))
+    return " ".join(text.lower().split())
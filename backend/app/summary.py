@@ -0,0 +1,253 @@
+import argparse
+from sqlalchemy import Integer, bindparam, cast, extract, func, insert, literal, select, update
+from sqlalchemy.orm import Session
+from . import models, filters
+
+# Rollup mensal por usuário/categoria/tipo.
+# As rotas de escrita chamam apply() na MESMA sessão (mesma transação) do
+# INSERT/UPDATE/DELETE, então o resumo nunca fica "meio atualizado".
+# O dashboard lê daqui: o custo passa a depender do número de categorias,
+# e não do tamanho do histórico.
+
+Summary = models.MonthlySummary
+
+
+def apply(db: Session, owner_id: int, date, category_id, type: str, amount: float, count: int = 1):
+    # Soma (ou subtrai, com amount/count negativos) um delta na linha do rollup
+    if date is None:
+        return
+
+    key = (
+        Summary.owner_id == owner_id,
+        Summary.year == date.year,
+        Summary.month == date.month,
+        Summary.category_id == category_id,
+        Summary.type == type,
+    )
+
+    updated = db.query(Summary).filter(*key).update(
+        {Summary.total: Summary.total + amount, Summary.count: Summary.count + count},
+        synchronize_session=False,
+    )
+
+    # Sem linha e delta negativo: rollup incompleto (nunca preenchido); não cria total negativo
+    if not updated and count > 0:
+        db.add(Summary(
+            owner_id=owner_id,
+            year=date.year,
+            month=date.month,
+            category_id=category_id,
+            type=type,
+            total=amount,
+            count=count,
+        ))
+        db.flush()
+    elif count < 0:
+        # Linha zerada não precisa ficar ocupando espaço
+        db.query(Summary).filter(*key, Summary.count <= 0).delete(synchronize_session=False)
+
+
+def apply_transaction(db: Session, tx: models.Transaction, sign: int = 1):
+    apply(db, tx.owner_id, tx.date, tx.category_id, tx.type, sign * (tx.amount or 0), sign)
+
+
+def apply_many(db: Session, owner_id: int, deltas):
+    # Vários deltas de uma vez (edição em lote): {(ano, mês, categoria, tipo): (total, count)}.
+    # Quatro comandos no máximo, não importa quantas chaves: SELECT das linhas que já
+    # existem, UPDATE (executemany), INSERT das novas e DELETE das zeradas.
+    # Chamar depois do versions.bump(): a linha do usuário travada serializa as escritas
+    deltas = {key: value for key, value in deltas.items() if value[0] or value[1]}
+    if not deltas:
+        return
+
+    existing = {
+        (year, month, category_id, type): row_id
+        for row_id, year, month, category_id, type in db.query(
+            Summary.id, Summary.year, Summary.month, Summary.category_id, Summary.type
+        ).filter(Summary.owner_id == owner_id, Summary.year.in_({key[0] for key in deltas}))
+    }
+
+    updates, inserts = [], []
+    for key, (total, count) in deltas.items():
+        if key in existing:
+            updates.append({"row_id": existing[key], "delta_total": total, "delta_count": count})
+        elif count > 0:
+            year, month, category_id, type = key
+            inserts.append({"owner_id": owner_id, "year": year, "month": month, "category_id": category_id,
+                            "type": type, "total": total, "count": count})
+
+    table = Summary.__table__
+    if updates:
+        db.execute(
+            update(table)
+            .where(table.c.id == bindparam("row_id"))
+            .values(total=table.c.total + bindparam("delta_total"), count=table.c.count + bindparam("delta_count")),
+            updates,
+        )
+    if inserts:
+        db.execute(insert(Summary), inserts)
+    if any(count < 0 for _, count in deltas.values()):
+        db.query(Summary).filter(Summary.owner_id == owner_id, Summary.count <= 0).delete(synchronize_session=False)
+
+
+def backfill(db: Session) -> bool:
+    # Startup: banco antigo com transações e rollup vazio é preenchido uma vez,
+    # como o search.install() faz com o autocomplete
+    if db.query(Summary.id).first() is None and db.query(models.Transaction.id).first() is not None:
+        rebuild(db)
+        print("🛠️ Resumo mensal preenchido")
+        return True
+    return False
+
+
+def rebuild(db: Session, owner_id: int = None):
+    # Recalcula o rollup do zero a partir de `transactions` (backfill / reparo).
+    # Tudo set-based: um DELETE e um INSERT ... SELECT ... GROUP BY
+    year = cast(extract("year", models.Transaction.date), Integer)
+    month = cast(extract("month", models.Transaction.date), Integer)
+
+    source = select(
+        models.Transaction.owner_id,
+        year,
+        month,
+        models.Transaction.category_id,
+        models.Transaction.type,
+        func.sum(models.Transaction.amount),
+        func.count(models.Transaction.id),
+    ).where(models.Transaction.date.isnot(None))
+
+    wipe = db.query(Summary)
+    if owner_id is not None:
+        source = source.where(models.Transaction.owner_id == owner_id)
+        wipe = wipe.filter(Summary.owner_id == owner_id)
+
+    source = source.group_by(
+        models.Transaction.owner_id, year, month,
+        models.Transaction.category_id, models.Transaction.type,
+    )
+
+    wipe.delete(synchronize_session=False)
+    db.execute(insert(Summary).from_select(
+        ["owner_id", "year", "month", "category_id", "type", "total", "count"], source
+    ))
+
+
+def rebuild_month(db: Session, year: int, month: int, owner_ids=None):
+    # Igual ao rebuild(), mas só de um mês (e opcionalmente de alguns usuários).
+    # Usado pelos jobs em lote que escrevem via INSERT ... SELECT
+    start, end = filters.month_range(year, month)
+
+    source = select(
+        models.Transaction.owner_id,
+        literal(year),
+        literal(month),
+        models.Transaction.category_id,
+        models.Transaction.type,
+        func.sum(models.Transaction.amount),
+        func.count(models.Transaction.id),
+    ).where(models.Transaction.date >= start, models.Transaction.date < end)
+
+    wipe = db.query(Summary).filter(Summary.year == year, Summary.month == month)
+    if owner_ids is not None:
+        source = source.where(models.Transaction.owner_id.in_(owner_ids))
+        wipe = wipe.filter(Summary.owner_id.in_(owner_ids))
+
+    source = source.group_by(
+        models.Transaction.owner_id, models.Transaction.category_id, models.Transaction.type,
+    )
+
+    wipe.delete(synchronize_session=False)
+    db.execute(insert(Summary).from_select(
+        ["owner_id", "year", "month", "category_id", "type", "total", "count"], source
+    ))
+
+
+def _totals(rows):
+    income = sum(r.total for r in rows if r.type == "income")
+    expense = sum(r.total for r in rows if r.type == "expense")
+    return round(income, 2), round(expense, 2)
+
+
+def month_summary(db: Session, owner_id: int, year: int, month: int):
+    rows = db.query(
+        Summary.category_id,
+        Summary.type,
+        Summary.total,
+        Summary.count,
+        models.Category.name,
+        models.Category.color,
+    ).outerjoin(models.Category, models.Category.id == Summary.category_id)\
+     .filter(Summary.owner_id == owner_id, Summary.year == year, Summary.month == month)\
+     .order_by(Summary.total.desc())\
+     .all()
+
+    income, expense = _totals(rows)
+    return {
+        "year": year,
+        "month": month,
+        "income": income,
+        "expense": expense,
+        "balance": round(income - expense, 2),
+        "categories": [
+            {
+                "category_id": r.category_id,
+                "name": r.name,
+                "color": r.color,
+                "type": r.type,
+                "total": round(r.total, 2),
+                "count": r.count,
+            }
+            for r in rows
+        ],
+    }
+
+
+def range_summary(db: Session, owner_id: int, start_year: int, end_year: int):
+    # Totais mês a mês (para gráficos de tendência)
+    rows = db.query(
+        Summary.year,
+        Summary.month,
+        Summary.type,
+        func.sum(Summary.total).label("total"),
+    ).filter(
+        Summary.owner_id == owner_id,
+        Summary.year >= start_year,
+        Summary.year <= end_year,
+    ).group_by(Summary.year, Summary.month, Summary.type)\
+     .order_by(Summary.year, Summary.month)\
+     .all()
+
+    months = {}
+    for r in rows:
+        months.setdefault((r.year, r.month), []).append(r)
+
+    result = []
+    for (year, month), items in months.items():
+        income, expense = _totals(items)
+        result.append({
+            "year": year,
+            "month": month,
+            "income": income,
+            "expense": expense,
+            "balance": round(income - expense, 2),
+        })
+    return result
+
+
+# Uso: python -m app.summary rebuild [--user ID]
+if __name__ == "__main__":
+    from . import database
+
+    parser = argparse.ArgumentParser(description="Manutenção do rollup mensal")
+    parser.add_argument("command", choices=["rebuild"])
+    parser.add_argument("--user", type=int, default=None, help="Reconstrói só este usuário")
+    args = parser.parse_args()
+
+    models.Base.metadata.create_all(bind=database.engine)
+    db = database.SessionLocal()
+    try:
+        rebuild(db, owner_id=args.user)
+        db.commit()
+        print("✅ Rollup mensal reconstruído")
+    finally:
+        db.close()
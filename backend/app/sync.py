@@ -0,0 +1,119 @@
+import argparse
+import os
+from datetime import datetime, timedelta, timezone
+from sqlalchemy import case, exists, func, insert, literal, select, update
+from sqlalchemy.orm import Session
+from . import metrics, models, serializers
+
+# Sync incremental para o app mobile: GET /sync?since=<cursor> devolve só o
+# que mudou (transações, categorias e exclusões) desde o cursor.
+#
+# O cursor é a própria users.data_version (ver app/versions.py). Toda escrita
+# grava a versão nova em change_seq das linhas que tocou; exclusões viram
+# tombstones com a mesma versão. Como o bump() trava a linha do usuário até o
+# COMMIT, as versões de um usuário são confirmadas em ordem: nada com
+# change_seq <= cursor aparece depois que o cliente já leu esse cursor.
+#
+# Tombstones ficam SYNC_RETENTION_DAYS dias. purge() apaga os antigos e sobe
+# users.sync_floor; cursor abaixo do piso (ou 0, ou maior que a versão atual)
+# recebe o sync completo, com "full": true — o cliente troca tudo o que tem.
+
+SYNC_RETENTION_DAYS = int(os.getenv("SYNC_RETENTION_DAYS", "30"))
+
+Tx = models.Transaction
+Category = models.Category
+Tombstone = models.Tombstone
+
+TRANSACTION = "transaction"
+CATEGORY = "category"
+
+
+def tombstone(db: Session, owner_id: int, kind: str, entity_ids, change_seq: int):
+    # Chamado na mesma transação do DELETE, com a versão do bump()
+    rows = [{"owner_id": owner_id, "kind": kind, "entity_id": entity_id, "change_seq": change_seq}
+            for entity_id in entity_ids]
+    if rows:
+        db.execute(insert(Tombstone), rows)
+
+
+def tombstone_where(db: Session, criteria, change_seq: int):
+    # Exclusão em lote de transações: INSERT ... SELECT, antes do DELETE com os mesmos critérios
+    db.execute(insert(Tombstone).from_select(
+        ["owner_id", "kind", "entity_id", "change_seq"],
+        select(Tx.owner_id, literal(TRANSACTION), Tx.id, literal(change_seq)).where(*criteria),
+    ))
+
+
+def changes(db: Session, owner_id: int, since: int = None) -> bytes:
+    # Devolve o JSON pronto:
+    # {"cursor": N, "full": bool, "categories": [...], "transactions": [...],
+    #  "deleted": {"categories": [ids], "transactions": [ids]}}
+    version, floor = db.query(models.User.data_version, models.User.sync_floor)\
+                       .filter(models.User.id == owner_id).one()
+    full = not since or since < floor or since > version
+
+    # Limite superior = versão lida agora: o que for confirmado durante a
+    # leitura fica para o próximo sync, em vez de pular o cursor
+    tx_filter = [Tx.owner_id == owner_id, Tx.change_seq <= version]
+    category_filter = [Category.owner_id == owner_id, Category.change_seq <= version]
+    if not full:
+        tx_filter.append(Tx.change_seq > since)
+        category_filter.append(Category.change_seq > since)
+
+    categories = db.query(*serializers.CATEGORY_COLUMNS).filter(*category_filter).order_by(Category.id).all()
+    rows = db.query(*serializers.TX_COLUMNS).filter(*tx_filter).order_by(Tx.id).all()
+
+    deleted = {"categories": [], "transactions": []}
+    if not full:
+        tombstones = db.query(Tombstone.kind, Tombstone.entity_id).filter(
+            Tombstone.owner_id == owner_id,
+            Tombstone.change_seq > since,
+            Tombstone.change_seq <= version,
+        )
+        for kind, entity_id in tombstones:
+            deleted["categories" if kind == CATEGORY else "transactions"].append(entity_id)
+
+    with metrics.serializing():
+        return serializers.dumps({
+            "cursor": version,
+            "full": full,
+            "categories": [dict(zip(serializers.CATEGORY_FIELDS, c)) for c in categories],
+            "transactions": [serializers.transaction_dict(r) for r in rows],
+            "deleted": deleted,
+        })
+
+
+def purge(db: Session, days: int = SYNC_RETENTION_DAYS) -> int:
+    # Apaga tombstones mais velhos que `days` e sobe o piso de cada usuário
+    # afetado para a maior versão apagada. Idempotente; roda no startup e no cron
+    cutoff = datetime.now(timezone.utc) - timedelta(days=days)
+    expired = (Tombstone.owner_id == models.User.id, Tombstone.deleted_at < cutoff)
+
+    newest = select(func.max(Tombstone.change_seq)).where(*expired).scalar_subquery()
+    db.execute(
+        update(models.User)
+        .where(exists().where(*expired))
+        .values(sync_floor=case((newest > models.User.sync_floor, newest), else_=models.User.sync_floor))
+        .execution_options(synchronize_session=False)
+    )
+    return db.query(Tombstone).filter(Tombstone.deleted_at < cutoff).delete(synchronize_session=False)
+
+
+# Uso (cron diário): python -m app.sync purge [--days 30]
+if __name__ == "__main__":
+    from . import database
+
+    parser = argparse.ArgumentParser(description="Manutenção dos tombstones do sync")
+    parser.add_argument("command", choices=["purge"])
+    parser.add_argument("--days", type=int, default=SYNC_RETENTION_DAYS)
+    args = parser.parse_args()
+
+    models.Base.metadata.create_all(bind=database.engine)
+    database.upgrade_schema(models.Base.metadata)
+    db = database.SessionLocal()
+    try:
+        removed = purge(db, args.days)
+        db.commit()
+        print(f"✅ {removed} tombstones com mais de {args.days} dias removidos")
+    finally:
+        db.close()
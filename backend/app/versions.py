@@ -0,0 +1,101 @@
+import hashlib
+import os
+import time
+from threading import Lock
+from sqlalchemy import event, select, update
+from sqlalchemy.orm import Session
+from . import models
+
+# Versão dos dados por usuário (users.data_version).
+# Toda escrita chama bump() na mesma transação; as leituras devolvem um ETag
+# fraco derivado da versão, e If-None-Match vira 304 sem tocar nas tabelas.
+# A versão fica em cache no processo por VERSION_CACHE_TTL segundos: com vários
+# workers, um worker pode enxergar a versão antiga por até esse tempo.
+
+VERSION_CACHE_TTL = float(os.getenv("VERSION_CACHE_TTL", "2"))
+
+_cache = {}
+_lock = Lock()
+
+
+def bump(db: Session, owner_id: int) -> int:
+    # Sobe a versão e devolve a nova
+    stmt = update(models.User)\
+        .where(models.User.id == owner_id)\
+        .values(data_version=models.User.data_version + 1)\
+        .execution_options(synchronize_session=False)
+    if db.get_bind().dialect.update_returning:
+        version = db.execute(stmt.returning(models.User.data_version)).scalar()
+    else:
+        db.execute(stmt)
+        version = db.execute(select(models.User.data_version).where(models.User.id == owner_id)).scalar()
+    db.info.setdefault("bumped_users", set()).add(owner_id)
+    return version
+
+
+def bump_many(db: Session, owner_ids, affected=None):
+    # owner_ids: lista ou subquery (jobs em lote). affected: ids para limpar do
+    # cache depois do commit (None = limpa o cache inteiro)
+    db.execute(
+        update(models.User)
+        .where(models.User.id.in_(owner_ids))
+        .values(data_version=models.User.data_version + 1)
+        .execution_options(synchronize_session=False)
+    )
+    if affected is None:
+        db.info["bump_all"] = True
+    else:
+        db.info.setdefault("bumped_users", set()).update(affected)
+
+
+def cached(owner_id: int):
+    with _lock:
+        entry = _cache.get(owner_id)
+    if entry and entry[1] > time.monotonic():
+        return entry[0]
+    return None
+
+
+def load(db: Session, owner_id: int) -> int:
+    version = db.query(models.User.data_version).filter(models.User.id == owner_id).scalar() or 0
+    with _lock:
+        _cache[owner_id] = (version, time.monotonic() + VERSION_CACHE_TTL)
+    return version
+
+
+def forget(owner_ids=None):
+    with _lock:
+        if owner_ids is None:
+            _cache.clear()
+        else:
+            for owner_id in owner_ids:
+                _cache.pop(owner_id, None)
+
+
+def etag(owner_id: int, version: int, variant: str) -> str:
+    # variant = rota + query string: cada "visão" dos dados tem seu próprio ETag
+    digest = hashlib.blake2b(variant.encode(), digest_size=6).hexdigest()
+    return f'W/"{owner_id}-{version}-{digest}"'
+
+
+def matches(if_none_match: str, tag: str) -> bool:
+    if not if_none_match:
+        return False
+    candidates = {t.strip() for t in if_none_match.split(",")}
+    return "*" in candidates or tag in candidates or tag[2:] in candidates
+
+
+# Depois do COMMIT, o cache deste processo esquece quem mudou
+@event.listens_for(Session, "after_commit")
+def _after_commit(session):
+    users = session.info.pop("bumped_users", None)
+    if session.info.pop("bump_all", False):
+        forget()
+    elif users:
+        forget(users)
+
+
+@event.listens_for(Session, "after_rollback")
+def _after_rollback(session):
+    session.info.pop("bumped_users", None)
+    session.info.pop("bump_all", None)
@@ -0,0 +1,88 @@
+import argparse
+import os
+import tempfile
+import time
+from datetime import datetime
+
+# Tempo das análises (app/analytics.py) sobre históricos longos.
+# Roda em processo, sem HTTP: mede a carga dos arrays (cache frio, uma query
+# + conversão) e cada análise com o cache quente, que é o caso comum — o
+# cache só esfria quando o usuário escreve algo.
+#
+# Referência "python": a mesma série mensal da média móvel somando linha a
+# linha em Python, como seria sem os arrays.
+#
+# Uso (dentro de backend/):
+#   python -m benchmarks.bench_analytics --years 5,10,20 --per-month 60
+
+
+def best_of(fn, repeat):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--years", default="5,10,20", help="tamanhos de histórico, em anos")
+    parser.add_argument("--per-month", type=int, default=60, help="lançamentos variáveis por mês")
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+    sizes = [int(y) for y in args.years.split(",")]
+
+    os.environ.setdefault("DATABASE_URL", f"sqlite:///{tempfile.mkdtemp()}/bench.db")
+    os.environ.setdefault("HASH_POOL_WORKERS", "0")
+    os.environ.setdefault("BCRYPT_ROUNDS", "4")
+    from app import analytics, database, models
+    from . import seed
+
+    models.Base.metadata.create_all(bind=database.engine)
+    # Um usuário por tamanho de histórico, todos terminando no mês atual
+    owners = {}
+    db = database.SessionLocal()
+    for years in sizes:
+        seed.generate(database.SessionLocal, 1, years, args.per_month, seed=years, until=datetime.now())
+        owners[years] = db.query(models.User.id).order_by(models.User.id.desc()).limit(1).scalar()
+        # seed.generate usa sempre os mesmos e-mails: renomeia para o próximo não colidir
+        db.query(models.User).filter(models.User.id == owners[years])\
+          .update({models.User.email: f"bench-analytics-{years}@example.com"})
+        db.commit()
+
+    def python_monthly(owner_id, months):
+        # Sem NumPy: percorre as linhas somando por mês
+        first = analytics.current_month() - months + 1
+        income, expense = [0] * months, [0] * months
+        for date, amount, type in db.query(models.Transaction.date, models.Transaction.amount, models.Transaction.type)\
+                                    .filter(models.Transaction.owner_id == owner_id):
+            index = analytics.month_index(date.year, date.month) - first
+            if 0 <= index < months:
+                if type == "income":
+                    income[index] += round(amount * 100)
+                else:
+                    expense[index] += round(amount * 100)
+        return income, expense
+
+    print(f"{'anos':>5} {'linhas':>8} {'frio':>9} {'trends':>9} {'rolling':>9} {'forecast':>9} {'python':>9} {'memória':>9}")
+    for years in sizes:
+        owner_id = owners[years]
+        analytics.frames._frames.clear()
+        cold = best_of(lambda: analytics.load_frame(db, owner_id, 0), max(1, args.repeat // 4))
+        frame = analytics.frame_for(db, owner_id)
+        months = years * 12
+        timings = [
+            best_of(lambda: analytics.trends(db, owner_id, min(years, 20)), args.repeat),
+            best_of(lambda: analytics.rolling(db, owner_id, months, 3), args.repeat),
+            best_of(lambda: analytics.forecast(db, owner_id, 12, 24), args.repeat),
+            best_of(lambda: python_monthly(owner_id, months), max(1, args.repeat // 4)),
+        ]
+        cells = " ".join(f"{t * 1000:>7.2f}ms" for t in [cold] + timings)
+        print(f"{years:>5} {len(frame.cents):>8} {cells} {frame.nbytes / 1024:>7.0f}KB")
+    db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+import argparse
+import asyncio
+import os
+import random
+import tempfile
+import time
+import httpx
+from .common import login, server, wait_ready
+
+# Benchmark do POST /transactions/import: linhas/segundo para um CSV grande,
+# e a reimportação do mesmo arquivo (tudo deve virar "skipped").
+#
+# Uso (dentro de backend/):
+#   python -m benchmarks.bench_import --rows 100000
+
+EMAIL = "bench-import@example.com"
+PASSWORD = "bench-password"
+
+
+def write_csv(path, rows, seed=42):
+    rng = random.Random(seed)
+    places = ["Mercado Extra", "Uber", "Padaria", "Farmácia", "Posto Shell", "iFood", "Netflix"]
+    with open(path, "w", encoding="utf-8") as f:
+        f.write("data;descricao;valor;categoria\n")
+        for i in range(rows):
+            day = 1 + i % 28
+            month = 1 + (i // 28) % 12
+            year = 2015 + (i // 336) % 10
+            value = rng.randint(100, 50000) / 100
+            f.write(f"{day:02d}/{month:02d}/{year};{rng.choice(places)} {i % 97};-{value:.2f}".replace(".", ",") + ";mercado\n")
+
+
+async def upload(client, headers, path):
+    with open(path, "rb") as f:
+        start = time.perf_counter()
+        r = await client.post("/transactions/import", headers=headers, files={"file": ("extrato.csv", f, "text/csv")})
+        elapsed = time.perf_counter() - start
+    r.raise_for_status()
+    return r.json(), elapsed
+
+
+async def run(args, base_url, path):
+    async with httpx.AsyncClient(base_url=base_url, timeout=None) as client:
+        await wait_ready(client)
+        headers = await login(client, EMAIL, PASSWORD)
+        await client.post("/categories/", headers=headers, json={"name": "Mercado", "icon": "x", "color": "#888"})
+
+        for label in ("primeira importação", "reimportação"):
+            result, elapsed = await upload(client, headers, path)
+            print(
+                f"{label:<20} {args.rows} linhas em {elapsed:6.2f}s -> {args.rows / elapsed:9.0f} linhas/s "
+                f"(inseridas={result['inserted']} ignoradas={result['skipped']} falhas={result['failed']})"
+            )
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--database-url", default=None)
+    parser.add_argument("--db-mode", choices=["sync", "async"], default="sync")
+    parser.add_argument("--port", type=int, default=8767)
+    args = parser.parse_args()
+
+    path = os.path.join(tempfile.mkdtemp(), "extrato.csv")
+    write_csv(path, args.rows)
+    print(f"CSV gerado: {os.path.getsize(path) / 1e6:.1f} MB")
+
+    with server(args.port, database_url=args.database_url, DB_MODE=args.db_mode, HASH_POOL_WORKERS=1, BCRYPT_ROUNDS=4) as base_url:
+        asyncio.run(run(args, base_url, path))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+import argparse
+import asyncio
+import time
+import httpx
+from .common import login, report, server, wait_ready
+
+# Micro-benchmark: rajada de logins + leituras concorrentes.
+# Sobe um uvicorn de verdade (SQLite temporário) e mede p50/p99 do /token
+# e do GET /categories enquanto os logins acontecem.
+#
+# Uso (dentro de backend/):
+#   python -m benchmarks.bench_login --hash-workers 0   # bcrypt no threadpool do Starlette (antes)
+#   python -m benchmarks.bench_login --hash-workers 4   # pool de processos
+
+EMAIL = "bench@example.com"
+PASSWORD = "bench-password"
+
+
+async def login_worker(client, deadline, latencies, rejected):
+    while time.perf_counter() < deadline:
+        start = time.perf_counter()
+        r = await client.post("/token", data={"username": EMAIL, "password": PASSWORD})
+        if r.status_code in (429, 503):
+            rejected.append(1)
+            await asyncio.sleep(0.05)
+            continue
+        latencies.append(time.perf_counter() - start)
+
+
+async def read_worker(client, headers, deadline, latencies):
+    while time.perf_counter() < deadline:
+        start = time.perf_counter()
+        await client.get("/categories", headers=headers)
+        latencies.append(time.perf_counter() - start)
+
+
+async def run(args, base_url):
+    limits = httpx.Limits(max_connections=args.logins + args.readers + 10)
+    async with httpx.AsyncClient(base_url=base_url, timeout=60, limits=limits) as client:
+        await wait_ready(client)
+        headers = await login(client, EMAIL, PASSWORD)
+
+        # Linha de base: leituras sem logins
+        baseline = []
+        await asyncio.gather(*[
+            read_worker(client, headers, time.perf_counter() + 2, baseline) for _ in range(args.readers)
+        ])
+
+        logins, reads, rejected = [], [], []
+        deadline = time.perf_counter() + args.duration
+        await asyncio.gather(
+            *[login_worker(client, deadline, logins, rejected) for _ in range(args.logins)],
+            *[read_worker(client, headers, deadline, reads) for _ in range(args.readers)],
+        )
+
+    print(f"db_mode={args.db_mode} hash_workers={args.hash_workers} rounds={args.rounds} logins={args.logins} readers={args.readers}")
+    report("reads idle", baseline)
+    report("login", logins, len(rejected))
+    report("reads storm", reads)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--hash-workers", type=int, default=4)
+    parser.add_argument("--rounds", type=int, default=12)
+    parser.add_argument("--logins", type=int, default=50)
+    parser.add_argument("--readers", type=int, default=10)
+    parser.add_argument("--duration", type=float, default=10)
+    parser.add_argument("--db-mode", choices=["sync", "async"], default="sync")
+    parser.add_argument("--port", type=int, default=8765)
+    args = parser.parse_args()
+
+    with server(args.port, HASH_POOL_WORKERS=args.hash_workers, BCRYPT_ROUNDS=args.rounds, DB_MODE=args.db_mode) as base_url:
+        asyncio.run(run(args, base_url))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,133 @@
+import argparse
+import os
+import random
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+from typing import List
+
+# Compara o caminho antigo da listagem (entidades do ORM + model pydantic por
+# linha) com o caminho rápido (tuplas + orjson) e os formatos em streaming.
+# Roda em processo, sem HTTP: mede só query + serialização, e o pico de memória
+# com tracemalloc (que deixa tudo mais lento; os tempos são para comparar entre si).
+#
+# Uso (dentro de backend/):
+#   python -m benchmarks.bench_serialization --pages 1000,10000,100000
+
+
+def seed(rows):
+    from sqlalchemy import insert
+    from app import database, models
+
+    db = database.SessionLocal()
+    user = models.User(email="bench-serial@example.com", hashed_password="x")
+    db.add(user)
+    db.flush()
+    categories = []
+    for name in ("Mercado", "Transporte", "Salário", "Casa"):
+        category = models.Category(name=name, icon="x", color="#888", owner_id=user.id)
+        db.add(category)
+        db.flush()
+        categories.append(category.id)
+
+    start = datetime(2020, 1, 1, 12)
+    batch = []
+    for i in range(rows):
+        batch.append({
+            "description": f"lançamento {i}",
+            "amount": round(random.uniform(1, 500), 2),
+            "type": "income" if i % 10 == 0 else "expense",
+            "category_id": categories[i % len(categories)],
+            "date": start + timedelta(minutes=i),
+            "is_fixed": False,
+            "owner_id": user.id,
+        })
+        if len(batch) >= 5000:
+            db.execute(insert(models.Transaction), batch)
+            batch.clear()
+    if batch:
+        db.execute(insert(models.Transaction), batch)
+    owner_id = user.id
+    db.commit()
+    db.close()
+    return owner_id
+
+
+def measure(fn, repeat):
+    # (melhor tempo em s, pico de memória em MB, bytes gerados)
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        size = fn()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+
+    tracemalloc.start()
+    fn()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return best, peak / 1024 / 1024, size
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--pages", default="1000,10000,100000", help="tamanhos de página")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+    pages = [int(p) for p in args.pages.split(",")]
+
+    os.environ.setdefault("DATABASE_URL", f"sqlite:///{tempfile.mkdtemp()}/bench.db")
+    from pydantic import TypeAdapter
+    from app import crud, database, models, schemas, serializers
+
+    models.Base.metadata.create_all(bind=database.engine)
+    owner_id = seed(max(pages))
+    adapter = TypeAdapter(List[schemas.TransactionResponse])
+
+    def orm(limit):
+        # O que o response_model fazia: valida cada entidade e gera o JSON
+        def run():
+            db = database.SessionLocal()
+            try:
+                transactions, _ = crud.list_transactions(db, owner_id, limit=limit)
+                return len(adapter.dump_json(adapter.validate_python(transactions, from_attributes=True)))
+            finally:
+                db.close()
+        return run
+
+    def fast(limit):
+        def run():
+            db = database.SessionLocal()
+            try:
+                body, _ = crud.list_transaction_rows(db, owner_id, limit=limit)
+                return len(body)
+            finally:
+                db.close()
+        return run
+
+    def stream(limit, encoder):
+        def run():
+            db = database.SessionLocal()
+            try:
+                rows, _ = crud.stream_transaction_rows(db, owner_id, limit=limit)
+                return sum(len(chunk) for chunk in encoder(rows))
+            finally:
+                db.close()
+        return run
+
+    print(f"{'linhas':>8} {'caminho':<8} {'tempo':>10} {'pico mem':>10} {'tamanho':>10}")
+    for limit in pages:
+        paths = [
+            ("orm", orm(limit)),
+            ("rápido", fast(limit)),
+            ("ndjson", stream(limit, serializers.ndjson)),
+            ("colunar", stream(limit, serializers.columns)),
+        ]
+        for name, fn in paths:
+            elapsed, peak, size = measure(fn, args.repeat)
+            print(f"{limit:>8} {name:<8} {elapsed * 1000:>8.1f}ms {peak:>8.1f}MB {size / 1024:>8.0f}KB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+import asyncio
+import contextlib
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import httpx
+
+# Peças comuns dos benchmarks: subir um uvicorn isolado e resumir latências
+
+
+def percentile(values, p):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p))]
+
+
+def summarize(latencies, elapsed=None):
+    result = {
+        "n": len(latencies),
+        "p50_ms": percentile(latencies, 0.50) * 1000,
+        "p95_ms": percentile(latencies, 0.95) * 1000,
+        "p99_ms": percentile(latencies, 0.99) * 1000,
+        "mean_ms": statistics.mean(latencies) * 1000 if latencies else 0.0,
+    }
+    if elapsed:
+        result["rps"] = len(latencies) / elapsed
+    return result
+
+
+def report(name, latencies, rejected=0, elapsed=None):
+    s = summarize(latencies, elapsed)
+    line = (
+        f"{name:<14} n={s['n']:<6} "
+        f"p50={s['p50_ms']:8.1f}ms p95={s['p95_ms']:8.1f}ms p99={s['p99_ms']:8.1f}ms "
+        f"mean={s['mean_ms']:8.1f}ms"
+    )
+    if elapsed:
+        line += f" rps={s['rps']:8.1f}"
+    if rejected:
+        line += f" rejeitados={rejected}"
+    print(line)
+    return s
+
+
+@contextlib.contextmanager
+def server_process(port, database_url=None, **env_overrides):
+    # uvicorn em subprocesso; SQLite temporário se não vier DATABASE_URL.
+    # Devolve (url, processo) — o processo serve para medir memória
+    if database_url is None:
+        database_url = f"sqlite:///{tempfile.mkdtemp()}/bench.db"
+    env = dict(os.environ, DATABASE_URL=database_url, **{k: str(v) for k, v in env_overrides.items()})
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(port), "--log-level", "warning"],
+        env=env,
+    )
+    try:
+        yield f"http://127.0.0.1:{port}", process
+    finally:
+        process.terminate()
+        process.wait()
+
+
+@contextlib.contextmanager
+def server(port, database_url=None, **env_overrides):
+    with server_process(port, database_url, **env_overrides) as (url, _):
+        yield url
+
+
+def peak_rss_mb(pid="self"):
+    # Pico de memória residente (VmHWM) do processo; None fora do Linux
+    try:
+        with open(f"/proc/{pid}/status") as status:
+            for line in status:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return None
+
+
+async def wait_ready(client):
+    for _ in range(100):
+        try:
+            await client.get("/docs")
+            return
+        except httpx.TransportError:
+            await asyncio.sleep(0.1)
+    raise RuntimeError("servidor não subiu")
+
+
+async def login(client, email, password):
+    await client.post("/users/", json={"email": email, "password": password})
+    r = await client.post("/token", data={"username": email, "password": password})
+    return {"Authorization": f"Bearer {r.json()['access_token']}"}
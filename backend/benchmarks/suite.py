@@ -0,0 +1,328 @@
+import argparse
+import asyncio
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+from datetime import datetime
+import httpx
+from . import seed
+from .common import login, peak_rss_mb, server_process, summarize, wait_ready
+
+# Suíte de benchmark das rotas reais, sobre dados do benchmarks/seed.py.
+# Dois modos:
+#   inprocess  o app roda neste processo (httpx + ASGITransport): sem rede,
+#              bom para comparar mudanças de código
+#   http       uvicorn de verdade em subprocesso, com carga concorrente
+# Cada cenário roda --requests operações com --concurrency clientes e reporta
+# rps, p50/p95/p99 e o pico de memória (RSS) do processo que serve o app.
+#
+# Uso (dentro de backend/):
+#   python -m benchmarks.suite --mode inprocess --save benchmarks/baselines/local.json
+#   python -m benchmarks.suite --mode inprocess --compare benchmarks/baselines/local.json --threshold 0.2
+#
+# Com --compare, sai com código 1 se algum cenário piorar mais que --threshold
+# (p95 maior ou rps menor, em fração da linha de base).
+
+SCENARIOS = ["login", "list", "list_month", "categories", "summary", "search", "autocomplete", "analytics", "sync", "clone", "crud", "batch"]
+QUERIES = ["mercado", "uber", "farmacia", "conta de luz", "acougue", "restaurante"]
+ANALYTICS = ["/analytics/trends?years=3", "/analytics/rolling?months=36&window=3", "/analytics/forecast?months=6"]
+
+
+class Context:
+    def __init__(self, users, until):
+        self.users = users # [(email, headers)]
+        self.until = until
+        self.categories = {} # email -> id de uma categoria
+        self.cursors = {} # email -> cursor do /sync completo feito no prepare()
+
+
+async def op_login(client, ctx, i):
+    email, _ = ctx.users[i % len(ctx.users)]
+    return [await client.post("/token", data={"username": email, "password": seed.PASSWORD})]
+
+
+async def op_list(client, ctx, i):
+    _, headers = ctx.users[i % len(ctx.users)]
+    return [await client.get("/transactions/?limit=100", headers=headers)]
+
+
+async def op_list_month(client, ctx, i):
+    _, headers = ctx.users[i % len(ctx.users)]
+    return [await client.get(f"/transactions/?year={ctx.until.year}&month={ctx.until.month}", headers=headers)]
+
+
+async def op_categories(client, ctx, i):
+    _, headers = ctx.users[i % len(ctx.users)]
+    return [await client.get("/categories", headers=headers)]
+
+
+async def op_summary(client, ctx, i):
+    _, headers = ctx.users[i % len(ctx.users)]
+    return [await client.get(f"/summary?year={ctx.until.year}&month={ctx.until.month}", headers=headers)]
+
+
+async def op_search(client, ctx, i):
+    _, headers = ctx.users[i % len(ctx.users)]
+    return [await client.get(f"/transactions/search?q={QUERIES[i % len(QUERIES)]}", headers=headers)]
+
+
+async def op_autocomplete(client, ctx, i):
+    _, headers = ctx.users[i % len(ctx.users)]
+    query = QUERIES[i % len(QUERIES)]
+    return [await client.get(f"/transactions/autocomplete?q={query[:1 + i % 4]}", headers=headers)]
+
+
+async def op_analytics(client, ctx, i):
+    _, headers = ctx.users[i % len(ctx.users)]
+    return [await client.get(ANALYTICS[i % len(ANALYTICS)], headers=headers)]
+
+
+async def op_sync(client, ctx, i):
+    # Sync incremental a partir do cursor do início (cresce com o crud/clone)
+    email, headers = ctx.users[i % len(ctx.users)]
+    return [await client.get(f"/sync?since={ctx.cursors[email]}", headers=headers)]
+
+
+async def op_clone(client, ctx, i):
+    # Cada operação gera um mês novo (usuário, mês) — não mede só o caminho idempotente
+    _, headers = ctx.users[i % len(ctx.users)]
+    offset = 1 + i // len(ctx.users)
+    index = ctx.until.year * 12 + ctx.until.month - 1 + offset
+    year, month = divmod(index, 12)
+    return [await client.post(f"/transactions/clone?target_year={year}&target_month={month + 1}", headers=headers)]
+
+
+async def op_crud(client, ctx, i):
+    email, headers = ctx.users[i % len(ctx.users)]
+    body = {"description": f"bench {i}", "amount": 42.5, "type": "expense",
+            "category_id": ctx.categories[email], "date": f"{ctx.until.year}-{ctx.until.month:02d}-10T12:00:00"}
+    created = await client.post("/transactions/", json=body, headers=headers)
+    if created.status_code != 200:
+        return [created]
+    tx_id = created.json()["id"]
+    updated = await client.put(f"/transactions/{tx_id}", json={**body, "amount": 43.5}, headers=headers)
+    deleted = await client.delete(f"/transactions/{tx_id}", headers=headers)
+    return [created, updated, deleted]
+
+
+async def op_batch(client, ctx, i):
+    # Seleção múltipla: cria 10 num lote, recategoriza e apaga os 10 em outros dois
+    email, headers = ctx.users[i % len(ctx.users)]
+    body = {"description": f"bench batch {i}", "amount": 10.0, "type": "expense",
+            "category_id": ctx.categories[email], "date": f"{ctx.until.year}-{ctx.until.month:02d}-12T12:00:00"}
+    created = await client.post("/transactions/batch", json={"operations": [{"op": "create", "data": body}] * 10},
+                                headers=headers)
+    if created.status_code != 200:
+        return [created]
+    ids = [r["id"] for r in created.json()["results"]]
+    moved = await client.post("/transactions/batch", json={"operations": [
+        {"op": "update", "where": {"ids": ids}, "data": {"category_id": ctx.categories[email], "is_fixed": False}},
+    ]}, headers=headers)
+    deleted = await client.post("/transactions/batch", json={"operations": [{"op": "delete", "id": tx_id} for tx_id in ids]},
+                                headers=headers)
+    return [created, moved, deleted]
+
+
+OPERATIONS = {
+    "login": op_login,
+    "list": op_list,
+    "list_month": op_list_month,
+    "categories": op_categories,
+    "summary": op_summary,
+    "search": op_search,
+    "autocomplete": op_autocomplete,
+    "analytics": op_analytics,
+    "sync": op_sync,
+    "clone": op_clone,
+    "crud": op_crud,
+    "batch": op_batch,
+}
+
+
+async def run_scenario(client, ctx, name, requests, concurrency):
+    operation = OPERATIONS[name]
+    latencies, errors = [], []
+    counter = iter(range(requests))
+
+    async def worker():
+        for i in counter:
+            start = time.perf_counter()
+            try:
+                responses = await operation(client, ctx, i)
+            except httpx.HTTPError as exc:
+                errors.append(type(exc).__name__)
+                continue
+            failed = [r.status_code for r in responses if r.status_code >= 400]
+            if failed:
+                errors.append(failed[0])
+                continue
+            latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*[worker() for _ in range(concurrency)])
+    result = summarize(latencies, time.perf_counter() - start)
+    result["errors"] = len(errors)
+    return result
+
+
+async def prepare(client, args):
+    await wait_ready(client)
+    users = []
+    for n in range(min(args.concurrency, args.users)):
+        users.append((seed.email(n), await login(client, seed.email(n), seed.PASSWORD)))
+    ctx = Context(users, args.until)
+    for email, headers in users:
+        ctx.categories[email] = (await client.get("/categories", headers=headers)).json()[0]["id"]
+        ctx.cursors[email] = (await client.get("/sync", headers=headers)).json()["cursor"]
+    return ctx
+
+
+async def run_all(client, args, pid):
+    ctx = await prepare(client, args)
+    results = {}
+    for name in args.scenarios:
+        results[name] = await run_scenario(client, ctx, name, args.requests, args.concurrency)
+        results[name]["peak_rss_mb"] = peak_rss_mb(pid)
+        print_result(name, results[name])
+    return results
+
+
+def print_result(name, r):
+    rss = f"{r['peak_rss_mb']:7.1f}MB" if r.get("peak_rss_mb") is not None else "      -"
+    print(f"{name:<12} n={r['n']:<5} rps={r.get('rps', 0):8.1f} p50={r['p50_ms']:7.1f}ms "
+          f"p95={r['p95_ms']:7.1f}ms p99={r['p99_ms']:7.1f}ms pico={rss} erros={r['errors']}")
+
+
+def seed_database(args):
+    from app import database, models, search
+
+    models.Base.metadata.create_all(bind=database.engine)
+    database.upgrade_schema(models.Base.metadata)
+    search.install(database.engine)
+    start = time.perf_counter()
+    counts = seed.generate(database.SessionLocal, args.users, args.years, args.per_month, args.seed, args.until)
+    print(f"dados: {counts['users']} usuários, {counts['transactions']} transações "
+          f"({time.perf_counter() - start:.1f}s)")
+
+
+def run_inprocess(args):
+    from app.main import app
+
+    seed_database(args)
+
+    async def go():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=120) as client:
+            return await run_all(client, args, "self")
+    return asyncio.run(go())
+
+
+def run_http(args):
+    seed_database(args)
+    env = dict(DB_MODE=args.db_mode, BCRYPT_ROUNDS=args.rounds)
+    with server_process(args.port, os.environ["DATABASE_URL"], **env) as (base_url, process):
+        async def go():
+            limits = httpx.Limits(max_connections=args.concurrency + 10, max_keepalive_connections=args.concurrency + 10)
+            async with httpx.AsyncClient(base_url=base_url, timeout=120, limits=limits) as client:
+                return await run_all(client, args, process.pid)
+        return asyncio.run(go())
+
+
+# --- LINHAS DE BASE ---
+
+def compare(baseline, results, threshold):
+    # Lista de (cenário, motivo) que pioraram além do limite
+    regressions = []
+    for name, current in results.items():
+        base = baseline["results"].get(name)
+        if not base:
+            continue
+        p95 = (current["p95_ms"] - base["p95_ms"]) / base["p95_ms"] if base["p95_ms"] else 0.0
+        rps = (current.get("rps", 0) - base.get("rps", 0)) / base["rps"] if base.get("rps") else 0.0
+        print(f"{name:<12} p95 {base['p95_ms']:7.1f} -> {current['p95_ms']:7.1f}ms ({p95:+.0%})  "
+              f"rps {base.get('rps', 0):8.1f} -> {current.get('rps', 0):8.1f} ({rps:+.0%})")
+        if p95 > threshold:
+            regressions.append((name, f"p95 {p95:+.0%}"))
+        if rps < -threshold:
+            regressions.append((name, f"rps {rps:+.0%}"))
+        if current["errors"] > base.get("errors", 0):
+            regressions.append((name, f"erros {base.get('errors', 0)} -> {current['errors']}"))
+    return regressions
+
+
+def meta(args):
+    return {
+        "mode": args.mode,
+        "db_mode": args.db_mode,
+        "database": "postgresql" if os.environ["DATABASE_URL"].startswith("postgres") else "sqlite",
+        "users": args.users,
+        "years": args.years,
+        "per_month": args.per_month,
+        "seed": args.seed,
+        "requests": args.requests,
+        "concurrency": args.concurrency,
+        "rounds": args.rounds,
+        "python": platform.python_version(),
+        "created_at": datetime.now().isoformat(timespec="seconds"),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark das rotas sobre dados sintéticos")
+    parser.add_argument("--mode", choices=["inprocess", "http"], default="inprocess")
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS))
+    parser.add_argument("--users", type=int, default=20)
+    parser.add_argument("--years", type=int, default=2)
+    parser.add_argument("--per-month", type=int, default=40)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--requests", type=int, default=200, help="operações por cenário")
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument("--rounds", type=int, default=12, help="BCRYPT_ROUNDS (custo do login)")
+    parser.add_argument("--db-mode", choices=["sync", "async"], default="sync")
+    parser.add_argument("--database-url", default=None, help="banco VAZIO; padrão: SQLite temporário")
+    parser.add_argument("--port", type=int, default=8767)
+    parser.add_argument("--save", default=None, help="grava o resultado como linha de base (JSON)")
+    parser.add_argument("--compare", default=None, help="linha de base para comparar")
+    parser.add_argument("--threshold", type=float, default=0.2, help="piora tolerada (0.2 = 20%%)")
+    args = parser.parse_args()
+    args.scenarios = [s for s in args.scenarios.split(",") if s]
+    unknown = set(args.scenarios) - OPERATIONS.keys()
+    if unknown:
+        parser.error(f"cenários desconhecidos: {', '.join(sorted(unknown))}")
+
+    # Configuração antes de importar o app (database.py lê o ambiente no import).
+    # Data fixa: mesma --seed gera os mesmos dados em qualquer dia
+    os.environ["DATABASE_URL"] = args.database_url or f"sqlite:///{tempfile.mkdtemp()}/bench.db"
+    os.environ["DB_MODE"] = args.db_mode
+    os.environ["BCRYPT_ROUNDS"] = str(args.rounds)
+    args.until = datetime(2026, 6, 1)
+
+    results = run_inprocess(args) if args.mode == "inprocess" else run_http(args)
+    report = {"meta": meta(args), "results": results}
+
+    if args.save:
+        os.makedirs(os.path.dirname(os.path.abspath(args.save)), exist_ok=True)
+        with open(args.save, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"linha de base gravada em {args.save}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        different = {k: (v, report["meta"].get(k)) for k, v in baseline["meta"].items()
+                     if k not in ("created_at", "python") and report["meta"].get(k) != v}
+        if different:
+            print(f"⚠️ parâmetros diferentes da linha de base: {different}")
+        regressions = compare(baseline, results, args.threshold)
+        if regressions:
+            for name, reason in regressions:
+                print(f"❌ regressão em {name}: {reason}")
+            sys.exit(1)
+        print(f"✅ nenhuma regressão acima de {args.threshold:.0%}")
+
+
+if __name__ == "__main__":
+    main()
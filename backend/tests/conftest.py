@@ -0,0 +1,49 @@
+import os
+import tempfile
+from datetime import datetime
+
+# Banco SQLite temporário e bcrypt barato, antes de importar o app
+os.environ["DATABASE_URL"] = f"sqlite:///{tempfile.mkdtemp()}/test.db"
+os.environ["HASH_POOL_WORKERS"] = "0"
+os.environ["BCRYPT_ROUNDS"] = "4"
+os.environ["REPORT_WORKERS"] = "0" # relatórios numa thread, sem processos
+os.environ["REPORT_DIR"] = tempfile.mkdtemp()
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import event
+from app import database, main
+from benchmarks import seed
+
+
+# SQLite só confere FK com o PRAGMA ligado; o PostgreSQL sempre confere
+def foreign_keys(sync_engine):
+    @event.listens_for(sync_engine, "connect")
+    def connect(dbapi_connection, connection_record):
+        dbapi_connection.execute("PRAGMA foreign_keys=ON")
+
+
+foreign_keys(database.engine)
+if database.async_engine is not None:
+    foreign_keys(database.async_engine.sync_engine)
+
+
+@pytest.fixture(scope="session")
+def client():
+    with TestClient(main.app) as client:
+        seed.generate(database.SessionLocal, 1, 2, 30, until=datetime.now())
+        yield client
+
+
+@pytest.fixture(scope="session")
+def headers(client):
+    token = client.post("/token", data={"username": seed.email(0), "password": seed.PASSWORD}).json()["access_token"]
+    return {"Authorization": f"Bearer {token}"}
+
+
+@pytest.fixture
+def db():
+    db = database.SessionLocal()
+    yield db
+    db.rollback()
+    db.close()
@@ -0,0 +1,14 @@
+# Atalhos para criar dados pela API nos testes
+
+
+def make_category(client, headers, name):
+    response = client.post("/categories/", json={"name": name, "icon": "x", "color": "#fff"}, headers=headers)
+    assert response.status_code == 200, response.text
+    return response.json()
+
+
+def other_user_headers(client, email):
+    response = client.post("/users/", json={"email": email, "password": "senha123"})
+    assert response.status_code == 200, response.text
+    token = client.post("/token", data={"username": email, "password": "senha123"}).json()["access_token"]
+    return {"Authorization": f"Bearer {token}"}
@@ -0,0 +1,78 @@
+from app import models
+from .helpers import make_category, other_user_headers
+
+
+def add_rule(db, owner_id, category_id):
+    # Regra sem nenhuma transação: a categoria só é citada por ela
+    rule = models.RecurringRule(
+        owner_id=owner_id, description="Academia", amount=90, type="expense",
+        category_id=category_id, day_of_month=5, start_period=0, end_period=1,
+    )
+    db.add(rule)
+    db.commit()
+    return rule.id
+
+
+def test_delete_category_used_only_by_rule_is_refused(client, headers, db):
+    category = make_category(client, headers, "Só regra")
+    rule_id = add_rule(db, category["owner_id"], category["id"])
+
+    response = client.delete(f"/categories/{category['id']}", headers=headers)
+    assert response.status_code == 400
+    assert "reassign_to" in response.json()["detail"]
+    assert db.get(models.RecurringRule, rule_id).category_id == category["id"]
+
+
+def test_delete_category_reassigns_rules(client, headers, db):
+    category = make_category(client, headers, "Antiga")
+    target = make_category(client, headers, "Nova")
+    rule_id = add_rule(db, category["owner_id"], category["id"])
+
+    response = client.delete(f"/categories/{category['id']}?reassign_to={target['id']}", headers=headers)
+    assert response.status_code == 200, response.text
+    db.expire_all()
+    assert db.get(models.RecurringRule, rule_id).category_id == target["id"]
+    assert db.get(models.Category, category["id"]) is None
+
+
+def test_delete_empty_category(client, headers):
+    category = make_category(client, headers, "Vazia")
+    response = client.delete(f"/categories/{category['id']}", headers=headers)
+    assert response.status_code == 200
+    assert response.json()["reassigned"] == 0
+
+
+def test_transaction_in_someone_elses_category_is_refused(client, headers):
+    category = make_category(client, headers, "Minha")
+    other = other_user_headers(client, "outro@example.com")
+    data = {"description": "Intruso", "amount": 1, "type": "expense", "category_id": category["id"]}
+
+    response = client.post("/transactions/", json=data, headers=other)
+    assert response.status_code == 404
+
+    own = client.post("/categories/", json={"name": "Dele", "icon": "x", "color": "#000"}, headers=other).json()
+    created = client.post("/transactions/", json={**data, "category_id": own["id"]}, headers=other).json()
+    response = client.put(f"/transactions/{created['id']}", json=data, headers=other)
+    assert response.status_code == 404
+
+
+def test_delete_category_referenced_by_another_account(client, headers, db):
+    category = make_category(client, headers, "Compartilhada")
+    other = other_user_headers(client, "legado@example.com")
+    # Dado antigo: transação de outra conta na categoria (antes da checagem)
+    tx = models.Transaction(description="Legado", amount=1, type="expense", category_id=category["id"],
+                            owner_id=db.query(models.User.id).filter(models.User.email == "legado@example.com").scalar())
+    db.add(tx)
+    db.commit()
+
+    try:
+        response = client.delete(f"/categories/{category['id']}", headers=headers)
+        assert response.status_code == 400
+        target = make_category(client, headers, "Destino")
+        response = client.delete(f"/categories/{category['id']}?reassign_to={target['id']}", headers=headers)
+        assert response.status_code == 400
+        assert db.get(models.Category, category["id"]) is not None
+    finally:
+        # Inserida por fora do rollup: não pode sobrar para os outros testes
+        db.delete(tx)
+        db.commit()
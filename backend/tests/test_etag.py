@@ -0,0 +1,107 @@
+import itertools
+import pytest
+from .helpers import make_category, other_user_headers
+
+
+def etag(client, headers, url):
+    response = client.get(url, headers=headers)
+    assert response.status_code == 200, response.text
+    return response.headers["etag"]
+
+
+def status_with(client, headers, url, tag):
+    return client.get(url, headers={**headers, "If-None-Match": tag}).status_code
+
+
+@pytest.fixture(scope="module")
+def account(client):
+    headers = other_user_headers(client, "etag@example.com")
+    category = make_category(client, headers, "ETag")
+    return headers, category
+
+
+def transaction(client, headers, category_id, **extra):
+    response = client.post("/transactions/", json={
+        "description": "Mercado", "amount": 10, "type": "expense", "category_id": category_id, **extra,
+    }, headers=headers)
+    assert response.status_code == 200, response.text
+    return response.json()
+
+
+def test_conditional_get(client, account):
+    headers, _ = account
+    tag = etag(client, headers, "/categories")
+    assert tag.startswith('W/"')
+    response = client.get("/categories", headers={**headers, "If-None-Match": tag})
+    assert response.status_code == 304
+    assert response.headers["etag"] == tag
+    assert response.content == b""
+    # Sem W/, em lista e com *
+    assert status_with(client, headers, "/categories", tag[2:]) == 304
+    assert status_with(client, headers, "/categories", f'W/"x", {tag}') == 304
+    assert status_with(client, headers, "/categories", "*") == 304
+    assert status_with(client, headers, "/categories", 'W/"outro"') == 200
+    # Cada rota + query string tem o seu ETag
+    assert etag(client, headers, "/transactions/?limit=5") != etag(client, headers, "/transactions/?limit=6")
+
+
+imports = itertools.count() # cada importação com uma linha nova (reimportar não escreve nada)
+
+WRITES = {
+    "create": lambda c, h, cat: transaction(c, h, cat["id"]),
+    "update": lambda c, h, cat: c.put(f"/transactions/{transaction(c, h, cat['id'])['id']}", json={
+        "description": "Feira", "amount": 5, "type": "expense", "category_id": cat["id"]}, headers=h),
+    "delete": lambda c, h, cat: c.delete(f"/transactions/{transaction(c, h, cat['id'])['id']}", headers=h),
+    "batch": lambda c, h, cat: c.post("/transactions/batch", json={"operations": [
+        {"op": "create", "data": {"description": "Lote", "amount": 1, "type": "income", "category_id": cat["id"]}}]},
+        headers=h),
+    "category": lambda c, h, cat: c.put(f"/categories/{cat['id']}", json={
+        "name": "ETag 2", "icon": "y", "color": "#000"}, headers=h),
+    "import": lambda c, h, cat: c.post(f"/transactions/import?default_category_id={cat['id']}", files={
+        "file": ("e.csv", f"date,description,amount\n2030-02-01,Importada {next(imports)},-3.50\n".encode(),
+                 "text/csv")}, headers=h),
+}
+
+
+@pytest.mark.parametrize("write", WRITES)
+@pytest.mark.parametrize("url", ["/transactions/?limit=50", "/categories", "/sync", "/summary?year=2030&month=2"])
+def test_every_write_invalidates_the_etag(client, account, write, url):
+    # O after_commit tira a versão do cache deste processo: o ETag muda na hora
+    headers, category = account
+    before = etag(client, headers, url)
+    assert status_with(client, headers, url, before) == 304
+
+    response = WRITES[write](client, headers, category)
+    assert getattr(response, "status_code", 200) == 200
+
+    assert status_with(client, headers, url, before) == 200
+    after = etag(client, headers, url)
+    assert after != before
+    assert status_with(client, headers, url, after) == 304
+
+
+def test_other_accounts_writes_keep_my_etag(client, account, headers):
+    mine, _ = account
+    tag = etag(client, mine, "/transactions/?limit=50")
+    other_category = client.get("/categories", headers=headers).json()[0]
+    transaction(client, headers, other_category["id"])
+    assert status_with(client, mine, "/transactions/?limit=50", tag) == 304
+
+
+def test_failed_write_keeps_the_etag(client, account):
+    headers, _ = account
+    tag = etag(client, headers, "/transactions/?limit=50")
+    response = client.post("/transactions/batch", json={"operations": [{"op": "update", "id": 999999,
+                                                                        "data": {"amount": 1}}]}, headers=headers)
+    assert response.status_code == 400
+    assert status_with(client, headers, "/transactions/?limit=50", tag) == 304
+
+
+def test_reimport_keeps_the_etag(client, account):
+    headers, category = account
+    upload = {"file": ("r.csv", b"date,description,amount\n2030-03-01,Reimportada,-9\n", "text/csv")}
+    url = f"/transactions/import?default_category_id={category['id']}"
+    assert client.post(url, files=upload, headers=headers).json()["inserted"] == 1
+    tag = etag(client, headers, "/transactions/?limit=50")
+    assert client.post(url, files=upload, headers=headers).json()["skipped"] == 1
+    assert status_with(client, headers, "/transactions/?limit=50", tag) == 304
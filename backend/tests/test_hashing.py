@@ -0,0 +1,18 @@
+import asyncio
+import threading
+from app import hashing
+
+
+def test_inline_mode_keeps_bcrypt_off_the_event_loop():
+    assert hashing.HASH_POOL_WORKERS <= 0 # conftest: sem pool de processos
+
+    async def main():
+        loop_thread = threading.get_ident()
+        worker_thread = await hashing.run_async(threading.get_ident)
+        hashed = await hashing.hash_password_async("segredo")
+        ok, new_hash = await hashing.verify_and_update_async("segredo", hashed)
+        return loop_thread, worker_thread, ok, new_hash
+
+    loop_thread, worker_thread, ok, new_hash = asyncio.run(main())
+    assert worker_thread != loop_thread
+    assert ok and new_hash is None
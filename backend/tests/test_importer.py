@@ -0,0 +1,107 @@
+import io
+import pytest
+from app import importer
+
+
+@pytest.mark.parametrize("raw, expected", [
+    ("1.234,56", 1234.56),
+    ("1,234.56", 1234.56),
+    ("R$ 1.234.567,89", 1234567.89),
+    ("1,234,567.89", 1234567.89),
+    ("-12,50", -12.5),
+    ("-12.5", -12.5),
+    ("1.234.567", 1234567),
+    ("1500", 1500),
+    ("1500.00", 1500),
+])
+def test_parse_amount(raw, expected):
+    assert importer.parse_amount(raw) == pytest.approx(expected)
+
+
+@pytest.mark.parametrize("raw", ["1,234", "1.234", "1,23.45", "1.234,5,6", "12,34.567,8"])
+def test_parse_amount_refuses_ambiguous_or_malformed(raw):
+    with pytest.raises(ValueError):
+        importer.parse_amount(raw)
+
+
+def test_parse_amount_with_explicit_decimal():
+    assert importer.parse_amount("1,234", decimal=",") == pytest.approx(1.234)
+    assert importer.parse_amount("1,234", decimal=".") == 1234
+    assert importer.parse_amount("1.234", decimal=",") == 1234
+
+
+def parse_csv(text, **kwargs):
+    return list(importer.parse_csv(io.BytesIO(text.encode("utf-8")), **kwargs))
+
+
+def test_csv_brazilian_and_us_rows():
+    rows = parse_csv(
+        "Data;Histórico;Valor;Categoria\n"
+        "05/01/2024;Mercado  Central;-1.234,56;Mercado\n"
+        "\n"
+        "06/01/2024;Salário;5.000,00;\n"
+    )
+    assert [line for line, _ in rows] == [2, 4]
+    first, second = rows[0][1], rows[1][1]
+    assert first["description"] == "Mercado Central"
+    assert (first["amount"], first["type"], first["category"]) == (1234.56, "expense", "Mercado")
+    assert first["date"].isoformat() == "2024-01-05T12:00:00"
+    assert (second["amount"], second["type"]) == (5000.0, "income")
+
+    rows = parse_csv("date,description,amount\n2024-01-05,Coffee,\"-1,234.56\"\n")
+    assert rows[0][1]["amount"] == 1234.56
+
+
+def test_csv_bad_rows_are_reported_not_guessed():
+    rows = parse_csv("date,description,amount\n2024-01-05,Coffee,\"1,234\"\nontem,Pão,10\n2024-01-06,,10\n")
+    assert [line for line, _ in rows] == [2, 3, 4]
+    assert all(isinstance(row, ValueError) for _, row in rows)
+    assert "ambíguo" in str(rows[0][1])
+
+
+def test_csv_missing_columns():
+    with pytest.raises(importer.StatementError):
+        parse_csv("date;memo\n2024-01-05;Café\n")
+
+
+OFX = """OFXHEADER:100
+DATA:OFXSGML
+ENCODING:UTF-8
+
+<OFX><BANKMSGSRSV1><STMTTRNRS><STMTRS><BANKTRANLIST>
+<STMTTRN><TRNTYPE>DEBIT<DTPOSTED>20240105120000[-3:BRT]<TRNAMT>-1,500.00<MEMO>P&atilde;o &amp; Caf&eacute;</STMTTRN>
+<STMTTRN><TRNTYPE>CREDIT<DTPOSTED>20240106<TRNAMT>250,75<NAME>PIX recebido</STMTTRN>
+<STMTTRN><TRNTYPE>DEBIT<DTPOSTED>20240107<TRNAMT>abc<MEMO>Quebrado</STMTTRN>
+</BANKTRANLIST></STMTRS></STMTTRNRS></BANKMSGSRSV1></OFX>
+"""
+
+
+def test_ofx_sgml():
+    rows = list(importer.parse_ofx(io.BytesIO(OFX.encode("utf-8"))))
+    assert [line for line, _ in rows] == [1, 2, 3]
+    first, second, broken = (row for _, row in rows)
+    assert first["description"] == "Pão & Café"
+    assert (first["amount"], first["type"]) == (1500.0, "expense")
+    assert first["date"].isoformat() == "2024-01-05T12:00:00"
+    assert (second["description"], second["amount"], second["type"]) == ("PIX recebido", 250.75, "income")
+    assert isinstance(broken, ValueError)
+
+
+def test_ofx_tag_split_across_chunks():
+    data = OFX.encode("utf-8")
+    tokens = list(importer.ofx_tokens(io.BytesIO(data), chunk_size=7))
+    assert tokens == list(importer.ofx_tokens(io.BytesIO(data)))
+    assert (False, "MEMO", "Pão & Café") in tokens
+
+
+def test_import_reports_ambiguous_amount(client, headers):
+    category_id = client.get("/categories", headers=headers).json()[0]["id"]
+    data = "date,description,amount\n2033-01-05,Importado A,\"1,234\"\n2033-01-06,Importado B,\"1,234.50\"\n"
+    response = client.post(
+        f"/transactions/import?default_category_id={category_id}",
+        files={"file": ("extrato.csv", data.encode(), "text/csv")}, headers=headers,
+    )
+    assert response.status_code == 200, response.text
+    result = response.json()
+    assert (result["inserted"], result["failed"]) == (1, 1)
+    assert result["errors"][0]["line"] == 2
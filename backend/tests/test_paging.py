@@ -0,0 +1,65 @@
+import json
+from .helpers import make_category, other_user_headers
+
+SAME_DAY = "2030-06-15T12:00:00"
+
+
+def fill(client, headers):
+    # 7 lançamentos no MESMO instante (empate na data) entre outros dias
+    category = make_category(client, headers, "Paginação")
+    dates = ["2030-06-16T12:00:00"] + [SAME_DAY] * 7 + ["2030-06-14T12:00:00", "2030-05-01T12:00:00"]
+    ids = []
+    for index, date in enumerate(dates):
+        response = client.post("/transactions/", json={
+            "description": f"Item {index}", "amount": index + 1, "type": "expense",
+            "category_id": category["id"], "date": date,
+        }, headers=headers)
+        assert response.status_code == 200, response.text
+        ids.append((date, response.json()["id"]))
+    # ORDER BY date DESC, id DESC
+    return [tx_id for _, tx_id in sorted(ids, reverse=True)]
+
+
+def read_pages(client, headers, limit, **params):
+    ids, cursor, pages = [], None, 0
+    while True:
+        query = {"limit": limit, **params, **({"cursor": cursor} if cursor else {})}
+        response = client.get("/transactions/", params=query, headers=headers)
+        assert response.status_code == 200, response.text
+        if params.get("format") == "ndjson":
+            ids += [json.loads(line)["id"] for line in response.text.splitlines()]
+        elif params.get("format") == "columns":
+            body = response.json()
+            ids += [row[body["columns"].index("id")] for row in body["rows"]]
+        elif params.get("compact"):
+            ids += [t["id"] for t in response.json()["transactions"]]
+        else:
+            ids += [t["id"] for t in response.json()]
+        pages += 1
+        cursor = response.headers.get("x-next-cursor")
+        if not cursor:
+            return ids, pages
+
+
+def test_keyset_pages_walk_ties_without_gaps_or_repeats(client):
+    headers = other_user_headers(client, "paginas@example.com")
+    expected = fill(client, headers)
+
+    for limit in (1, 2, 3, 7):
+        for params in ({}, {"compact": True}, {"format": "ndjson"}, {"format": "columns"}):
+            ids, pages = read_pages(client, headers, limit, **params)
+            assert ids == expected, (limit, params)
+            assert pages == -(-len(expected) // limit) # última página cheia não pede outra
+
+
+def test_cursor_combines_with_the_period_filter(client):
+    headers = other_user_headers(client, "paginas-mes@example.com")
+    expected = fill(client, headers)
+    june = expected[:-1] # o último é de maio
+    ids, _ = read_pages(client, headers, 3, year=2030, month=6)
+    assert ids == june
+
+
+def test_invalid_cursor_is_a_bad_request(client, headers):
+    response = client.get("/transactions/", params={"cursor": "não-é-um-cursor"}, headers=headers)
+    assert response.status_code == 400
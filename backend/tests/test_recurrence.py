@@ -0,0 +1,48 @@
+from app import models, recurrence
+
+Rule = models.RecurringRule
+Tx = models.Transaction
+
+
+def create_fixed(client, headers, description, date):
+    category_id = client.get("/categories", headers=headers).json()[0]["id"]
+    response = client.post("/transactions/", json={
+        "description": description, "amount": 50, "type": "expense",
+        "category_id": category_id, "is_fixed": True, "date": date,
+    }, headers=headers)
+    assert response.status_code == 200, response.text
+    return response.json()
+
+
+def clone(client, headers, year, month):
+    response = client.post(f"/transactions/clone?target_year={year}&target_month={month}", headers=headers)
+    assert response.status_code == 200, response.text
+
+
+def test_clone_twice_adopts_once(client, headers, db):
+    tx = create_fixed(client, headers, "Aluguel", "2031-01-10T12:00:00")
+    clone(client, headers, 2031, 2)
+    clone(client, headers, 2031, 2)
+
+    rules = db.query(Rule.id).filter(Rule.source_transaction_id == tx["id"]).all()
+    assert len(rules) == 1
+    assert db.get(Tx, tx["id"]).rule_id == rules[0].id
+    occurrences = db.query(Tx.id).filter(Tx.rule_id == rules[0].id, Tx.period == recurrence.period_of(2031, 2)).count()
+    assert occurrences == 1
+
+
+def test_adopt_ignores_stale_rule_with_reused_id(client, headers, db):
+    tx = create_fixed(client, headers, "Internet", "2032-01-10T12:00:00")
+    # Regra antiga que aponta para o mesmo id (transação apagada, id reaproveitado)
+    stale = Rule(owner_id=tx["owner_id"], description="Velha", amount=1, type="expense",
+                 category_id=tx["category_id"], day_of_month=1, start_period=0, end_period=0,
+                 source_transaction_id=tx["id"])
+    db.add(stale)
+    db.commit()
+
+    clone(client, headers, 2032, 2)
+    db.expire_all()
+    rule = db.get(Rule, db.get(Tx, tx["id"]).rule_id)
+    assert rule.id != stale.id
+    assert rule.description == "Internet"
+    assert db.get(Rule, stale.id).source_transaction_id is None
@@ -0,0 +1,54 @@
+import os
+import time
+from datetime import datetime
+from app import models, reports
+
+
+def wait_ready(client, headers, report_id):
+    for _ in range(200):
+        response = client.get(f"/reports/{report_id}", headers=headers)
+        if response.status_code != 202:
+            return response
+        time.sleep(0.05)
+    raise AssertionError("relatório não ficou pronto")
+
+
+def test_report_is_rendered_without_leftover_temporaries(client, headers):
+    year = datetime.now().year
+    response = client.post("/reports", json={"year": year}, headers=headers)
+    assert response.status_code in (200, 202), response.text
+
+    response = wait_ready(client, headers, response.json()["id"])
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/pdf"
+    for folder, _, files in os.walk(reports.REPORT_DIR):
+        assert not [name for name in files if name.endswith(".tmp")]
+
+
+def test_failed_report_is_a_status_not_a_server_error(client, headers, db):
+    report_id = client.post("/reports", json={"year": 2001, "month": 1}, headers=headers).json()["id"]
+    wait_ready(client, headers, report_id)
+    reports.mark_failed(db, report_id, "disco cheio")
+
+    response = client.get(f"/reports/{report_id}", headers=headers)
+    assert response.status_code == 200
+    assert (response.json()["status"], response.json()["error"]) == ("failed", "disco cheio")
+
+
+def test_concurrent_renders_use_their_own_temporary(db, monkeypatch):
+    # Dois renders do mesmo relatório (pedido refeito com o primeiro ainda
+    # escrevendo): cada um no seu temporário, o arquivo final fica inteiro
+    report = models.Report(owner_id=1, period=reports.period_key(2001, 2), data_version=0, status="pending")
+    seen = []
+    output = reports.FPDF.output
+
+    def spy(self, name, dest=""):
+        seen.append(name)
+        return output(self, name, dest)
+
+    monkeypatch.setattr(reports.FPDF, "output", spy)
+    first = reports.render(db, report)
+    second = reports.render(db, report)
+    assert first == second
+    assert len(set(seen)) == 2 and not any(os.path.exists(name) for name in seen)
+    assert os.path.getsize(reports.file_path(first)) > 0
@@ -0,0 +1,49 @@
+from datetime import datetime
+from app import models, search, summary
+
+# O rollup mensal e o autocomplete são mantidos por deltas; depois de qualquer
+# escrita têm de bater com um rebuild do zero
+
+
+def snapshot(db):
+    S, D = models.MonthlySummary, models.DescriptionStat
+    rollup = db.query(S.owner_id, S.year, S.month, S.category_id, S.type, S.total, S.count)
+    stats = db.query(D.owner_id, D.key, D.category_id, D.count)
+    return (
+        sorted((*r[:5], round(r[5], 2), r[6]) for r in rollup),
+        sorted(tuple(r) for r in stats),
+    )
+
+
+def assert_matches_rebuild(db):
+    db.expire_all()
+    before = snapshot(db)
+    summary.rebuild(db)
+    search.rebuild(db)
+    db.flush()
+    assert before == snapshot(db)
+    db.rollback()
+
+
+def test_batch_and_reassign_match_rebuild(client, headers, db):
+    assert_matches_rebuild(db)
+    ids = [c["id"] for c in client.get("/categories", headers=headers).json()]
+    txs = client.get("/transactions/?limit=20", headers=headers).json()
+
+    operations = [
+        {"op": "create", "data": {"description": "Padaria Nova", "amount": 12.5, "type": "expense", "category_id": ids[0]}},
+        {"op": "create", "data": {"description": "Freela", "amount": 300, "type": "income",
+                                  "category_id": ids[1], "date": "2025-03-10T12:00:00"}},
+        {"op": "update", "id": txs[0]["id"], "data": {"amount": 99.9, "description": "Mercado Editado"}},
+        {"op": "update", "where": {"category_id": ids[3], "year": datetime.now().year}, "data": {"category_id": ids[4]}},
+        {"op": "delete", "id": txs[1]["id"]},
+        {"op": "delete", "where": {"ids": [t["id"] for t in txs[2:5]]}},
+    ]
+    response = client.post("/transactions/batch", json={"operations": operations}, headers=headers)
+    assert response.status_code == 200, response.text
+    assert response.json()["deleted"] == 4
+    assert_matches_rebuild(db)
+
+    response = client.delete(f"/categories/{ids[5]}?reassign_to={ids[0]}", headers=headers)
+    assert response.status_code == 200, response.text
+    assert_matches_rebuild(db)
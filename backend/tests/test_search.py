@@ -0,0 +1,57 @@
+from sqlalchemy import create_engine, text
+from app import database, models, search
+from .helpers import make_category, other_user_headers
+
+
+def search_ids(client, headers, q):
+    response = client.get("/transactions/search", params={"q": q}, headers=headers)
+    assert response.status_code == 200, response.text
+    return [t["id"] for t in response.json()]
+
+
+def test_search_only_sees_the_owners_transactions(client, headers):
+    other = other_user_headers(client, "busca@example.com")
+    mine = make_category(client, headers, "Busca minha")
+    theirs = client.post("/categories/", json={"name": "Busca dele", "icon": "x", "color": "#000"}, headers=other).json()
+    data = {"description": "Quitanda São Jorge", "amount": 10, "type": "expense"}
+    own = client.post("/transactions/", json={**data, "category_id": mine["id"]}, headers=headers).json()
+    foreign = client.post("/transactions/", json={**data, "category_id": theirs["id"]}, headers=other).json()
+
+    for q in ("quitanda", "SAO JORGE", "jo"): # trigramas e busca curta
+        assert own["id"] in search_ids(client, headers, q)
+        assert foreign["id"] not in search_ids(client, headers, q)
+        assert search_ids(client, other, q) == [foreign["id"]]
+
+    # Triggers: a edição e a exclusão chegam ao índice
+    client.put(f"/transactions/{own['id']}", json={**data, "description": "Hortifruti", "category_id": mine["id"]},
+               headers=headers)
+    assert own["id"] not in search_ids(client, headers, "quitanda")
+    assert own["id"] in search_ids(client, headers, "hortifruti")
+    client.delete(f"/transactions/{foreign['id']}", headers=other)
+    assert search_ids(client, other, "quitanda") == []
+
+
+def test_old_fts_table_is_rebuilt_with_the_owner(tmp_path):
+    if search.BACKEND != "fts5":
+        return
+    engine = create_engine(f"sqlite:///{tmp_path}/old.db")
+    database.sqlite_functions(engine)
+    models.Base.metadata.create_all(bind=engine)
+    with engine.begin() as conn:
+        conn.execute(text("INSERT INTO users (id, email, data_version, sync_floor) VALUES (7, 'a@b', 0, 0)"))
+        conn.execute(text("INSERT INTO transactions (id, owner_id, description) VALUES (3, 7, 'Padaria')"))
+        # Esquema antigo: rowid = id
+        conn.execute(text("CREATE VIRTUAL TABLE transactions_fts USING fts5(description, content='', tokenize='trigram')"))
+        conn.execute(text("CREATE TRIGGER transactions_fts_insert AFTER INSERT ON transactions BEGIN "
+                          "INSERT INTO transactions_fts(rowid, description) VALUES (new.id, new.description); END"))
+        conn.execute(text("INSERT INTO transactions_fts(rowid, description) VALUES (3, 'padaria')"))
+
+    backend = search.BACKEND
+    try:
+        search.install(engine)
+    finally:
+        search.BACKEND = backend
+    with engine.connect() as conn:
+        rowids = conn.execute(text("SELECT rowid FROM transactions_fts WHERE transactions_fts MATCH '\"pad\"'")).scalars().all()
+    assert rowids == [7 * search.OWNER_SHIFT + 3]
+    engine.dispose()
@@ -0,0 +1,41 @@
+import json
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+import pytest
+from app import schemas, serializers
+from .helpers import make_category
+
+
+def pydantic_json(row) -> bytes:
+    # O que o FastAPI faz com o response_model: dump em modo json + JSONResponse
+    tx = dict(zip(serializers.TX_FIELDS, row[:len(serializers.TX_FIELDS)]))
+    category = dict(zip(serializers.CATEGORY_FIELDS, row[len(serializers.TX_FIELDS):]))
+    model = schemas.TransactionResponse.model_validate(
+        SimpleNamespace(**tx, category=SimpleNamespace(**category)), from_attributes=True,
+    )
+    return json.dumps([model.model_dump(mode="json")], ensure_ascii=False, separators=(",", ":")).encode()
+
+
+@pytest.mark.parametrize("when", [
+    datetime(2024, 1, 5, 12, tzinfo=timezone.utc), # PostgreSQL (timestamptz em UTC)
+    datetime(2024, 1, 5, 12, 0, 0, 123456, tzinfo=timezone.utc),
+    datetime(2024, 1, 5, 9, tzinfo=timezone(timedelta(hours=-3))),
+    datetime(2024, 1, 5, 12), # SQLite (sem fuso)
+])
+@pytest.mark.parametrize("fast", [True, False])
+def test_fast_path_matches_response_model(when, fast, monkeypatch):
+    if not fast:
+        monkeypatch.setattr(serializers, "orjson", None) # fallback da stdlib
+    row = ("Café ☕", 12.5, "expense", 3, False, 10, when, 1, "Padaria", "🥐", "#fff", 3, 1)
+    assert serializers.transactions_json([row]) == pydantic_json(row)
+
+
+def test_list_bytes_match_the_created_response(client, headers):
+    category = make_category(client, headers, "Bytes")
+    created = client.post("/transactions/", json={
+        "description": "Pão de queijo", "amount": 7.25, "type": "expense",
+        "category_id": category["id"], "date": "2040-01-01T12:00:00",
+    }, headers=headers)
+    assert created.status_code == 200, created.text
+    listed = client.get("/transactions/?limit=1", headers=headers)
+    assert listed.content == b"[" + created.content + b"]"
@@ -0,0 +1,89 @@
+from datetime import datetime, timedelta, timezone
+from app import models, sync
+from .helpers import make_category, other_user_headers
+
+
+def get_sync(client, headers, since=None):
+    response = client.get("/sync", params={} if since is None else {"since": since}, headers=headers)
+    assert response.status_code == 200, response.text
+    return response.json()
+
+
+def new_transaction(client, headers, category_id, description):
+    response = client.post("/transactions/", json={
+        "description": description, "amount": 10, "type": "expense", "category_id": category_id,
+    }, headers=headers)
+    assert response.status_code == 200, response.text
+    return response.json()
+
+
+def test_incremental_sync_returns_changes_and_tombstones(client):
+    headers = other_user_headers(client, "sync@example.com")
+    category = make_category(client, headers, "Sync")
+    kept = new_transaction(client, headers, category["id"], "Fica")
+    gone = new_transaction(client, headers, category["id"], "Sai")
+
+    first = get_sync(client, headers)
+    assert first["full"] is True
+    assert {t["id"] for t in first["transactions"]} == {kept["id"], gone["id"]}
+    cursor = first["cursor"]
+
+    # Nada mudou: vazio, mesmo cursor
+    same = get_sync(client, headers, cursor)
+    assert (same["full"], same["cursor"], same["transactions"], same["categories"]) == (False, cursor, [], [])
+
+    client.put(f"/transactions/{kept['id']}", json={"description": "Ficou", "amount": 11, "type": "expense",
+                                                    "category_id": category["id"]}, headers=headers)
+    client.delete(f"/transactions/{gone['id']}", headers=headers)
+    empty = make_category(client, headers, "Vazia")
+    client.delete(f"/categories/{empty['id']}", headers=headers)
+
+    changes = get_sync(client, headers, cursor)
+    assert changes["full"] is False
+    assert changes["cursor"] > cursor
+    assert [(t["id"], t["description"]) for t in changes["transactions"]] == [(kept["id"], "Ficou")]
+    assert changes["deleted"] == {"categories": [empty["id"]], "transactions": [gone["id"]]}
+    # A categoria criada e apagada no intervalo só aparece como exclusão
+    assert changes["categories"] == []
+
+    # Cursor do futuro (banco restaurado, outro servidor): sync completo
+    assert get_sync(client, headers, changes["cursor"] + 100)["full"] is True
+
+
+def test_purge_raises_the_floor_and_old_cursors_get_a_full_sync(client, db):
+    headers = other_user_headers(client, "purge@example.com")
+    user_id = db.query(models.User.id).filter(models.User.email == "purge@example.com").scalar()
+    category = make_category(client, headers, "Purge")
+    old = new_transaction(client, headers, category["id"], "Antiga")
+    stale_cursor = get_sync(client, headers)["cursor"]
+    client.delete(f"/transactions/{old['id']}", headers=headers)
+    deleted_version = get_sync(client, headers)["cursor"]
+
+    recent = new_transaction(client, headers, category["id"], "Recente")
+    client.delete(f"/transactions/{recent['id']}", headers=headers)
+
+    # Só o primeiro tombstone passou da retenção
+    # (pela versão: o SQLite pode reaproveitar o id da transação apagada)
+    db.query(models.Tombstone).filter(models.Tombstone.owner_id == user_id,
+                                      models.Tombstone.change_seq == deleted_version)\
+      .update({models.Tombstone.deleted_at: datetime.now(timezone.utc) - timedelta(days=sync.SYNC_RETENTION_DAYS + 1)})
+    db.commit()
+    sync.purge(db)
+    db.commit()
+
+    assert db.query(models.User.sync_floor).filter(models.User.id == user_id).scalar() == deleted_version
+    remaining = db.query(models.Tombstone.entity_id, models.Tombstone.change_seq)\
+                  .filter(models.Tombstone.owner_id == user_id).all()
+    assert [tuple(r) for r in remaining] == [(recent["id"], deleted_version + 2)]
+
+    # Abaixo do piso a exclusão já foi esquecida: o cliente recebe tudo de novo
+    assert get_sync(client, headers, stale_cursor)["full"] is True
+    # No piso ainda dá para seguir incremental
+    since_floor = get_sync(client, headers, deleted_version)
+    assert since_floor["full"] is False
+    assert since_floor["deleted"]["transactions"] == [recent["id"]]
+
+    # Idempotente: rodar de novo não mexe no piso
+    sync.purge(db)
+    db.commit()
+    assert db.query(models.User.sync_floor).filter(models.User.id == user_id).scalar() == deleted_version